@@ -0,0 +1,82 @@
+"""
+Benchmark of loading a type1 ledger from CSV and from Parquet.
+
+Writes a synthetic ledger of 1M rows to a temporary folder, converts it with
+`convert_to_parquet` and times `DataLoader` on both files:
+
+    uv run python -m benchmarks.ledger_loading [rows]
+"""
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from portfolio_tracker.loader import DataLoader, convert_to_parquet
+
+
+def synthetic_ledger(rows: int, seed: int = 0) -> pd.DataFrame:
+    """Random type1 ledger with the formatting of the CSV exports."""
+    rng = np.random.default_rng(seed)
+    securities = np.array([f"TICKER{i}" for i in range(500)])
+    quantity = rng.integers(1, 100, rows).astype(float)
+    price = rng.uniform(1, 1000, rows)
+    dates = pd.Timestamp("2010-01-01") + pd.to_timedelta(
+        rng.integers(0, 5000, rows), unit="D"
+    )
+    return pd.DataFrame(
+        {
+            "date": dates.strftime("%m/%d/%Y"),
+            "security": securities[rng.integers(0, len(securities), rows)],
+            "type_of_asset": np.where(rng.random(rows) < 0.7, "stock", "index_fund"),
+            "action": np.where(rng.random(rows) < 0.6, "buy", "sell"),
+            "quantity": quantity,
+            "price_per_share": price.round(4),
+            "total_transaction_price": [f"{value:,.2f}" for value in quantity * price],
+            "currency": np.where(rng.random(rows) < 0.9, "USD", "EUR"),
+        }
+    )
+
+
+def best_of(function, repeat: int = 3) -> float:
+    """Fastest of several runs, in seconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+
+    with tempfile.TemporaryDirectory() as folder:
+        csv_path = Path(folder) / "type1.csv"
+        synthetic_ledger(rows).to_csv(csv_path, index=False)
+
+        start = time.perf_counter()
+        parquet_path = convert_to_parquet(csv_path)
+        conversion = time.perf_counter() - start
+
+        columns = ["date", "security", "action", "quantity"]
+        results = {
+            "CSV": best_of(lambda: DataLoader(csv_path)),
+            "Parquet": best_of(lambda: DataLoader(parquet_path)),
+            f"CSV ({len(columns)} columns)": best_of(
+                lambda: DataLoader(csv_path, columns=columns)
+            ),
+            f"Parquet ({len(columns)} columns)": best_of(
+                lambda: DataLoader(parquet_path, columns=columns)
+            ),
+        }
+
+        print(f"Ledger of {rows:,} rows")
+        print(f"CSV file: {csv_path.stat().st_size / 1024**2:.1f} MB")
+        print(f"Parquet file: {parquet_path.stat().st_size / 1024**2:.1f} MB")
+        print(f"One-shot conversion: {conversion:.2f}s")
+        for name, seconds in results.items():
+            print(f"Load {name}: {seconds:.3f}s")
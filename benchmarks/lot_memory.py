@@ -0,0 +1,85 @@
+"""
+Benchmark of the memory used by open lots.
+
+Builds the open lots of a synthetic ledger of 1M buys spread over 1,000
+securities, once as the former deques of (quantity, price) tuples with a list of
+realized gain statistics per security, and once as `lots.Position` arrays with
+`lots.RealizedGains` records, and measures both with `tracemalloc`:
+
+    uv run python -m benchmarks.lot_memory [lots] [securities]
+"""
+
+import sys
+import tracemalloc
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from portfolio_tracker.lots import Position, RealizedGains
+
+
+def synthetic_lots(
+    lots: int, securities: int, seed: int = 0
+) -> dict[str, tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """Random quantities, prices and dates of the lots of every security."""
+    rng = np.random.default_rng(seed)
+    quantity = rng.integers(1, 100, lots).astype(float)
+    price = rng.uniform(1, 1000, lots).round(4)
+    dates = np.datetime64("2010-01-01") + np.sort(rng.integers(0, 5000, lots))
+    codes = rng.integers(0, securities, lots)
+    return {
+        f"TICKER{code}": (quantity[rows], price[rows], dates[rows])
+        for code, rows in pd.Series(np.arange(lots)).groupby(codes)
+    }
+
+
+def deque_lots(lots: dict) -> tuple[dict, dict]:
+    """Lots stored as before: a deque of (quantity, price) tuples per security."""
+    owned_shares = {}
+    realized_gains_per_asset = {}
+    for security, (quantity, price, _) in lots.items():
+        owned_shares[security] = deque(zip(quantity.tolist(), price.tolist()))
+        # (realized_gains, total_sold_value, total_shares_sold, date_of_last_sell)
+        realized_gains_per_asset[security] = [0.0, 0.0, 0.0, None]
+    return owned_shares, realized_gains_per_asset
+
+
+def position_lots(lots: dict) -> tuple[dict, dict]:
+    """Lots stored in `Position` arrays, with their acquisition dates."""
+    owned_shares = {}
+    realized_gains_per_asset = {}
+    for security, (quantity, price, dates) in lots.items():
+        position = Position()
+        position.extend(quantity, price, dates)
+        owned_shares[security] = position
+        realized_gains_per_asset[security] = RealizedGains()
+    return owned_shares, realized_gains_per_asset
+
+
+def traced_bytes(build, lots: dict) -> int:
+    """Memory still allocated by the structures `build` returns."""
+    tracemalloc.start()
+    try:
+        structures = build(lots)
+        current, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del structures
+    return current
+
+
+if __name__ == "__main__":
+    lot_count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    securities = int(sys.argv[2]) if len(sys.argv) > 2 else 1_000
+
+    lots = synthetic_lots(lot_count, securities)
+    results = {
+        "deque of tuples": traced_bytes(deque_lots, lots),
+        "Position arrays": traced_bytes(position_lots, lots),
+    }
+
+    print(f"{lot_count:,} lots over {len(lots):,} securities")
+    for name, size in results.items():
+        print(f"{name}: {size / 1024**2:.1f} MB, {size / lot_count:.1f} bytes per lot")
+    print(f"Reduction: {results['deque of tuples'] / results['Position arrays']:.1f}x")
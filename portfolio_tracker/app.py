@@ -1,43 +1,66 @@
-from dash import Dash, dcc, html
-from dash.dependencies import Input, Output
+import logging
+import os
+
+from dash import Dash, dcc, html, no_update
+from dash.dependencies import Input, Output, State
 
 from portfolio_tracker.layout import (
-    create_tab_layout,
+    overview_table_data,
     tab_style,
     tab_selected_style,
 )
-from portfolio_tracker.loader import DataLoader
-from portfolio_tracker.manager import PortfolioManager
+from portfolio_tracker.plotter import (
+    create_portfolio_distribution_plot,
+    create_unrealized_gains_plot,
+)
+from portfolio_tracker.crypto import ASSET_TYPE as CRYPTO_TAB, load_crypto_book
+from portfolio_tracker.fees import load_fees
+from portfolio_tracker.ledger import load_portfolio_book
+from portfolio_tracker.refresher import PriceRefresher
+from portfolio_tracker.tabs import TabCache
+from portfolio_tracker.utils import timed
 from portfolio_tracker.config import config
 
-# Load data
-data_loader = DataLoader(config.type1_path)
-type1_data = data_loader.get_type1_data()
-
-# Precompute data for Stocks
-stock_manager = PortfolioManager(type1_data, asset_type="stock")
-stock_realized_gains = stock_manager.stocks.generate_realized_gains_dataframe()
-stock_portfolio_overview = stock_manager.get_portfolio_overview()
-stock_owned_assets = stock_manager.stocks.get_owned_assets()
-stock_current_values, stock_unrealized_gains = (
-    stock_manager.stocks.fetch_current_values()
-)
+logging.basicConfig(level=logging.INFO)
 
-# Precompute data for Index Funds
-index_fund_manager = PortfolioManager(type1_data, asset_type="index_fund")
-index_fund_realized_gains = (
-    index_fund_manager.stocks.generate_realized_gains_dataframe()
-)
-index_fund_portfolio_overview = index_fund_manager.get_portfolio_overview()
-index_fund_owned_assets = index_fund_manager.stocks.get_owned_assets()
-index_fund_current_values, index_fund_unrealized_gains = (
-    index_fund_manager.stocks.fetch_current_values()
-)
+with timed("Startup"):
+    # Process the ledger once, shared by all tabs; only rows appended since
+    # the last run are parsed and applied
+    portfolio_book = load_portfolio_book(config.type1_path)
+    # Commissions of the type3 ledger, netted from the reported amounts
+    try:
+        portfolio_book.set_fees(load_fees(config.type3_path))
+    except ValueError as e:
+        print(f"Error loading the fee ledger, amounts reported gross: {e}")
+    # Crypto swaps of the type2 ledger, with the crypto rows of the type1 ledger
+    try:
+        crypto_book = load_crypto_book(portfolio_book, config.type2_path)
+    except ValueError as e:
+        print(f"Error loading the crypto ledger, crypto tab disabled: {e}")
+        crypto_book = None
+
+# Tab data and layouts are computed when a tab is first opened
+tabs = TabCache(portfolio_book, crypto_book)
+PERFORMANCE_TAB = "performance"
+DIVIDENDS_TAB = "dividends"
+TAX_TAB = "tax"
 
 # Create Dash app
-app = Dash(__name__)
+app = Dash(__name__, suppress_callback_exceptions=True)
 
 
+# The crypto tab is only shown when there are crypto transactions
+crypto_tabs = []
+if crypto_book is not None:
+    crypto_tabs.append(
+        dcc.Tab(
+            label="Crypto",
+            value=CRYPTO_TAB,
+            style=tab_style,
+            selected_style=tab_selected_style,
+        )
+    )
+
 # Define the layout
 app.layout = html.Div(
     [
@@ -57,9 +80,34 @@ app.layout = html.Div(
                     style=tab_style,
                     selected_style=tab_selected_style,
                 ),
+                *crypto_tabs,
+                dcc.Tab(
+                    label="Performance",
+                    value=PERFORMANCE_TAB,
+                    style=tab_style,
+                    selected_style=tab_selected_style,
+                ),
+                dcc.Tab(
+                    label="Dividends",
+                    value=DIVIDENDS_TAB,
+                    style=tab_style,
+                    selected_style=tab_selected_style,
+                ),
+                dcc.Tab(
+                    label="Tax",
+                    value=TAX_TAB,
+                    style=tab_style,
+                    selected_style=tab_selected_style,
+                ),
             ],
         ),
         html.Div(id="tab-content"),
+        # Poll for refreshed prices
+        dcc.Interval(
+            id="price-refresh",
+            interval=config.price_refresh_interval * 1000,
+        ),
+        dcc.Store(id="price-version"),
     ]
 )
 
@@ -69,24 +117,52 @@ app.layout = html.Div(
     Input("tabs", "value"),
 )
 def update_tab_content(tab_value):
-    if tab_value == "stock":
-        return create_tab_layout(
-            stock_realized_gains,
-            stock_portfolio_overview,
-            stock_owned_assets,
-            stock_current_values,
-            stock_unrealized_gains,
-        )
-    elif tab_value == "index_fund":
-        return create_tab_layout(
-            index_fund_realized_gains,
-            index_fund_portfolio_overview,
-            index_fund_owned_assets,
-            index_fund_current_values,
-            index_fund_unrealized_gains,
-        )
+    with timed(f"Tab switch to '{tab_value}'"):
+        if tab_value == PERFORMANCE_TAB:
+            return tabs.performance_layout()
+        if tab_value == DIVIDENDS_TAB:
+            return tabs.dividends_layout()
+        if tab_value == TAX_TAB:
+            return tabs.tax_layout()
+        return tabs.layout(tab_value)
+
+
+@app.callback(
+    Output("portfolio-overview-table", "data"),
+    Output("portfolio-distribution", "figure"),
+    Output("unrealized-gains", "figure"),
+    Output("price-version", "data"),
+    Input("price-refresh", "n_intervals"),
+    State("tabs", "value"),
+    State("price-version", "data"),
+    prevent_initial_call=True,
+)
+def refresh_tab_prices(_, tab_value, shown_version):
+    """Push refreshed values to the open tab, without rebuilding its layout."""
+    if tab_value in (PERFORMANCE_TAB, DIVIDENDS_TAB, TAX_TAB):
+        # Daily histories and past disposals, not affected by live prices
+        return no_update, no_update, no_update, no_update
+
+    manager = tabs.manager(tab_value)
+    version, current_values, unrealized_gains = manager.fetch_versioned_values()
+    if version == shown_version:
+        return no_update, no_update, no_update, no_update
+
+    return (
+        overview_table_data(manager.get_portfolio_overview()),
+        create_portfolio_distribution_plot(manager.get_owned_assets(), current_values),
+        create_unrealized_gains_plot(unrealized_gains),
+        version,
+    )
 
 
 # Run the app
 if __name__ == "__main__":
+    # Refresh prices in the background while the server is running. In debug
+    # mode the reloader runs the app in a child process, flagged by
+    # WERKZEUG_RUN_MAIN, and only that process serves requests
+    if os.environ.get("WERKZEUG_RUN_MAIN"):
+        PriceRefresher(portfolio_book, config.price_refresh_interval).start()
+        if crypto_book is not None:
+            PriceRefresher(crypto_book, config.price_refresh_interval).start()
     app.run_server(debug=True)
@@ -0,0 +1,211 @@
+"""
+Comparison of the portfolio against a benchmark.
+
+The portfolio is represented by its time-weighted growth (so cash flows do not
+count as returns) and the benchmark by its closing prices, both sampled on the
+trading days of the benchmark. Rolling metrics over a window of trading days are
+computed with pandas rolling kernels for the full history; days appended later
+are computed from the last `window` returns only, so keeping the comparison up
+to date does not recompute the history. The current day is left out until
+its close is final.
+"""
+
+import numpy as np
+import pandas as pd
+
+from portfolio_tracker.config import config
+from portfolio_tracker.data_fetching import fetch_close_prices, fx_rates
+
+TRADING_DAYS_PER_YEAR = 252
+
+METRICS = [
+    "portfolio_return",
+    "benchmark_return",
+    "portfolio_volatility",
+    "benchmark_volatility",
+    "portfolio_drawdown",
+    "benchmark_drawdown",
+    "beta",
+    "tracking_error",
+]
+
+
+class BenchmarkComparison:
+    """
+    Rolling comparison of the portfolio against a benchmark ticker.
+
+    Metrics, per trading day of the benchmark:
+    - portfolio_return, benchmark_return: Returns over the window
+    - portfolio_volatility, benchmark_volatility: Annualized standard deviation
+      of the daily returns over the window
+    - portfolio_drawdown, benchmark_drawdown: Decline from the highest level so far
+    - beta: Beta of the portfolio to the benchmark over the window
+    - tracking_error: Annualized standard deviation of the daily excess
+      returns over the window
+    """
+
+    def __init__(
+        self,
+        history: pd.DataFrame,
+        ticker: str = config.benchmark.ticker,
+        window: int = config.benchmark.window,
+        currency: str = config.reporting_currency,
+    ) -> None:
+        """
+        Parameters:
+        - history: Daily portfolio history (see `performance.portfolio_history`)
+        - ticker: Ticker of the benchmark (e.g., 'VOO')
+        - window: Length of the rolling window, in trading days
+        - currency: Currency of the history; the benchmark closes (in USD) are
+          converted at the exchange rate of every day
+        """
+        self.ticker = ticker
+        self.window = window
+        self.currency = currency
+        self._compute(history)
+
+    def _compute(self, history: pd.DataFrame) -> None:
+        """Compute the metrics of a full history."""
+        levels = self._aligned_levels(
+            history, history.index[0] if len(history) else None
+        )
+        self._dates = list(levels.index)
+        self._levels = _Rows(levels.to_numpy())
+        self._metrics = _Rows(rolling_metrics(levels, self.window).to_numpy())
+        self._peaks = levels.max().to_numpy() if len(levels) else np.full(2, -np.inf)
+
+    @property
+    def levels(self) -> pd.DataFrame:
+        """Growth of the portfolio and closing prices of the benchmark."""
+        return pd.DataFrame(
+            self._levels.view(),
+            index=pd.DatetimeIndex(self._dates, name="date"),
+            columns=["portfolio", "benchmark"],
+        )
+
+    @property
+    def metrics(self) -> pd.DataFrame:
+        """Rolling metrics, indexed by trading day (see the class docstring)."""
+        return pd.DataFrame(
+            self._metrics.view(),
+            index=pd.DatetimeIndex(self._dates, name="date"),
+            columns=METRICS,
+        )
+
+    def update(self, history: pd.DataFrame) -> None:
+        """
+        Append the days of a more recent portfolio history.
+
+        Only the trading days after the last one compared are fetched and
+        computed, each in O(window).
+        """
+        if not self._dates:
+            self._compute(history)
+            return
+        start = self._dates[-1] + pd.Timedelta(days=1)
+        levels = self._aligned_levels(history, start)
+        for date, level in zip(levels.index, levels.to_numpy()):
+            self.append(date, level[0], level[1])
+
+    def append(self, date, portfolio_level: float, benchmark_level: float) -> None:
+        """Append one trading day, updating the metrics from the last window only."""
+        level = np.array([portfolio_level, benchmark_level])
+        self._dates.append(pd.Timestamp(date))
+        self._levels.append(level)
+        self._peaks = np.fmax(self._peaks, level)
+
+        # The last window of daily returns needs window + 1 levels
+        levels = self._levels.view()[-(self.window + 1) :]
+        metrics = np.full(len(METRICS), np.nan)
+        metrics[4:6] = level / self._peaks - 1
+        if len(levels) == self.window + 1:
+            returns = levels[1:] / levels[:-1] - 1
+            portfolio, benchmark = returns[:, 0], returns[:, 1]
+            annualization = np.sqrt(TRADING_DAYS_PER_YEAR)
+            metrics[0:2] = levels[-1] / levels[0] - 1
+            metrics[2:4] = returns.std(axis=0, ddof=1) * annualization
+            benchmark_variance = benchmark.var(ddof=1)
+            if benchmark_variance > 0:
+                metrics[6] = np.cov(portfolio, benchmark)[0, 1] / benchmark_variance
+            metrics[7] = (portfolio - benchmark).std(ddof=1) * annualization
+        self._metrics.append(metrics)
+
+    def _aligned_levels(self, history: pd.DataFrame, start) -> pd.DataFrame:
+        """Portfolio growth and benchmark closes on the benchmark's trading days
+        from `start` to the end of the history (at the latest yesterday)."""
+        end = history.index[-1] if len(history) else None
+        if end is not None:
+            end = min(end, pd.Timestamp.now().normalize() - pd.Timedelta(days=1))
+        if start is None or end is None or start > end:
+            return pd.DataFrame(columns=["portfolio", "benchmark"], dtype=float)
+
+        closes = fetch_close_prices([self.ticker], start, end)
+        if self.ticker not in closes:
+            raise ValueError(f"No price history available for benchmark {self.ticker}")
+        benchmark = closes[self.ticker].dropna()
+        benchmark.index = pd.DatetimeIndex(benchmark.index).normalize()
+        if self.currency != "USD":
+            benchmark = benchmark * fx_rates.rates_for(
+                "USD", self.currency, benchmark.index
+            )
+
+        growth = 1 + history["twr"]
+        return pd.DataFrame(
+            {
+                "portfolio": growth.reindex(benchmark.index).to_numpy(),
+                "benchmark": benchmark.to_numpy(),
+            },
+            index=benchmark.index,
+        )
+
+
+def rolling_metrics(levels: pd.DataFrame, window: int) -> pd.DataFrame:
+    """
+    Rolling metrics of the full history (see `BenchmarkComparison`).
+
+    Parameters:
+    - levels: Portfolio growth and benchmark closes, columns 'portfolio' and 'benchmark'
+    - window: Length of the rolling window, in trading days
+    """
+    returns = levels.pct_change()
+    portfolio, benchmark = returns["portfolio"], returns["benchmark"]
+    annualization = np.sqrt(TRADING_DAYS_PER_YEAR)
+
+    window_returns = levels / levels.shift(window) - 1
+    volatility = returns.rolling(window).std() * annualization
+    drawdown = levels / levels.cummax() - 1
+    beta = portfolio.rolling(window).cov(benchmark) / benchmark.rolling(window).var()
+
+    return pd.DataFrame(
+        {
+            "portfolio_return": window_returns["portfolio"],
+            "benchmark_return": window_returns["benchmark"],
+            "portfolio_volatility": volatility["portfolio"],
+            "benchmark_volatility": volatility["benchmark"],
+            "portfolio_drawdown": drawdown["portfolio"],
+            "benchmark_drawdown": drawdown["benchmark"],
+            "beta": beta.replace([np.inf, -np.inf], np.nan),
+            "tracking_error": (portfolio - benchmark).rolling(window).std()
+            * annualization,
+        },
+        index=levels.index,
+    )
+
+
+class _Rows:
+    """Rows of floats with amortized O(1) appends."""
+
+    def __init__(self, rows: np.ndarray) -> None:
+        self._size = len(rows)
+        self._data = np.array(rows, dtype=float)
+
+    def view(self) -> np.ndarray:
+        return self._data[: self._size]
+
+    def append(self, row: np.ndarray) -> None:
+        if self._size == len(self._data):
+            grown = np.empty((max(8, 2 * self._size), self._data.shape[1]))
+            grown[: self._size] = self._data[: self._size]
+            self._data = grown
+        self._data[self._size] = row
+        self._size += 1
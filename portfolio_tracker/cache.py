@@ -0,0 +1,310 @@
+"""
+Persistent on-disk cache for market data.
+
+Daily series (closing prices, exchange rates, stock splits) are stored per key
+together with the date ranges that have already been fetched, so only missing
+ranges are requested from the network. Ranges reaching the day they were
+fetched on are considered complete only while younger than the quote TTL, since
+the close of that day could still change. Quotes are stored with their fetch
+time and reused while younger than the quote TTL.
+
+Keys are evicted once they have not been accessed for `max_age_days`, and the
+least recently accessed keys are dropped whenever the database grows beyond
+`max_bytes`.
+"""
+
+import sqlite3
+import threading
+import time
+from collections.abc import Callable, Iterable
+from functools import lru_cache
+
+import pandas as pd
+
+from portfolio_tracker.config import CacheSettings, config
+
+ONE_DAY = pd.Timedelta(days=1)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS keys (
+    key TEXT PRIMARY KEY,
+    accessed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS series (
+    key TEXT NOT NULL,
+    date TEXT NOT NULL,
+    value REAL,
+    PRIMARY KEY (key, date)
+);
+CREATE TABLE IF NOT EXISTS coverage (
+    key TEXT NOT NULL,
+    start TEXT NOT NULL,
+    end TEXT NOT NULL,
+    fetched_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS quotes (
+    key TEXT PRIMARY KEY,
+    value REAL,
+    fetched_at REAL NOT NULL
+);
+"""
+
+
+class MarketDataCache:
+    """SQLite-backed cache for daily series and quotes."""
+
+    def __init__(self, settings: CacheSettings) -> None:
+        self.settings = settings
+        settings.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(settings.path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.executescript(SCHEMA)
+        self.evict()
+
+    def get_series(
+        self,
+        key: str,
+        start_date,
+        end_date,
+        fetch: Callable[[pd.Timestamp, pd.Timestamp], pd.Series],
+        ttl: int | None = None,
+    ) -> pd.Series:
+        """
+        Get a daily series between two dates (inclusive), fetching only the
+        ranges that are not cached yet.
+
+        Parameters:
+        - key: Cache key of the series (e.g., 'history:EURUSD=X')
+        - start_date, end_date: Date range of the series
+        - fetch: Called as fetch(start, end) for every missing range; returns a
+          Series indexed by date. Values outside the range are ignored.
+        - ttl: Seconds for which a range reaching the day it was fetched on
+          stays valid (defaults to the quote TTL)
+
+        Returns:
+        - Series indexed by (timezone-naive) date, without missing dates filled.
+        """
+        start = pd.Timestamp(start_date).normalize()
+        # Nothing can be fetched beyond today
+        end = min(pd.Timestamp(end_date).normalize(), pd.Timestamp.now().normalize())
+
+        ttl = self.settings.quote_ttl if ttl is None else ttl
+        for gap_start, gap_end in self._missing_ranges(key, start, end, ttl):
+            fetched = fetch(gap_start, gap_end)
+            self._store_series(key, fetched, gap_start, gap_end)
+
+        return self._load_series(key, start, end)
+
+    def get_quotes(
+        self,
+        keys: Iterable[str],
+        fetch: Callable[[list[str]], dict[str, float]],
+        ttl: int | None = None,
+    ) -> dict[str, float]:
+        """
+        Get quotes, fetching only those missing or older than the quote TTL.
+
+        Parameters:
+        - keys: Symbols to quote
+        - fetch: Called with the list of symbols to refresh; returns a
+          dictionary of the quotes it could fetch.
+        - ttl: Seconds for which cached quotes stay valid (defaults to the
+          quote TTL; 0 always fetches)
+
+        Returns:
+        - Dictionary of quotes for the symbols that are cached or were fetched.
+        """
+        keys = list(keys)
+        if not keys:
+            return {}
+        ttl = self.settings.quote_ttl if ttl is None else ttl
+        fresh_after = time.time() - ttl
+        quotes = {}
+        with self._lock:
+            for key, value, fetched_at in self._connection.execute(
+                f"SELECT key, value, fetched_at FROM quotes "
+                f"WHERE key IN ({','.join('?' * len(keys))})",
+                keys,
+            ):
+                if fetched_at >= fresh_after:
+                    quotes[key] = value
+
+        stale = [key for key in keys if key not in quotes]
+        if stale:
+            fetched = fetch(stale)
+            now = time.time()
+            with self._lock, self._connection:
+                self._connection.executemany(
+                    "INSERT OR REPLACE INTO quotes VALUES (?, ?, ?)",
+                    [(key, value, now) for key, value in fetched.items()],
+                )
+            quotes.update(fetched)
+        return quotes
+
+    def _missing_ranges(
+        self, key: str, start: pd.Timestamp, end: pd.Timestamp, ttl: int
+    ) -> list[tuple[pd.Timestamp, pd.Timestamp]]:
+        """Date ranges inside [start, end] that are not covered by the cache."""
+        fresh_after = time.time() - ttl
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT start, end, fetched_at FROM coverage WHERE key = ? "
+                "ORDER BY start",
+                (key,),
+            ).fetchall()
+
+        missing = []
+        cursor = start
+        for covered_start, covered_end, fetched_at in rows:
+            covered_start = pd.Timestamp(covered_start)
+            covered_end = pd.Timestamp(covered_end)
+            # The close of the fetch day kept changing until the day was over
+            fetched_day = pd.Timestamp.fromtimestamp(fetched_at).normalize()
+            if covered_end >= fetched_day and fetched_at < fresh_after:
+                covered_end = fetched_day - ONE_DAY
+            if covered_start > cursor:
+                missing.append((cursor, min(covered_start - ONE_DAY, end)))
+            cursor = max(cursor, covered_end + ONE_DAY)
+            if cursor > end:
+                break
+        if cursor <= end:
+            missing.append((cursor, end))
+        return [
+            (gap_start, gap_end)
+            for gap_start, gap_end in missing
+            if gap_start <= gap_end
+        ]
+
+    def _store_series(
+        self,
+        key: str,
+        series: pd.Series,
+        start: pd.Timestamp,
+        end: pd.Timestamp,
+    ) -> None:
+        """Store the values of a fetched range and mark the range as covered."""
+        dates = _normalize_index(series.index)
+        inside = (dates >= start) & (dates <= end)
+        rows = [
+            (key, date.strftime("%Y-%m-%d"), float(value))
+            for date, value in zip(dates[inside], series.to_numpy()[inside])
+        ]
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO series VALUES (?, ?, ?)", rows
+            )
+            self._connection.execute(
+                "INSERT INTO coverage VALUES (?, ?, ?, ?)",
+                (key, start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d"), now),
+            )
+            self._merge_coverage(key)
+
+    def _merge_coverage(self, key: str) -> None:
+        """Merge overlapping or adjacent covered ranges of a key."""
+        rows = self._connection.execute(
+            "SELECT start, end, fetched_at FROM coverage WHERE key = ? "
+            "ORDER BY start, end",
+            (key,),
+        ).fetchall()
+
+        merged = []
+        for start, end, fetched_at in rows:
+            if merged:
+                previous_start, previous_end, previous_fetched_at = merged[-1]
+                next_day = pd.Timestamp(previous_end) + ONE_DAY
+                if pd.Timestamp(start) <= next_day:
+                    # The fetch time matters for the range reaching furthest
+                    if end > previous_end or (
+                        end == previous_end and fetched_at > previous_fetched_at
+                    ):
+                        merged[-1] = (previous_start, end, fetched_at)
+                    continue
+            merged.append((start, end, fetched_at))
+
+        self._connection.execute("DELETE FROM coverage WHERE key = ?", (key,))
+        self._connection.executemany(
+            "INSERT INTO coverage VALUES (?, ?, ?, ?)",
+            [(key, *row) for row in merged],
+        )
+
+    def _load_series(
+        self, key: str, start: pd.Timestamp, end: pd.Timestamp
+    ) -> pd.Series:
+        with self._lock, self._connection:
+            rows = self._connection.execute(
+                "SELECT date, value FROM series WHERE key = ? AND date BETWEEN ? AND ? "
+                "ORDER BY date",
+                (key, start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d")),
+            ).fetchall()
+            self._touch(key)
+
+        dates, values = zip(*rows) if rows else ((), ())
+        return pd.Series(
+            values, index=pd.DatetimeIndex(pd.to_datetime(dates)), dtype=float
+        )
+
+    def _touch(self, key: str) -> None:
+        self._connection.execute(
+            "INSERT OR REPLACE INTO keys VALUES (?, ?)", (key, time.time())
+        )
+
+    def evict(self) -> None:
+        """Drop keys not accessed recently, then the least recently accessed
+        keys until the database fits in `max_bytes`."""
+        expired_before = time.time() - self.settings.max_age_days * 86400
+        with self._lock, self._connection:
+            expired = [
+                key
+                for (key,) in self._connection.execute(
+                    "SELECT key FROM keys WHERE accessed_at < ?", (expired_before,)
+                )
+            ]
+            self._delete_keys(expired)
+            self._connection.execute(
+                "DELETE FROM quotes WHERE fetched_at < ?", (expired_before,)
+            )
+
+        while self._size() > self.settings.max_bytes:
+            with self._lock, self._connection:
+                oldest = [
+                    key
+                    for (key,) in self._connection.execute(
+                        "SELECT key FROM keys ORDER BY accessed_at "
+                        "LIMIT max(1, (SELECT count(*) FROM keys) / 10)"
+                    )
+                ]
+                if not oldest:
+                    self._connection.execute("DELETE FROM quotes")
+                self._delete_keys(oldest)
+            with self._lock:
+                self._connection.execute("VACUUM")
+            if not oldest:
+                break
+
+    def _delete_keys(self, keys: list[str]) -> None:
+        for table in ("keys", "series", "coverage"):
+            self._connection.executemany(
+                f"DELETE FROM {table} WHERE key = ?", [(key,) for key in keys]
+            )
+
+    def _size(self) -> int:
+        with self._lock:
+            page_count = self._connection.execute("PRAGMA page_count").fetchone()[0]
+            page_size = self._connection.execute("PRAGMA page_size").fetchone()[0]
+        return page_count * page_size
+
+
+def _normalize_index(index: pd.Index) -> pd.DatetimeIndex:
+    """Convert an index of dates to timezone-naive midnight timestamps."""
+    dates = pd.DatetimeIndex(index)
+    if dates.tz is not None:
+        dates = dates.tz_localize(None)
+    return dates.normalize()
+
+
+@lru_cache(maxsize=1)
+def get_cache() -> MarketDataCache:
+    """Market data cache shared by the whole process."""
+    return MarketDataCache(config.cache)
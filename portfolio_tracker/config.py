@@ -19,14 +19,48 @@ class VisualizerColors:
     blue_color: str
 
 
+@dataclass(frozen=True)
+class CacheSettings:
+    path: Path
+    quote_ttl: int  # seconds
+    splits_ttl: int  # seconds
+    dividends_ttl: int  # seconds
+    max_age_days: int
+    max_bytes: int
+
+
+@dataclass(frozen=True)
+class MarketDataSettings:
+    provider: str  # 'yahoo' or 'fixtures'
+    fixtures_path: Path
+    max_workers: int  # concurrent requests
+    timeout: float  # seconds per request
+    retries: int
+
+
+@dataclass(frozen=True)
+class BenchmarkSettings:
+    ticker: str
+    window: int  # trading days
+
+
 @dataclass(frozen=True, kw_only=True)
 class Config:
     data_path: Path
     type1_path: Path
     type2_path: Path
     type3_path: Path
+    ledger_state_path: Path
     colors: VisualizerColors
     default_decimals: int
+    price_refresh_interval: int  # seconds
+    cache: CacheSettings
+    market_data: MarketDataSettings
+    benchmark: BenchmarkSettings
+    currencies: frozenset[str]  # accepted in the ledgers
+    reporting_currency: str  # currency of the dashboard figures
+    cost_basis: str  # lot matching method (see `cost_basis.METHODS`)
+    crypto_exchange_map: dict[str, str]  # exchange quoting each crypto, if not binance
 
 
 def load_env_var(var_name: str) -> str:
@@ -38,15 +72,49 @@ def load_env_var(var_name: str) -> str:
     return env_var
 
 
+def prefer_parquet(csv_path: Path) -> Path:
+    """
+    Path of the Parquet copy of a ledger (see `loader.convert_to_parquet`)
+    if it is at least as recent as the CSV file, else the CSV path.
+    """
+    parquet_path = csv_path.with_suffix(".parquet")
+    if parquet_path.exists() and (
+        not csv_path.exists()
+        or parquet_path.stat().st_mtime >= csv_path.stat().st_mtime
+    ):
+        return parquet_path
+    return csv_path
+
+
+def parse_mapping(text: str) -> dict[str, str]:
+    """Parses 'KEY:value' pairs separated by commas (e.g., from an env variable)."""
+    pairs = (item.split(":", 1) for item in text.split(",") if ":" in item)
+    return {key.strip().upper(): value.strip() for key, value in pairs}
+
+
 # Set paths
 PRIVATE_PATH = load_env_var("PRIVATE_PATH")
 DATA_PATH = Path(get_data_folder_path(data_type=PRIVATE_PATH))
 
+# Market data source: live ('yahoo') or recorded fixtures ('fixtures')
+MARKET_DATA_PROVIDER = os.getenv("MARKET_DATA_PROVIDER", default="yahoo")
+FIXTURES_PATH = Path(os.getenv("MARKET_DATA_FIXTURES", default=DATA_PATH / "fixtures"))
+
+# Currency the dashboard reports in (amounts are processed in USD)
+REPORTING_CURRENCY = os.getenv("REPORTING_CURRENCY", default="USD")
+
+# Order sold lots are matched in: 'fifo', 'lifo', 'hifo', 'average' or 'specific'
+COST_BASIS = os.getenv("COST_BASIS", default="fifo")
+
+# Exchanges quoting cryptocurrencies not quoted on binance, e.g. "XMR:kraken,ADA:kraken"
+CRYPTO_EXCHANGES = os.getenv("CRYPTO_EXCHANGES", default="")
+
 config = Config(
     data_path=DATA_PATH,
-    type1_path=DATA_PATH / "type1.csv",
+    type1_path=prefer_parquet(DATA_PATH / "type1.csv"),
     type2_path=DATA_PATH / "type2.csv",
     type3_path=DATA_PATH / "type3.csv",
+    ledger_state_path=DATA_PATH / ".cache" / "ledger_state.pkl",
     colors=VisualizerColors(
         bg_color="#1e1e1e",
         txt_color="white",
@@ -55,4 +123,55 @@ config = Config(
         blue_color="lightseagreen",
     ),
     default_decimals=1,
+    price_refresh_interval=5 * 60,
+    cache=CacheSettings(
+        path=DATA_PATH / ".cache" / "market_data.sqlite",
+        quote_ttl=15 * 60,
+        splits_ttl=24 * 60 * 60,
+        dividends_ttl=24 * 60 * 60,
+        max_age_days=180,
+        max_bytes=200 * 1024**2,
+    ),
+    market_data=MarketDataSettings(
+        provider=MARKET_DATA_PROVIDER,
+        fixtures_path=FIXTURES_PATH,
+        max_workers=8,
+        timeout=10,
+        retries=2,
+    ),
+    benchmark=BenchmarkSettings(
+        ticker="VOO",
+        window=63,
+    ),
+    currencies=frozenset(
+        [
+            "USD",
+            "EUR",
+            "GBP",
+            "CHF",
+            "JPY",
+            "CAD",
+            "AUD",
+            "NZD",
+            "SEK",
+            "NOK",
+            "DKK",
+            "PLN",
+            "CZK",
+            "HUF",
+            "HKD",
+            "SGD",
+            "CNY",
+            "KRW",
+            "INR",
+            "ZAR",
+            "BRL",
+            "MXN",
+            "ILS",
+            "TRY",
+        ]
+    ),
+    reporting_currency=REPORTING_CURRENCY,
+    cost_basis=COST_BASIS,
+    crypto_exchange_map=parse_mapping(CRYPTO_EXCHANGES),
 )
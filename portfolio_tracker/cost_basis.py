@@ -0,0 +1,386 @@
+"""
+Cost-basis methods.
+
+Selling shares consumes the open lots of a security in an order set by the
+cost-basis method:
+
+- 'fifo': oldest lots first,
+- 'lifo': newest lots first,
+- 'hifo': highest-priced lots first, which minimizes realized gains,
+- 'average': all lots in proportion, at the average cost of the position,
+- 'specific': the lot named by the sell (optional 'lot' column of the ledger),
+  then the oldest lots. A buy's lot is named by its 'lot' value, or else by its
+  line in the ledger.
+
+Each method keeps the open lots in the structure its order needs, so a sell
+costs O(1) per consumed lot (O(log lots) for HIFO) instead of a scan: a deque
+for FIFO and LIFO, a heap keyed by price for HIFO, an ordered dictionary
+indexed by lot name for specific lots and a scaled pool for average cost. Whole ledgers under FIFO are
+matched by the vectorized `lots.match_fifo` instead.
+"""
+
+import heapq
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from portfolio_tracker.lots import Position
+
+METHODS = ["fifo", "lifo", "hifo", "average", "specific"]
+
+# Relative shortfall of shares tolerated when selling, for rounding errors
+QUANTITY_TOLERANCE = 1e-9
+
+
+@dataclass(slots=True)
+class Lot:
+    """Open lot of a security."""
+
+    quantity: float
+    price: float
+    date: object
+    sequence: int  # acquisition order
+    name: object = None  # name used by specific-lot sells
+    key: float = 0.0  # price the lot is ranked by (HIFO)
+
+
+class LotPool(ABC):
+    """
+    Open lots of a single security under a cost-basis method.
+
+    Subclasses set the order lots are consumed in, through `_push`,
+    `_next_lot` and `_drop_lot`.
+    """
+
+    method = None
+
+    def __init__(self) -> None:
+        self.quantity = 0.0
+        self.cost_basis = 0.0
+        self._sequence = 0
+
+    def add(
+        self, quantity: float, price: float, date=None, name=None, key=None
+    ) -> None:
+        """
+        Add a bought lot.
+
+        Parameters:
+        - quantity, price: Shares bought and price per share
+        - date: Acquisition date
+        - name: Name of the lot, for specific-lot sells
+        - key: Price the lot is ranked by for HIFO (defaults to `price`)
+        """
+        lot = Lot(
+            quantity, price, date, self._sequence, name, price if key is None else key
+        )
+        self._sequence += 1
+        self._push(lot)
+        self.quantity += quantity
+        self.cost_basis += quantity * price
+
+    def remove(self, quantity: float, name=None) -> float:
+        """
+        Remove sold shares from the open lots.
+
+        Parameters:
+        - quantity: Shares sold
+        - name: Lot to sell from first (specific-lot method only)
+
+        Returns:
+        - The cost basis of the removed shares.
+        """
+        if quantity - self.quantity > QUANTITY_TOLERANCE * max(1.0, quantity):
+            raise ValueError(f"Not enough shares to sell {quantity}")
+        remaining = quantity
+        cost = 0.0
+        while remaining > 0 and len(self):
+            lot = self._next_lot(name)
+            taken = min(lot.quantity, remaining)
+            cost += taken * lot.price
+            lot.quantity -= taken
+            remaining -= taken
+            if lot.quantity <= 0:
+                self._drop_lot(lot)
+        self._consumed(quantity, cost)
+        return cost
+
+    def _consumed(self, quantity: float, cost: float) -> None:
+        if len(self):
+            self.quantity -= quantity
+            self.cost_basis -= cost
+        else:
+            # Reset exactly, so rounding errors do not accumulate
+            self.quantity = 0.0
+            self.cost_basis = 0.0
+
+    @abstractmethod
+    def open_lots(self) -> list[Lot]:
+        """Open lots, in acquisition order."""
+
+    def to_position(self) -> Position:
+        """Position holding the open lots, in acquisition order."""
+        lots = self.open_lots()
+        position = Position(capacity=max(8, len(lots)))
+        if lots:
+            position.extend(
+                np.array([lot.quantity for lot in lots]),
+                np.array([lot.price for lot in lots]),
+                np.array([lot.date for lot in lots], dtype="datetime64[D]"),
+            )
+        return position
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """Number of open lots."""
+
+    @abstractmethod
+    def _push(self, lot: Lot) -> None:
+        """Add a lot to the open lots."""
+
+    @abstractmethod
+    def _next_lot(self, name) -> Lot:
+        """Open lot consumed next by a sell from lot `name`."""
+
+    @abstractmethod
+    def _drop_lot(self, lot: Lot) -> None:
+        """Remove a lot consumed entirely, the one `_next_lot` returned."""
+
+
+class FifoPool(LotPool):
+    """Oldest lots first, from the front of a deque."""
+
+    method = "fifo"
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._lots = deque()
+
+    def __len__(self) -> int:
+        return len(self._lots)
+
+    def open_lots(self) -> list[Lot]:
+        return list(self._lots)
+
+    def _push(self, lot: Lot) -> None:
+        self._lots.append(lot)
+
+    def _next_lot(self, name) -> Lot:
+        return self._lots[0]
+
+    def _drop_lot(self, lot: Lot) -> None:
+        self._lots.popleft()
+
+
+class LifoPool(FifoPool):
+    """Newest lots first, from the back of a deque."""
+
+    method = "lifo"
+
+    def _next_lot(self, name) -> Lot:
+        return self._lots[-1]
+
+    def _drop_lot(self, lot: Lot) -> None:
+        self._lots.pop()
+
+
+class HifoPool(LotPool):
+    """Highest-priced lots first, from a heap keyed by price."""
+
+    method = "hifo"
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._heap = []
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def open_lots(self) -> list[Lot]:
+        return sorted((lot for _, _, lot in self._heap), key=lambda lot: lot.sequence)
+
+    def _push(self, lot: Lot) -> None:
+        # Lots of the same price are consumed oldest first
+        heapq.heappush(self._heap, (-lot.key, lot.sequence, lot))
+
+    def _next_lot(self, name) -> Lot:
+        return self._heap[0][2]
+
+    def _drop_lot(self, lot: Lot) -> None:
+        heapq.heappop(self._heap)
+
+
+class SpecificPool(LotPool):
+    """The named lot first, then the oldest lots, from an ordered dictionary."""
+
+    method = "specific"
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._lots = OrderedDict()
+        # Sequences of the open lots of every name, in acquisition order
+        self._names = {}
+
+    def __len__(self) -> int:
+        return len(self._lots)
+
+    def open_lots(self) -> list[Lot]:
+        return list(self._lots.values())
+
+    def _push(self, lot: Lot) -> None:
+        self._lots[lot.sequence] = lot
+        if lot.name is not None:
+            self._names.setdefault(lot.name, OrderedDict())[lot.sequence] = None
+
+    def _next_lot(self, name) -> Lot:
+        sequences = self._names.get(name)
+        if sequences:
+            return self._lots[next(iter(sequences))]
+        return next(iter(self._lots.values()))
+
+    def _drop_lot(self, lot: Lot) -> None:
+        del self._lots[lot.sequence]
+        if lot.name is not None:
+            sequences = self._names[lot.name]
+            del sequences[lot.sequence]
+            if not sequences:
+                del self._names[lot.name]
+
+
+class AveragePool(LotPool):
+    """
+    All lots in proportion, at the average cost of the position.
+
+    Lot quantities are stored divided by a common scale, so a sell shrinks
+    every lot at once by scaling down.
+    """
+
+    method = "average"
+
+    # Scale below which the stored quantities are rescaled, for precision
+    MIN_SCALE = 1e-6
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._lots = []
+        self._scale = 1.0
+
+    def __len__(self) -> int:
+        return len(self._lots)
+
+    def open_lots(self) -> list[Lot]:
+        return [
+            Lot(
+                lot.quantity * self._scale,
+                lot.price,
+                lot.date,
+                lot.sequence,
+                lot.name,
+                lot.key,
+            )
+            for lot in self._lots
+        ]
+
+    def _push(self, lot: Lot) -> None:
+        lot.quantity /= self._scale
+        self._lots.append(lot)
+
+    # Sells consume every lot at once (see `remove`), never lot by lot
+    def _next_lot(self, name) -> Lot:
+        raise NotImplementedError("Average-cost lots are not sold one by one")
+
+    def _drop_lot(self, lot: Lot) -> None:
+        raise NotImplementedError("Average-cost lots are not sold one by one")
+
+    def remove(self, quantity: float, name=None) -> float:
+        if quantity - self.quantity > QUANTITY_TOLERANCE * max(1.0, quantity):
+            raise ValueError(f"Not enough shares to sell {quantity}")
+        if quantity >= self.quantity:
+            cost = self.cost_basis
+            self._lots.clear()
+            self._scale = 1.0
+        else:
+            cost = quantity * self.cost_basis / self.quantity
+            self._scale *= 1 - quantity / self.quantity
+            if self._scale < self.MIN_SCALE:
+                for lot in self._lots:
+                    lot.quantity *= self._scale
+                self._scale = 1.0
+        self._consumed(quantity, cost)
+        return cost
+
+
+POOLS = {
+    pool.method: pool
+    for pool in (FifoPool, LifoPool, HifoPool, AveragePool, SpecificPool)
+}
+
+
+def create_pool(method: str) -> LotPool:
+    """Empty pool of lots for a cost-basis method (see `METHODS`)."""
+    if method not in POOLS:
+        raise ValueError(
+            f"Unknown cost-basis method: {method} (expected one of {METHODS})"
+        )
+    return POOLS[method]()
+
+
+def lot_names(transactions: pd.DataFrame) -> np.ndarray:
+    """
+    Lot names of transactions for the specific-lot method: the 'lot' column of
+    the ledger where given, else the ledger line of buys (None for sells).
+    """
+    lines = transactions.index.to_numpy() + 2
+    is_buy = (transactions["action"] == "buy").to_numpy()
+    names = np.where(is_buy, lines, None)
+    if "lot" in transactions:
+        named = transactions["lot"].notna().to_numpy()
+        names[named] = transactions["lot"].to_numpy()[named]
+    return names
+
+
+def match_lots(
+    quantity: np.ndarray,
+    price: np.ndarray,
+    is_buy: np.ndarray,
+    pools: dict[str, LotPool],
+    dates: np.ndarray | None = None,
+    names: np.ndarray | None = None,
+    keys: np.ndarray | None = None,
+) -> dict[str, np.ndarray]:
+    """
+    Match the transactions of one security under several cost-basis methods
+    in a single pass.
+
+    Parameters:
+    - quantity, price, is_buy: Transactions of the security, in ledger order
+    - pools: Pool of lots of every method, updated in place
+    - dates: Acquisition dates of the buys
+    - names: Lot names ('specific' method): of the buys, and sold from by the sells
+    - keys: Prices the lots are ranked by for HIFO (defaults to `price`)
+
+    Returns:
+    - Dictionary where keys are methods and values are the cost basis
+      consumed by each transaction (zero for buys).
+    """
+    sell_cost = {method: np.zeros(len(quantity)) for method in pools}
+    if not pools:
+        return sell_cost
+    count = len(quantity)
+    # Python scalars are much faster to handle one by one than array items
+    price = np.asarray(price, dtype=float).tolist()
+    keys = price if keys is None else np.asarray(keys, dtype=float).tolist()
+    dates = [None] * count if dates is None else list(dates)
+    names = [None] * count if names is None else list(names)
+
+    rows = zip(quantity.tolist(), is_buy.tolist(), price, dates, names, keys)
+    for row, (shares, buy, share_price, date, name, key) in enumerate(rows):
+        for method, pool in pools.items():
+            if buy:
+                pool.add(shares, share_price, date, name, key)
+            else:
+                sell_cost[method][row] = pool.remove(shares, name)
+    return sell_cost
@@ -0,0 +1,232 @@
+"""
+Crypto book of the type2 ledger.
+
+A swap of `quantity_security_1` of `security_1` for `quantity_security_2` of
+`security_2` disposes of the first coin and acquires the second at the same USD
+value, so every swap becomes a sell and a buy in the format of the type1 ledger.
+Together with the crypto rows of the type1 ledger (coins bought or sold for
+fiat), they go through the same validation and lot matching as stocks, in a
+`CryptoBook` valued with crypto quotes (see `data_fetching.fetch_crypto_quotes`).
+The book of the type1 ledger leaves its crypto rows to this book, whose
+disposals the tax tab adds to its own, so swaps are matched like sales.
+
+The value of a swap is the quantity of its USD stablecoin leg if it has one,
+else the acquired quantity at the last daily close of the acquired coin (or the
+disposed quantity at the close of the disposed coin). USD stablecoins are
+treated as cash and are not held as lots.
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from portfolio_tracker.config import config
+from portfolio_tracker.data_fetching import (
+    SplitRegistry,
+    fetch_close_prices,
+    fetch_crypto_quotes,
+)
+from portfolio_tracker.fees import FeeAllocation, fees_by_day
+from portfolio_tracker.loader import read_type2
+from portfolio_tracker.manager import PortfolioBook
+from portfolio_tracker.snapshot import PriceSnapshot
+from portfolio_tracker.validation import TYPE1_COLUMNS
+
+ASSET_TYPE = "crypto"
+USD_STABLECOINS = frozenset({"USD", "USDT", "USDC", "DAI", "BUSD", "TUSD"})
+# Ticker of the daily USD closes of a coin
+HISTORY_TICKER = "{}-USD"
+# Days before a swap searched for the last close
+HISTORY_LOOKBACK_DAYS = 7
+
+
+class NoSplits(SplitRegistry):
+    """Split registry of assets that never split, looking nothing up."""
+
+    def prefetch(self, symbols) -> None:
+        pass
+
+    def get(self, symbols) -> dict[str, pd.Series]:
+        return {}
+
+
+no_splits = NoSplits()
+
+
+class CryptoBook(PortfolioBook):
+    """PortfolioBook of cryptocurrencies, valued with crypto quotes."""
+
+    separate_asset_types = ()
+
+    def __init__(
+        self,
+        transactions: pd.DataFrame,
+        splits: SplitRegistry = no_splits,
+        cost_basis: str = config.cost_basis,
+        transaction_fees: np.ndarray | None = None,
+    ) -> None:
+        """
+        Parameters:
+        - transactions: Crypto transactions in the format of the type1 ledger
+        - transaction_fees: Transaction fee of every transaction in USD, as
+          allocated by the book of the type1 ledger (see `load_crypto_book`)
+        """
+        super().__init__(transactions, splits, cost_basis)
+        self.transaction_fees = transaction_fees
+
+    def _init_prices(self) -> None:
+        super()._init_prices()
+        self.snapshot = PriceSnapshot(fetch_quotes=fetch_crypto_quotes)
+
+    def fee_allocation(self) -> FeeAllocation | None:
+        """Transaction fees of the book, charged on the day of their trades."""
+        if self.transaction_fees is None:
+            return None
+        if self._fee_allocation is None:
+            self._fee_allocation = FeeAllocation(
+                self.transaction_fees,
+                fees_by_day(
+                    self.transactions["date"].to_numpy(), self.transaction_fees
+                ),
+            )
+        return self._fee_allocation
+
+
+def load_crypto_book(
+    book: PortfolioBook, path: Path = config.type2_path
+) -> CryptoBook | None:
+    """
+    Build the crypto book from the swaps of the type2 ledger and the crypto
+    transactions of a book of the type1 ledger.
+
+    Parameters:
+    - book: Book of the type1 ledger
+    - path: Path of the type2 ledger, if any
+
+    Returns:
+    - CryptoBook, or None if there are no crypto transactions. Transaction fees
+      of the book are kept on its crypto transactions; swaps bear none.
+    """
+    rows = book.index.type_rows.get(ASSET_TYPE, np.empty(0, dtype=int))
+    transactions = [book.transactions.iloc[rows]]
+    if Path(path).exists():
+        transactions.append(swaps_to_transactions(read_type2(path)))
+    transactions = pd.concat(transactions)
+    if transactions.empty:
+        return None
+    order = np.argsort(transactions["date"].to_numpy(), kind="stable")
+
+    allocation = book.fee_allocation()
+    fees = None
+    if allocation is not None:
+        fees = np.zeros(len(transactions))
+        fees[: len(rows)] = allocation.transaction_fees[rows]
+        fees = fees[order]
+    return CryptoBook(transactions.iloc[order], transaction_fees=fees)
+
+
+def swaps_to_transactions(swaps: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convert swaps to type1 transactions in USD.
+
+    Parameters:
+    - swaps: Date-sorted swaps of the type2 ledger (see `loader.read_type2`)
+
+    Returns:
+    - DataFrame with the columns of the type1 ledger: for every swap, a sell of
+      `security_1` followed by a buy of `security_2` (stablecoin legs left
+      out), labelled as the swap.
+    """
+    disposed = swaps["security_1"].to_numpy()
+    acquired = swaps["security_2"].to_numpy()
+    disposed_quantity = swaps["quantity_security_1"].to_numpy(dtype=float)
+    acquired_quantity = swaps["quantity_security_2"].to_numpy(dtype=float)
+    value = swap_values(swaps)
+
+    legs = []
+    for order, action, securities, quantity in (
+        (0, "sell", disposed, disposed_quantity),
+        (1, "buy", acquired, acquired_quantity),
+    ):
+        rows = ~np.isin(securities, list(USD_STABLECOINS))
+        legs.append(
+            pd.DataFrame(
+                {
+                    "date": swaps["date"].to_numpy()[rows],
+                    "security": securities[rows],
+                    "type_of_asset": ASSET_TYPE,
+                    "action": action,
+                    "quantity": quantity[rows],
+                    "price_per_share": value[rows] / quantity[rows],
+                    "total_transaction_price": value[rows],
+                    "currency": "USD",
+                    # Position of the leg: swap by swap, sell before buy
+                    "order": 2 * np.flatnonzero(rows) + order,
+                },
+                index=swaps.index[rows],
+            )
+        )
+    transactions = pd.concat(legs).sort_values("order", kind="stable")
+    return transactions[TYPE1_COLUMNS]
+
+
+def swap_values(swaps: pd.DataFrame) -> np.ndarray:
+    """
+    USD values of swaps, from their stablecoin legs or from daily closes.
+
+    Raises:
+    - ValueError listing the swaps that could not be valued.
+    """
+    disposed = swaps["security_1"].to_numpy()
+    acquired = swaps["security_2"].to_numpy()
+    disposed_quantity = swaps["quantity_security_1"].to_numpy(dtype=float)
+    acquired_quantity = swaps["quantity_security_2"].to_numpy(dtype=float)
+    stablecoins = list(USD_STABLECOINS)
+    value = np.where(
+        np.isin(disposed, stablecoins),
+        disposed_quantity,
+        np.where(np.isin(acquired, stablecoins), acquired_quantity, np.nan),
+    )
+
+    priced = np.flatnonzero(np.isnan(value))
+    if priced.size:
+        dates = swaps["date"].to_numpy()[priced]
+        coins = np.concatenate([acquired[priced], disposed[priced]])
+        closes = _closes_on(coins, np.concatenate([dates, dates]))
+        acquired_close, disposed_close = np.split(closes, 2)
+        value[priced] = np.where(
+            np.isnan(acquired_close),
+            disposed_quantity[priced] * disposed_close,
+            acquired_quantity[priced] * acquired_close,
+        )
+
+    missing = np.isnan(value)
+    if missing.any():
+        lines = ", ".join(str(label + 2) for label in swaps.index[missing])
+        raise ValueError(
+            f"No USD price to value the swaps of type2 ledger: lines {lines}"
+        )
+    return value
+
+
+def _closes_on(coins: np.ndarray, dates: np.ndarray) -> np.ndarray:
+    """Last daily USD close of every coin on its date, NaN if unknown."""
+    tickers = {coin: HISTORY_TICKER.format(coin) for coin in dict.fromkeys(coins)}
+    history = fetch_close_prices(
+        list(tickers.values()),
+        pd.Timestamp(dates.min()) - pd.Timedelta(days=HISTORY_LOOKBACK_DAYS),
+        pd.Timestamp(dates.max()),
+    )
+
+    closes = np.full(len(coins), np.nan)
+    for coin, ticker in tickers.items():
+        series = history[ticker].dropna() if ticker in history else None
+        if series is None or series.empty:
+            continue
+        rows = coins == coin
+        position = series.index.searchsorted(dates[rows], side="right") - 1
+        closes[rows] = np.where(
+            position >= 0, series.to_numpy()[np.maximum(position, 0)], np.nan
+        )
+    return closes
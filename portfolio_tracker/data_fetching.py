@@ -1,130 +1,531 @@
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import numpy as np
 import pandas as pd
 
-import yfinance as yf
+from portfolio_tracker.cache import get_cache
 from portfolio_tracker.config import config
-import ccxt
+from portfolio_tracker.providers import PROVIDER_ERRORS, get_provider
 # from forex_python.converter import CurrencyRates
 
+# Earliest date from which stock splits are looked up
+SPLITS_START_DATE = pd.Timestamp("1970-01-01")
+
+# Day 0 of the arrays of daily exchange rates
+FX_EPOCH = np.datetime64("1970-01-01", "D")
+# Days fetched before the first requested date, so it has a rate to carry forward
+FX_LOOKBACK_DAYS = 5
+
+# Exchange quoting the cryptocurrencies missing from `config.crypto_exchange_map`
+DEFAULT_CRYPTO_EXCHANGE = "binance"
+CRYPTO_QUOTE_PREFIX = "crypto:"
+
+
+def fetch_stock_prices(
+    symbols: list[str],
+    currency: str="USD",
+) -> dict[str, float]:
+    """
+    Fetches the current prices of multiple stocks or index funds.
+
+    Parameters:
+    - symbols: List of ticker symbols of the stocks/index funds (e.g., ['AAPL', 'MSFT'])
+    - currency: Currency to convert to (e.g., 'USD' or 'GBP')
+
+    Returns:
+    - Dictionary where keys are symbols and values are current prices in the specified currency.
+      Symbols whose price could not be fetched are reported and left out.
+    """
+    prices, failures = fetch_stock_quotes(symbols)
+    for symbol, reason in failures.items():
+        print(f"Error fetching price for {symbol}: {reason}")
+
+    exchange_rate = fx_rates.rate("USD", currency)
+
+    return {symbol: price * exchange_rate for symbol, price in prices.items()}
 
-def fetch_exchange_rate(
-    base_currency: str,
-    target_currency: str,
+
+def fetch_close_prices(
+    symbols: list[str],
     start_date,
     end_date,
 ) -> pd.DataFrame:
     """
-    Fetches the exchange rates between two currencies for a specific date range.
+    Fetches the daily closing prices of several securities, adjusted for
+    splits but not for dividends, requesting the symbols concurrently.
 
     Parameters:
-    - base_currency: Base currency code (e.g., 'USD')
-    - target_currency: Target currency code (e.g., 'GBP')
-    - start_date: Start date for the data (YYYY-MM-DD)
-    - end_date: End date for the data (YYYY-MM-DD)
+    - symbols: List of ticker symbols of the stocks/index funds
+    - start_date, end_date: Date range of the prices (inclusive)
 
     Returns:
-    - DataFrame with exchange rates and dates formatted as '%m/%d/%Y'.
+    - DataFrame indexed by date, with a column of closing prices per symbol.
+      Symbols whose prices could not be fetched are reported and left out.
     """
-    ticker = f"{base_currency}{target_currency}=X"
-    data = yf.Ticker(ticker)
 
-    # Fetch data with a slightly larger range to ensure start_date is included
-    fetch_start_date = pd.to_datetime(start_date) - pd.DateOffset(days=5)
-    fetch_end_date = pd.to_datetime(end_date) + pd.DateOffset(days=5)
+    def fetch(symbol: str) -> pd.Series:
+        # Not 'history:', under which dividend-adjusted closes were cached
+        return _get_series(
+            f"close:{symbol}",
+            start_date,
+            end_date,
+            lambda start, end: get_provider().get_history(symbol, start, end),
+        )
+
+    closes, failures = _fetch_concurrently(fetch, list(symbols))
+    for symbol, reason in failures.items():
+        print(f"Error fetching price history for {symbol}: {reason}")
 
-    hist = data.history(start=fetch_start_date, end=fetch_end_date)
+    return pd.DataFrame(
+        {symbol: closes[symbol] for symbol in symbols if symbol in closes}
+    )
 
-    if not hist.empty:
-        # Reset index to have 'Date' as a column
-        hist_reset = hist[["Close"]].reset_index()
 
-        # Format the 'Date' column
-        hist_reset["Date"] = hist_reset["Date"].dt.strftime("%m/%d/%Y")
-        hist_reset = hist_reset.rename(columns={"Close": "exchange_rate"})
+def fetch_stock_quotes(
+    symbols: list[str],
+    ttl: int | None = None,
+) -> tuple[dict[str, float], dict[str, str]]:
+    """
+    Fetches the current prices of multiple stocks or index funds in USD,
+    requesting the symbols concurrently.
 
-        # Set the formatted date column as the index
-        hist_reset = hist_reset[["Date", "exchange_rate"]]
-        hist_reset.set_index("Date", inplace=True)
+    Parameters:
+    - symbols: List of ticker symbols of the stocks/index funds
+    - ttl: Seconds for which quotes cached on disk are reused (defaults to
+      `config.cache.quote_ttl`; 0 always fetches)
 
-        # Ensure the DataFrame includes all dates from start_date to end_date
-        all_dates = pd.date_range(start=start_date, end=end_date).strftime("%m/%d/%Y")
-        full_df = pd.DataFrame(index=all_dates)
-        full_df = full_df.join(hist_reset, how="left")
+    Returns:
+    - prices: Dictionary where keys are symbols and values are current prices.
+    - failures: Dictionary where keys are symbols whose price could not be
+      fetched and values are the reasons.
+    """
+    failures = {}
 
-        # Fill in missing values
-        full_df["exchange_rate"] = full_df["exchange_rate"].ffill()  # Forward fill
-        full_df["exchange_rate"] = full_df["exchange_rate"].bfill()  # Backward fill
+    def fetch(stale_symbols: list[str]) -> dict[str, float]:
+        prices, fetch_failures = _fetch_concurrently(_fetch_quote, stale_symbols)
+        failures.update(fetch_failures)
+        return prices
 
-        return full_df
+    if get_provider().cacheable:
+        prices = get_cache().get_quotes(symbols, fetch, ttl=ttl)
     else:
-        # Return an empty DataFrame with the correct columns if no data was fetched
-        all_dates = pd.date_range(start=start_date, end=end_date).strftime("%m/%d/%Y")
-        full_df = pd.DataFrame(index=all_dates, columns=["exchange_rate"])
-        return full_df
+        prices = fetch(list(symbols))
 
+    return prices, failures
 
-def fetch_stock_prices(
+
+def _fetch_quote(symbol: str) -> float:
+    """Fetches the current price of a single stock."""
+    quotes = get_provider().get_quotes([symbol])
+    if symbol not in quotes:
+        raise LookupError("no price data returned")
+    return quotes[symbol]
+
+
+def _fetch_concurrently(
+    fetch: Callable[[str], object],
+    items: list[str],
+) -> tuple[dict, dict[str, str]]:
+    """
+    Calls `fetch(item)` for every item on a bounded thread pool, retrying the
+    items that failed with a provider error (see `providers.PROVIDER_ERRORS`)
+    or timed out. Items without data (LookupError) are not retried, and other
+    errors are raised.
+
+    Returns:
+    - results: Dictionary of item -> result, for the items that succeeded
+    - failures: Dictionary of item -> reason, for the items that failed every attempt
+    """
+    settings = config.market_data
+    results = {}
+    failures = {}
+    pending = list(items)
+
+    for attempt in range(settings.retries + 1):
+        if not pending:
+            break
+        if attempt:
+            time.sleep(0.5 * 2 ** (attempt - 1))  # Back off before retrying
+
+        workers = min(settings.max_workers, len(pending))
+        executor = ThreadPoolExecutor(max_workers=workers)
+        futures = {executor.submit(fetch, item): item for item in pending}
+        # Each request gets `timeout` seconds once it has a worker
+        rounds = -(-len(pending) // workers)
+        done, not_done = wait(futures, timeout=settings.timeout * rounds)
+        executor.shutdown(wait=False, cancel_futures=True)
+
+        retry = []
+        for future in done:
+            item = futures[future]
+            try:
+                results[item] = future.result()
+                failures.pop(item, None)
+            except LookupError as e:
+                # Missing data will not appear by asking again
+                failures[item] = str(e)
+            except PROVIDER_ERRORS as e:
+                failures[item] = str(e) or type(e).__name__
+                retry.append(item)
+        for future in not_done:
+            failures[futures[future]] = "timed out"
+            retry.append(futures[future])
+        pending = retry
+
+    return results, failures
+
+
+def fetch_crypto_prices(
     symbols: list[str],
     currency: str="USD",
 ) -> dict[str, float]:
     """
-    Fetches the current prices of multiple stocks or index funds.
+    Fetches the current prices of multiple cryptocurrencies.
 
     Parameters:
-    - symbols: List of ticker symbols of the stocks/index funds (e.g., ['AAPL', 'MSFT'])
-    - currency: Currency to convert to ('USD' or 'GBP')
+    - symbols: List of ticker symbols of the cryptocurrencies (e.g., ['BTC', 'ETH'])
+    - currency: Currency to convert to (e.g., 'USD' or 'GBP')
 
     Returns:
     - Dictionary where keys are symbols and values are current prices in the specified currency.
+      Symbols whose price could not be fetched are reported and left out.
     """
-    prices = {}
-    tickers = yf.Tickers(" ".join(symbols))
-    exchange_rate = fetch_exchange_rate("USD", "GBP") if currency == "GBP" else 1
+    prices, failures = fetch_crypto_quotes(symbols)
+    for symbol, reason in failures.items():
+        print(f"Error fetching price for {symbol}: {reason}")
 
-    for symbol in symbols:
-        ticker = tickers.tickers[symbol]
-        data = ticker.history(period="1d")
-        if not data.empty:
-            price = data["Close"].iloc[-1] * exchange_rate
-            prices[symbol] = price
+    exchange_rate = fx_rates.rate("USD", currency)
 
-    return prices
+    return {symbol: price * exchange_rate for symbol, price in prices.items()}
 
 
-def fetch_crypto_price(
-    symbol: str,
-    currency: str="USD",
-) -> float:
+def fetch_crypto_quotes(
+    symbols: list[str],
+    ttl: int | None = None,
+) -> tuple[dict[str, float], dict[str, str]]:
     """
-    Fetches the current price of a cryptocurrency.
+    Fetches the current prices of multiple cryptocurrencies in USD (as USDT),
+    with one batched request per exchange (see `config.crypto_exchange_map`),
+    the exchanges being requested concurrently.
 
     Parameters:
-    - symbol: Ticker symbol of the cryptocurrency (e.g., 'BTC' for Bitcoin)
-    - currency: Currency to convert to ('USD' or 'GBP')
+    - symbols: List of ticker symbols of the cryptocurrencies
+    - ttl: Seconds for which quotes cached on disk are reused (defaults to
+      `config.cache.quote_ttl`; 0 always fetches)
 
     Returns:
-    - Current price of the cryptocurrency in the specified currency.
+    - prices: Dictionary where keys are symbols and values are current prices.
+    - failures: Dictionary where keys are symbols whose price could not be
+      fetched and values are the reasons.
     """
-    exchange_name = config.crypto_exchange_map.get(symbol, "binance")
-    exchange = getattr(ccxt, exchange_name)()
-    ticker = exchange.fetch_ticker(symbol + "/USDT")
-    price = ticker["last"]
+    failures = {}
 
-    return price if currency == "USD" else price * fetch_exchange_rate("USD", currency)
+    def fetch(stale_keys: list[str]) -> dict[str, float]:
+        by_exchange = {}
+        for key in stale_keys:
+            symbol = key.removeprefix(CRYPTO_QUOTE_PREFIX)
+            exchange_name = config.crypto_exchange_map.get(
+                symbol, DEFAULT_CRYPTO_EXCHANGE
+            )
+            by_exchange.setdefault(exchange_name, []).append(symbol)
 
+        quotes, exchange_failures = _fetch_concurrently(
+            lambda exchange_name: get_provider().get_crypto_quotes(
+                by_exchange[exchange_name], exchange_name
+            ),
+            list(by_exchange),
+        )
+        prices = {}
+        for exchange_name, exchange_symbols in by_exchange.items():
+            exchange_quotes = quotes.get(exchange_name, {})
+            for symbol in exchange_symbols:
+                if symbol in exchange_quotes:
+                    prices[CRYPTO_QUOTE_PREFIX + symbol] = exchange_quotes[symbol]
+                else:
+                    failures[symbol] = exchange_failures.get(
+                        exchange_name, f"not quoted on {exchange_name}"
+                    )
+        return prices
+
+    # Crypto quotes are cached apart from stock quotes of the same symbol
+    keys = [CRYPTO_QUOTE_PREFIX + symbol for symbol in symbols]
+    if get_provider().cacheable:
+        prices = get_cache().get_quotes(keys, fetch, ttl=ttl)
+    else:
+        prices = fetch(keys)
+
+    return {
+        key.removeprefix(CRYPTO_QUOTE_PREFIX): price for key, price in prices.items()
+    }, failures
 
-def fetch_stock_splits(
-    symbols: str,
-) -> dict:
-    """Detects and applies stock splits to transactions."""
-    stock_splits = {}
 
-    for stock in symbols:
-        # Fetch stock splits using yfinance
-        try:
-            stock_data = yf.Ticker(stock)
-            stock_splits[stock] = stock_data.splits
+class SplitRegistry:
+    """
+    Stock splits memoized for the whole process.
+
+    Splits are looked up concurrently, at most once per ticker, so every
+    PortfolioManager built from the same ledger shares the same lookups.
+    """
 
-        except Exception as e:
-            print(f"Error fetching stock splits for {stock}: {e}")
+    def __init__(self) -> None:
+        self._splits = {}
+        self._lock = threading.Lock()
 
-    return stock_splits
+    def prefetch(self, symbols) -> None:
+        """Looks up the splits of all symbols not looked up yet."""
+        with self._lock:
+            missing = [
+                symbol
+                for symbol in dict.fromkeys(symbols)
+                if symbol not in self._splits
+            ]
+            splits, failures = _fetch_concurrently(_fetch_splits, missing)
+            self._splits.update(splits)
+
+        for symbol, reason in failures.items():
+            print(f"Error fetching stock splits for {symbol}: {reason}")
+
+    def get(self, symbols) -> dict[str, pd.Series]:
+        """
+        Gets the splits of several symbols, looking up those not known yet.
+
+        Returns:
+        - Dictionary where keys are symbols and values are split ratios indexed
+          by split date. Symbols whose lookup failed are left out.
+        """
+        self.prefetch(symbols)
+        return {
+            symbol: self._splits[symbol] for symbol in symbols if symbol in self._splits
+        }
+
+
+def _fetch_splits(symbol: str) -> pd.Series:
+    """Fetches the splits of a single stock from the market data provider."""
+    return _get_series(
+        f"splits:{symbol}",
+        SPLITS_START_DATE,
+        pd.Timestamp.now(),
+        lambda start, end: get_provider().get_splits(symbol),
+        ttl=config.cache.splits_ttl,
+    )
+
+
+split_registry = SplitRegistry()
+
+
+def fetch_dividends(symbols, start_date) -> dict[str, pd.Series]:
+    """
+    Fetches the dividend histories of several stocks or index funds,
+    requesting the symbols concurrently.
+
+    Parameters:
+    - symbols: List of ticker symbols of the stocks/index funds
+    - start_date: First ex-dividend date of the histories
+
+    Returns:
+    - Dictionary where keys are symbols and values are split-adjusted dividends
+      per share in the trading currency, indexed by ex-dividend date. Symbols
+      whose dividends could not be fetched are reported and left out.
+    """
+
+    def fetch(symbol: str) -> pd.Series:
+        return _get_series(
+            f"dividends:{symbol}",
+            start_date,
+            pd.Timestamp.now(),
+            lambda start, end: get_provider().get_dividends(symbol),
+            ttl=config.cache.dividends_ttl,
+        )
+
+    dividends, failures = _fetch_concurrently(fetch, list(dict.fromkeys(symbols)))
+    for symbol, reason in failures.items():
+        print(f"Error fetching dividends for {symbol}: {reason}")
+
+    return dividends
+
+
+class FxRates:
+    """
+    Daily exchange rates memoized for the whole process.
+
+    The rates of every currency are held in USD, as a contiguous array of floats
+    indexed by day offset from `FX_EPOCH`, so looking up the rates of many
+    dates is a single array indexing. Days without a quote (weekends, holidays)
+    carry the last rate forward. The rate between two currencies is the ratio
+    of their USD rates (triangulation via USD, e.g., EUR→GBP), so one download
+    per currency serves every pair it is part of.
+
+    Rates of days up to today are fetched again once older than the quote TTL.
+    """
+
+    def __init__(self) -> None:
+        # {currency: (day offset of the first rate, USD rates)}
+        self._rates = {}
+        # {currency: monotonic time after which rates up to today are stale}
+        self._expires = {}
+        self._lock = threading.Lock()
+
+    def prefetch(self, spans: dict) -> None:
+        """
+        Loads the rates of several currencies over date ranges, fetching the
+        currencies not covered yet concurrently.
+
+        Parameters:
+        - spans: Dictionary where keys are currencies and values are
+          (first date, last date) tuples
+        """
+        ranges = {
+            currency: (_day_offset(first_date), _day_offset(last_date))
+            for currency, (first_date, last_date) in spans.items()
+            if currency != "USD"
+        }
+        with self._lock:
+            missing = {
+                currency: self._merged_range(currency, first_day, last_day)
+                for currency, (first_day, last_day) in ranges.items()
+                if not self._covers(currency, first_day, last_day)
+            }
+            rates, failures = _fetch_concurrently(
+                lambda currency: _fetch_usd_rates(currency, *missing[currency]),
+                list(missing),
+            )
+            today = _day_offset(pd.Timestamp.now())
+            for currency, currency_rates in rates.items():
+                first_day, last_day = missing[currency]
+                self._rates[currency] = (first_day, currency_rates)
+                if last_day >= today:
+                    self._expires[currency] = time.monotonic() + config.cache.quote_ttl
+                else:
+                    self._expires.pop(currency, None)
+
+        for currency, reason in failures.items():
+            print(f"Error fetching exchange rates for {currency}: {reason}")
+
+    def rates_for(self, base_currency: str, target_currency: str, dates) -> np.ndarray:
+        """
+        Exchange rates between two currencies on several dates.
+
+        Parameters:
+        - base_currency: Currency converted from (e.g., 'EUR')
+        - target_currency: Currency converted to (e.g., 'USD')
+        - dates: Dates of the rates
+
+        Returns:
+        - Array with the price of one unit of `base_currency` in
+          `target_currency` on every date, NaN where no rate is available.
+        """
+        days = _day_offset(dates)
+        if not days.size:
+            return np.empty(0)
+        span = (days.min() + FX_EPOCH, days.max() + FX_EPOCH)
+        self.prefetch({base_currency: span, target_currency: span})
+        return self._usd_rates(base_currency, days) / self._usd_rates(
+            target_currency, days
+        )
+
+    def rates_to(self, target_currency: str, currencies, dates) -> np.ndarray:
+        """
+        Exchange rates to one currency from a currency per date (e.g., the
+        currencies and dates of transactions), one lookup per distinct currency.
+
+        Returns:
+        - Array with the price of one unit of `currencies[i]` in
+          `target_currency` on `dates[i]`, NaN where no rate is available.
+        """
+        codes, distinct_currencies = pd.factorize(np.asarray(currencies))
+        dates = np.asarray(dates)
+        rates = np.ones(len(codes))
+        for code, currency in enumerate(distinct_currencies):
+            if currency != target_currency:
+                rows = codes == code
+                rates[rows] = self.rates_for(currency, target_currency, dates[rows])
+        return rates
+
+    def rate(self, base_currency: str, target_currency: str, date=None) -> float:
+        """Exchange rate between two currencies on a date (defaults to today)."""
+        date = pd.Timestamp.now() if date is None else date
+        return float(self.rates_for(base_currency, target_currency, [date])[0])
+
+    def _usd_rates(self, currency: str, days: np.ndarray) -> np.ndarray:
+        if currency == "USD":
+            return np.ones(len(days))
+        with self._lock:
+            first_day, rates = self._rates.get(currency, (0, None))
+        if rates is None:
+            return np.full(len(days), np.nan)
+        positions = days - first_day
+        inside = (positions >= 0) & (positions < len(rates))
+        return np.where(inside, rates[np.where(inside, positions, 0)], np.nan)
+
+    def _covers(self, currency: str, first_day: int, last_day: int) -> bool:
+        if currency not in self._rates:
+            return False
+        if time.monotonic() > self._expires.get(currency, np.inf):
+            return False
+        start, rates = self._rates[currency]
+        return start <= first_day and last_day < start + len(rates)
+
+    def _merged_range(self, currency: str, first_day: int, last_day: int) -> tuple:
+        """Range covering both the requested days and those already loaded."""
+        if currency in self._rates:
+            start, rates = self._rates[currency]
+            first_day = min(first_day, start)
+            last_day = max(last_day, start + len(rates) - 1)
+        return first_day, last_day
+
+
+def _fetch_usd_rates(currency: str, first_day: int, last_day: int) -> np.ndarray:
+    """
+    USD rates of a currency on every day from `first_day` to `last_day` (day
+    offsets from `FX_EPOCH`), carrying the last quote forward. Days before the
+    first quote take the first quote.
+    """
+    fetch_first_day = first_day - FX_LOOKBACK_DAYS
+    hist = _get_series(
+        f"history:{currency}USD=X",
+        pd.Timestamp(FX_EPOCH + fetch_first_day),
+        pd.Timestamp(FX_EPOCH + last_day),
+        lambda start, end: get_provider().get_fx_history(currency, "USD", start, end),
+    )
+    if hist.empty:
+        raise LookupError("no exchange rate data returned")
+
+    dates = pd.DatetimeIndex(hist.index)
+    if dates.tz is not None:
+        dates = dates.tz_localize(None)
+    quote_days = _day_offset(dates)
+    quotes = hist.to_numpy(dtype=float)
+    keep = (quote_days >= fetch_first_day) & (quote_days <= last_day)
+
+    rates = np.full(last_day - fetch_first_day + 1, np.nan)
+    rates[quote_days[keep] - fetch_first_day] = quotes[keep]
+    rates = pd.Series(rates).ffill().bfill().to_numpy()
+    return rates[FX_LOOKBACK_DAYS:]
+
+
+def _day_offset(dates):
+    """Day offsets from `FX_EPOCH` of a date or an array of dates."""
+    if np.ndim(dates) == 0:
+        return int((np.datetime64(pd.Timestamp(dates), "D") - FX_EPOCH).astype(int))
+    days = pd.DatetimeIndex(dates).to_numpy().astype("datetime64[D]")
+    return (days - FX_EPOCH).astype(np.int64)
+
+
+fx_rates = FxRates()
+
+
+def _get_series(
+    key: str,
+    start_date,
+    end_date,
+    fetch,
+    ttl: int | None = None,
+) -> pd.Series:
+    """Gets a daily series through the market data cache, unless the provider
+    serves local data that does not need caching."""
+    if get_provider().cacheable:
+        return get_cache().get_series(key, start_date, end_date, fetch, ttl=ttl)
+    return fetch(pd.Timestamp(start_date), pd.Timestamp(end_date))
@@ -0,0 +1,193 @@
+"""
+Dividend income.
+
+Dividend histories of the securities of the ledger are fetched concurrently
+through `data_fetching.fetch_dividends`, which caches them like stock splits
+(and reads them from the fixtures when offline). Dividends per share are
+split-adjusted, like the transactions of the book, so the shares entitled to a
+dividend are the split-adjusted holdings at the close of the day before its
+ex-dividend date.
+
+Holdings on the ex-dates of all securities are looked up at once: transactions
+sorted by security and date carry the running position of their security, and
+a single `searchsorted` on (security, day) keys finds the last transaction
+before every ex-date, so no Python loop runs per dividend.
+"""
+
+import numpy as np
+import pandas as pd
+
+from portfolio_tracker.data_fetching import fx_rates
+
+# Asset types paying dividends
+DIVIDEND_ASSET_TYPES = ["stock", "index_fund"]
+# Days of trailing income
+TRAILING_DAYS = 365
+# Shares below which a position counts as closed, for rounding errors
+SHARES_TOLERANCE = 1e-9
+
+DIVIDEND_COLUMNS = ["security", "ex_date", "dividend", "shares", "income"]
+
+
+def entitled_dividends(
+    transactions: pd.DataFrame,
+    dividends: dict[str, pd.Series],
+    currency: str = "USD",
+) -> pd.DataFrame:
+    """
+    Dividends the holdings of a ledger were entitled to.
+
+    Parameters:
+    - transactions: Split-adjusted, validated transactions
+    - dividends: Split-adjusted dividends per share in the trading currency of
+      each security, indexed by ex-dividend date (see
+      `data_fetching.fetch_dividends`)
+    - currency: Currency of the amounts, converted at the rate of the ex-dates
+
+    Returns:
+    - DataFrame with a row per dividend paid on held shares, sorted by
+      ex-dividend date, with the columns of `DIVIDEND_COLUMNS`: 'dividend' is
+      the dividend per share and 'income' the dividend of the held 'shares'.
+    """
+    dividends = {
+        security: series for security, series in dividends.items() if len(series)
+    }
+    if not dividends:
+        return pd.DataFrame(columns=DIVIDEND_COLUMNS).astype(
+            {
+                "ex_date": "datetime64[ns]",
+                **dict.fromkeys(["dividend", "shares", "income"], float),
+            }
+        )
+
+    securities = np.repeat(
+        list(dividends), [len(series) for series in dividends.values()]
+    )
+    ex_dates = pd.DatetimeIndex(
+        np.concatenate(
+            [
+                pd.DatetimeIndex(series.index).tz_localize(None).normalize()
+                for series in dividends.values()
+            ]
+        )
+    )
+    per_share = np.concatenate(
+        [series.to_numpy(dtype=float) for series in dividends.values()]
+    )
+    shares = holdings_before(transactions, securities, ex_dates)
+    held = shares > SHARES_TOLERANCE
+
+    # Dividends are paid in the trading currency of the security
+    trading_currency = transactions.drop_duplicates("security").set_index("security")[
+        "currency"
+    ]
+    currencies = trading_currency.reindex(securities[held]).to_numpy()
+    rates = fx_rates.rates_to(currency, currencies, ex_dates[held])
+    if np.isnan(rates).any():
+        missing = pd.unique(currencies[np.isnan(rates)])
+        raise ValueError(
+            f"Exchange rate to {currency} not available for the dividends in "
+            f"{', '.join(missing)}"
+        )
+
+    dividend = per_share[held] * rates
+    events = pd.DataFrame(
+        {
+            "security": securities[held],
+            "ex_date": ex_dates[held],
+            "dividend": dividend,
+            "shares": shares[held],
+            "income": dividend * shares[held],
+        }
+    )
+    return events.sort_values(["ex_date", "security"], ignore_index=True)
+
+
+def holdings_before(
+    transactions: pd.DataFrame, securities: np.ndarray, dates
+) -> np.ndarray:
+    """
+    Shares held of securities at the close of the days before some dates.
+
+    Parameters:
+    - transactions: Split-adjusted, validated transactions
+    - securities, dates: Security and date of every lookup
+
+    Returns:
+    - Array with the shares held for every lookup (zero for securities never
+      traded).
+    """
+    codes, traded = pd.factorize(transactions["security"])
+    days = transactions["date"].to_numpy(dtype="datetime64[D]").astype(np.int64)
+    quantity = transactions["quantity"].to_numpy(dtype=float)
+    is_buy = (transactions["action"] == "buy").to_numpy()
+    lookup_codes = traded.get_indexer(securities)
+    lookup_days = np.asarray(dates, dtype="datetime64[D]").astype(np.int64)
+    if not len(codes) or not len(lookup_codes):
+        return np.zeros(len(lookup_codes))
+
+    # Running position of every security, over its transactions sorted by date
+    order = np.lexsort((days, codes))
+    codes, days = codes[order], days[order]
+    running = np.cumsum(np.where(is_buy, quantity, -quantity)[order])
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    opening = np.r_[0.0, running[starts[1:] - 1]]
+    running -= np.repeat(opening, np.diff(np.r_[starts, len(codes)]))
+
+    # Keys ordered by security, then day
+    first_day = min(days.min(), lookup_days.min())
+    span = max(days.max(), lookup_days.max()) - first_day + 1
+    keys = codes * span + (days - first_day)
+    lookup_keys = lookup_codes * span + (lookup_days - first_day)
+    # Last transaction of the security strictly before the date
+    position = np.searchsorted(keys, lookup_keys, side="left") - 1
+    found = (
+        (lookup_codes >= 0)
+        & (position >= 0)
+        & (codes[np.maximum(position, 0)] == lookup_codes)
+    )
+    return np.where(found, running[np.maximum(position, 0)], 0.0)
+
+
+def dividend_summary(
+    events: pd.DataFrame, cost_basis: pd.Series, date=None
+) -> pd.DataFrame:
+    """
+    Dividend income per security.
+
+    Parameters:
+    - events: Entitled dividends (see `entitled_dividends`)
+    - cost_basis: Cost basis of the owned shares per security, in the currency
+      of the dividends
+    - date: Day the trailing income ends on (defaults to today)
+
+    Returns:
+    - DataFrame indexed by security, with the columns 'income' (all dividends),
+      'ttm_income' (dividends of the trailing 12 months), 'cost_basis' and
+      'yield_on_cost' (trailing income over cost basis, in %, NaN for
+      securities not owned).
+    """
+    date = pd.Timestamp.now() if date is None else pd.Timestamp(date)
+    trailing = events["ex_date"] > date.normalize() - pd.Timedelta(days=TRAILING_DAYS)
+    summary = pd.DataFrame(
+        {
+            "income": events.groupby("security")["income"].sum(),
+            "ttm_income": events["income"]
+            .where(trailing, 0.0)
+            .groupby(events["security"])
+            .sum(),
+        }
+    )
+    summary.index.name = "security"
+    summary["cost_basis"] = cost_basis.reindex(summary.index)
+    summary["yield_on_cost"] = (
+        summary["ttm_income"]
+        / summary["cost_basis"].where(summary["cost_basis"] > 0)
+        * 100
+    )
+    return summary
+
+
+def monthly_income(events: pd.DataFrame) -> pd.Series:
+    """Dividend income per calendar month of the ex-dividend dates."""
+    return events.groupby(events["ex_date"].dt.to_period("M"))["income"].sum()
@@ -0,0 +1,157 @@
+"""
+Commissions of the type3 ledger.
+
+Fees are of two kinds:
+
+- transaction fees are charged on trades: each is allocated to the trades of
+  the last trading day on or before it (within `TRANSACTION_FEE_WINDOW`), in
+  proportion to their value. The fee of a buy is part of the cost basis of its
+  shares and the fee of a sell reduces its proceeds (see
+  `reporting.fees_in_currency`).
+- platform fees are charged on the account, as a daily time series of amounts
+  paid into the portfolio for nothing in return, which lowers its returns (see
+  `performance.portfolio_history`). Transaction fees with no trade to be
+  allocated to are charged the same way.
+
+Fees are matched with trading days by a single `merge_asof`, and split among
+the trades of a day with array lookups, so no row is visited in Python.
+"""
+
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from portfolio_tracker.config import config
+from portfolio_tracker.data_fetching import fx_rates
+from portfolio_tracker.loader import read_type3
+
+TRANSACTION_FEE = "transaction"
+PLATFORM_FEE = "platform"
+FEE_TYPES = [TRANSACTION_FEE, PLATFORM_FEE]
+
+# Days after a trade during which a transaction fee is still charged on it
+TRANSACTION_FEE_WINDOW = pd.Timedelta(days=7)
+
+
+@dataclass(frozen=True)
+class FeeAllocation:
+    """Fees of a ledger, in USD."""
+
+    # Transaction fee of every transaction, aligned with the ledger
+    transaction_fees: np.ndarray
+    # Fees charged on each day, indexed by date: allocated transaction fees on
+    # the day of their trades, other fees on their own day
+    daily_fees: pd.Series
+
+
+def load_fees(path: Path = config.type3_path) -> pd.DataFrame | None:
+    """
+    Read the type3 ledger, if any, checking its fee types.
+
+    Returns:
+    - DataFrame of fees (see `loader.read_type3`), or None if there is no ledger.
+    """
+    if not Path(path).exists():
+        return None
+    fees = read_type3(path)
+    unknown = ~fees["commision_type"].isin(FEE_TYPES)
+    if unknown.any():
+        lines = ", ".join(str(label + 2) for label in fees.index[unknown])
+        raise ValueError(
+            f"Unknown commission types in type3 ledger (expected one of "
+            f"{FEE_TYPES}): lines {lines}"
+        )
+    return fees
+
+
+def allocate_fees(fees: pd.DataFrame, transactions: pd.DataFrame) -> FeeAllocation:
+    """
+    Allocate the transaction fees of the type3 ledger to transactions.
+
+    Parameters:
+    - fees: Date-sorted fees (see `load_fees`)
+    - transactions: Validated transactions
+
+    Returns:
+    - FeeAllocation of the fees.
+    """
+    amount = _in_usd(fees["amount"], fees["currency"], fees["date"], "fees")
+    fee_dates = fees["date"].dt.normalize()
+    is_transaction_fee = (fees["commision_type"] == TRANSACTION_FEE).to_numpy()
+
+    # Trading days, and the USD value of every transaction
+    days = transactions["date"].dt.normalize()
+    trading_days = pd.DatetimeIndex(days.unique()).sort_values()
+    day = trading_days.searchsorted(days)
+    value = _in_usd(
+        transactions["total_transaction_price"],
+        transactions["currency"],
+        transactions["date"],
+        "transactions",
+    )
+
+    # Last trading day of every transaction fee, NaT if none in the window
+    matched = pd.merge_asof(
+        pd.DataFrame({"date": fee_dates[is_transaction_fee].to_numpy()}),
+        pd.DataFrame({"date": trading_days, "trading_day": trading_days}),
+        on="date",
+        direction="backward",
+        tolerance=TRANSACTION_FEE_WINDOW,
+    )["trading_day"]
+    allocated = matched.notna().to_numpy()
+    if not allocated.all():
+        unallocated = fee_dates[is_transaction_fee][~allocated]
+        print(
+            "Transaction fees without trades in the "
+            f"{TRANSACTION_FEE_WINDOW.days} days before, charged as platform "
+            f"fees: {', '.join(unallocated.dt.strftime('%d/%m/%Y'))}"
+        )
+
+    # Fees of every trading day, split among its trades by value (or evenly
+    # if they are all worth nothing)
+    day_fees = np.bincount(
+        trading_days.searchsorted(matched[allocated]),
+        weights=amount[is_transaction_fee][allocated],
+        minlength=len(trading_days),
+    )
+    day_value = np.bincount(day, weights=value, minlength=len(trading_days))
+    day_count = np.bincount(day, minlength=len(trading_days))
+    share = np.where(
+        day_value[day] > 0,
+        np.divide(value, day_value[day], out=np.zeros_like(value), where=value > 0),
+        1 / day_count[day],
+    )
+    transaction_fees = day_fees[day] * share
+
+    # Fees left to charge on their own day
+    charged = ~is_transaction_fee
+    charged[is_transaction_fee] = ~allocated
+    daily_fees = fees_by_day(
+        np.concatenate([trading_days, fee_dates[charged]]),
+        np.concatenate([day_fees, amount[charged]]),
+    )
+    return FeeAllocation(transaction_fees, daily_fees)
+
+
+def fees_by_day(dates, amounts: np.ndarray) -> pd.Series:
+    """Sums of fees per day, indexed by date, leaving out days without fees."""
+    daily_fees = (
+        pd.Series(amounts, index=pd.DatetimeIndex(dates, name="date").normalize())
+        .groupby(level="date")
+        .sum()
+    )
+    return daily_fees[daily_fees != 0]
+
+
+def _in_usd(amounts: pd.Series, currencies, dates, ledger: str) -> np.ndarray:
+    """Amounts converted to USD at the exchange rate of their date."""
+    rates = fx_rates.rates_to("USD", currencies.to_numpy(), dates.to_numpy())
+    if np.isnan(rates).any():
+        missing = currencies[np.isnan(rates)].unique()
+        raise ValueError(
+            f"Exchange rate to USD not available for the {ledger} in "
+            f"{', '.join(missing)}"
+        )
+    return amounts.to_numpy(dtype=float) * rates
@@ -6,9 +6,24 @@ from dash.dash_table import DataTable
 from plotly.graph_objects import Figure
 
 from portfolio_tracker.config import config
+from portfolio_tracker.benchmark import BenchmarkComparison
+from portfolio_tracker.dividends import monthly_income
+from portfolio_tracker.format import format_dataframe
 from portfolio_tracker.plotter import (
+    create_benchmark_plot,
+    create_dividend_income_plot,
+    create_drawdown_plot,
     create_portfolio_distribution_plot,
+    create_returns_plot,
+    create_rolling_risk_plot,
     create_unrealized_gains_plot,
+    create_value_history_plot,
+)
+from portfolio_tracker.tax import (
+    BED_AND_BREAKFAST,
+    SAME_DAY,
+    SECTION_104,
+    TAX_CURRENCY,
 )
 
 # Define style for tab buttons
@@ -28,7 +43,13 @@ tab_selected_style = {
 }
 
 
-def generate_style_data_conditional():
+def generate_style_data_conditional(
+    columns_to_style: tuple[str, ...] = (
+        "Realized gains",
+        "Net realized gains",
+        "Rate of return (%)",
+    ),
+):
     """
     Generate conditional styles for the DataTable.
     Applies coloring based on positive/negative values in specific columns.
@@ -38,12 +59,6 @@ def generate_style_data_conditional():
         (config.colors.red_color, config.colors.txt_color),
     ]
 
-    # Define the columns to apply conditional formatting
-    columns_to_style = [
-        "Realized gains",
-        "Rate of return (%)",
-    ]
-
     # Generate the style rules
     style_data_conditional = []
     for col in columns_to_style:
@@ -77,6 +92,11 @@ def generate_style_data_conditional():
 style_data_conditional = generate_style_data_conditional()
 
 
+def overview_table_data(portfolio_overview: pd.DataFrame) -> list[dict]:
+    """Records of the Portfolio Overview table."""
+    return portfolio_overview.reset_index().to_dict("records")
+
+
 def create_figure_card(
     title=str,
     card_id=str,
@@ -97,50 +117,78 @@ def create_figure_card(
     )
 
 
+def create_table_card(
+    title: str,
+    table_id: str,
+    df: pd.DataFrame,
+    columns_to_style: tuple[str, ...] = (),
+    columns: list[dict] | None = None,
+    paged: bool = True,
+) -> dbc.Card:
+    """
+    Create a Dash Card for a table, sortable and paged unless `paged` is False.
+    `columns` names the columns of the table (defaults to those of `df`).
+    """
+    paging = {
+        "sort_action": "native",
+        "sort_mode": "multi",
+        "page_action": "native",
+        "page_size": 20,
+    }
+    return dbc.Card(
+        [
+            dbc.CardHeader(html.H4(title)),
+            dbc.CardBody(
+                DataTable(
+                    data=df.to_dict("records"),
+                    columns=columns or [{"name": i, "id": i} for i in df.columns],
+                    id=table_id,
+                    style_table={"overflowX": "auto"},
+                    style_data={
+                        "backgroundColor": "rgb(50, 50, 50)",
+                        "color": config.colors.txt_color,
+                    },
+                    style_cell={"textAlign": "center"},
+                    style_header={
+                        "fontWeight": "bold",
+                        "backgroundColor": "rgb(30, 30, 30)",
+                        "color": config.colors.txt_color,
+                    },
+                    style_data_conditional=generate_style_data_conditional(
+                        columns_to_style
+                    ),
+                    **(paging if paged else {}),
+                )
+            ),
+        ],
+        className="shadow-sm mb-4",
+    )
+
+
 def create_tab_layout(
     df_realized_gains: pd.DataFrame,
     portfolio_overview: pd.DataFrame,
     owned_assets_dict: dict,
     current_stock_values: dict,
     unrealized_gains_dict: dict,
+    currency: str = "USD",
 ):
     """Create the layout for a single tab in the Dash app."""
-    style_data_conditional = generate_style_data_conditional()
-
     return dbc.Container(
         [
             # Portfolio Overview Table
             dbc.Row(
                 [
                     dbc.Col(
-                        dbc.Card(
-                            [
-                                dbc.CardHeader(html.H4("Portfolio Overview")),
-                                dbc.CardBody(
-                                    DataTable(
-                                        data=portfolio_overview.reset_index().to_dict(
-                                            "records"
-                                        ),
-                                        columns=[
-                                            {"name": "Metric", "id": "Metric"},
-                                            {"name": "Value (USD)", "id": "Stocks"},
-                                        ],
-                                        id="portfolio-overview-table",
-                                        style_table={"overflowX": "auto"},
-                                        style_data={
-                                            "backgroundColor": "rgb(50, 50, 50)",
-                                            "color": config.colors.txt_color,
-                                        },
-                                        style_cell={"textAlign": "center"},
-                                        style_header={
-                                            "fontWeight": "bold",
-                                            "backgroundColor": "rgb(30, 30, 30)",
-                                            "color": config.colors.txt_color,
-                                        },
-                                    )
-                                ),
+                        create_table_card(
+                            "Portfolio Overview",
+                            "portfolio-overview-table",
+                            portfolio_overview.reset_index(),
+                            columns=[
+                                {"name": "Metric", "id": "Metric"},
+                                {"name": f"Value ({currency})", "id": "Stocks"},
                             ],
-                            className="shadow-sm mb-4",
+                            paged=False,
                         ),
                         width=12,
                     ),
@@ -178,42 +226,282 @@ def create_tab_layout(
             dbc.Row(
                 [
                     dbc.Col(
-                        dbc.Card(
-                            [
-                                dbc.CardHeader(html.H4("Realized Gains")),
-                                dbc.CardBody(
-                                    DataTable(
-                                        data=df_realized_gains.to_dict("records"),
-                                        columns=[
-                                            {"name": i, "id": i}
-                                            for i in df_realized_gains.columns
-                                        ],
-                                        id="realized-gains-table",
-                                        style_table={"overflowX": "auto"},
-                                        style_data={
-                                            "backgroundColor": "rgb(50, 50, 50)",
-                                            "color": config.colors.txt_color,
-                                        },
-                                        style_cell={"textAlign": "center"},
-                                        style_header={
-                                            "fontWeight": "bold",
-                                            "backgroundColor": "rgb(30, 30, 30)",
-                                            "color": config.colors.txt_color,
-                                        },
-                                        style_data_conditional=style_data_conditional,
-                                        sort_action="native",
-                                        sort_mode="multi",
-                                        page_action="native",
-                                        page_size=20,
-                                    )
-                                ),
-                            ],
-                            className="shadow-sm mb-4",
+                        create_table_card(
+                            "Realized Gains",
+                            "realized-gains-table",
+                            df_realized_gains,
+                            columns_to_style=(
+                                "Realized gains",
+                                "Net realized gains",
+                                "Rate of return (%)",
+                            ),
+                        ),
+                        width=12,
+                    ),
+                ]
+            ),
+            # Spacer Row
+            dbc.Row(
+                html.Div(style={"height": "100px"}),
+            ),
+        ],
+        fluid=True,
+        className="p-4",
+    )
+
+
+def create_performance_layout(
+    history: pd.DataFrame,
+    benchmark: BenchmarkComparison,
+):
+    """Create the layout of the performance tab in the Dash app."""
+    metrics = benchmark.metrics
+    window = f"{benchmark.window}-day"
+
+    return dbc.Container(
+        [
+            # Portfolio Value Plot
+            dbc.Row(
+                [
+                    dbc.Col(
+                        create_figure_card(
+                            title="Portfolio Value",
+                            card_id="portfolio-value-history",
+                            figure=create_value_history_plot(
+                                history, benchmark.currency
+                            ),
+                        ),
+                        width=12,
+                    ),
+                ]
+            ),
+            # Returns Plot
+            dbc.Row(
+                [
+                    dbc.Col(
+                        create_figure_card(
+                            title="Returns",
+                            card_id="portfolio-returns",
+                            figure=create_returns_plot(history),
+                        ),
+                        width=12,
+                    ),
+                ]
+            ),
+            # Benchmark Comparison Plot
+            dbc.Row(
+                [
+                    dbc.Col(
+                        create_figure_card(
+                            title=f"Portfolio vs {benchmark.ticker}",
+                            card_id="benchmark-comparison",
+                            figure=create_benchmark_plot(
+                                benchmark.levels, benchmark.ticker
+                            ),
+                        ),
+                        width=12,
+                    ),
+                ]
+            ),
+            # Drawdown Plot
+            dbc.Row(
+                [
+                    dbc.Col(
+                        create_figure_card(
+                            title="Drawdown",
+                            card_id="benchmark-drawdown",
+                            figure=create_drawdown_plot(metrics, benchmark.ticker),
                         ),
                         width=12,
                     ),
                 ]
             ),
+            # Rolling Risk Plot
+            dbc.Row(
+                [
+                    dbc.Col(
+                        create_figure_card(
+                            title=f"Rolling Risk ({window})",
+                            card_id="benchmark-rolling-risk",
+                            figure=create_rolling_risk_plot(metrics, benchmark.ticker),
+                        ),
+                        width=12,
+                    ),
+                ]
+            ),
+            # Spacer Row
+            dbc.Row(
+                html.Div(style={"height": "100px"}),
+            ),
+        ],
+        fluid=True,
+        className="p-4",
+    )
+
+
+def create_tax_layout(disposals: pd.DataFrame, tax_years: pd.DataFrame):
+    """
+    Create the layout of the tax tab in the Dash app.
+
+    Parameters:
+    - disposals: Matched disposals (see `tax.match_disposals`)
+    - tax_years: Gains per tax year (see `tax.tax_year_summary`)
+    """
+    tax_years = tax_years.reset_index().rename(
+        columns={
+            "tax_year": "Tax year",
+            "disposals": "Disposals",
+            "proceeds": "Proceeds",
+            "allowable_cost": "Allowable costs",
+            "gains": "Gains",
+            "losses": "Losses",
+            "net_gain": "Net gain",
+        }
+    )
+    disposals = disposals.rename(
+        columns={
+            "security": "Asset",
+            "date": "Date",
+            "tax_year": "Tax year",
+            "rule": "Rule",
+            "acquisition_date": "Acquired",
+            "quantity": "Shares",
+            "proceeds": "Proceeds",
+            "allowable_cost": "Allowable cost",
+            "gain": "Gain",
+        }
+    )
+    disposals["Rule"] = disposals["Rule"].map(
+        {
+            SAME_DAY: "Same day",
+            BED_AND_BREAKFAST: "30 days",
+            SECTION_104: "Section 104",
+        }
+    )
+    disposals["Acquired"] = disposals["Acquired"].dt.strftime("%d-%m-%Y").fillna("")
+    tax_years = format_dataframe(
+        _dataframe=tax_years,
+        cols_to_format=["Proceeds", "Allowable costs", "Gains", "Losses", "Net gain"],
+    )
+    disposals = format_dataframe(
+        _dataframe=disposals,
+        cols_to_format=["Proceeds", "Allowable cost", "Gain"],
+        date_column="Date",
+    )
+
+    return dbc.Container(
+        [
+            dbc.Row(
+                dbc.Col(
+                    create_table_card(
+                        f"Capital Gains per Tax Year ({TAX_CURRENCY})",
+                        "tax-years-table",
+                        tax_years,
+                        ("Net gain",),
+                    ),
+                    width=12,
+                )
+            ),
+            dbc.Row(
+                dbc.Col(
+                    create_table_card(
+                        f"Disposals ({TAX_CURRENCY})",
+                        "disposals-table",
+                        disposals,
+                        ("Gain",),
+                    ),
+                    width=12,
+                )
+            ),
+            # Spacer Row
+            dbc.Row(
+                html.Div(style={"height": "100px"}),
+            ),
+        ],
+        fluid=True,
+        className="p-4",
+    )
+
+
+def create_dividends_layout(
+    events: pd.DataFrame, summary: pd.DataFrame, currency: str = "USD"
+):
+    """
+    Create the layout of the dividends tab in the Dash app.
+
+    Parameters:
+    - events: Entitled dividends (see `dividends.entitled_dividends`)
+    - summary: Income per security (see `dividends.dividend_summary`)
+    - currency: Currency of the amounts
+    """
+    income = monthly_income(events)
+    summary = summary.reset_index().rename(
+        columns={
+            "security": "Asset",
+            "income": "Total income",
+            "ttm_income": "Income (12 months)",
+            "cost_basis": "Cost basis",
+            "yield_on_cost": "Yield on cost (%)",
+        }
+    )
+    events = events.rename(
+        columns={
+            "security": "Asset",
+            "ex_date": "Ex-dividend date",
+            "dividend": "Dividend per share",
+            "shares": "Shares",
+            "income": "Income",
+        }
+    )
+    summary = format_dataframe(
+        _dataframe=summary,
+        cols_to_format=[
+            "Total income",
+            "Income (12 months)",
+            "Cost basis",
+            "Yield on cost (%)",
+        ],
+    )
+    # Securities sold since have no cost basis nor yield
+    summary[["Cost basis", "Yield on cost (%)"]] = summary[
+        ["Cost basis", "Yield on cost (%)"]
+    ].replace("nan", "")
+    events = format_dataframe(
+        _dataframe=events,
+        cols_to_format=["Dividend per share", "Income"],
+        date_column="Ex-dividend date",
+    )
+
+    return dbc.Container(
+        [
+            dbc.Row(
+                dbc.Col(
+                    create_table_card(
+                        f"Dividend Income ({currency})",
+                        "dividend-income-table",
+                        summary,
+                    ),
+                    width=12,
+                )
+            ),
+            dbc.Row(
+                dbc.Col(
+                    create_figure_card(
+                        title=f"Monthly Dividend Income ({currency})",
+                        card_id="monthly-dividend-income",
+                        figure=create_dividend_income_plot(income, currency),
+                    ),
+                    width=12,
+                )
+            ),
+            dbc.Row(
+                dbc.Col(
+                    create_table_card(
+                        f"Dividends ({currency})", "dividends-table", events
+                    ),
+                    width=12,
+                )
+            ),
             # Spacer Row
             dbc.Row(
                 html.Div(style={"height": "100px"}),
@@ -0,0 +1,162 @@
+"""
+Incremental ingestion of the type1 ledger.
+
+The ledger is append-only, so the processed engine state (lots, investment,
+realized gains, applied splits and the split-adjusted transactions) is
+persisted together with the number of ledger bytes processed and their
+checksum. On the next start, only the bytes appended since then are parsed and
+applied to the restored state.
+
+The whole ledger is replayed instead when:
+- the processed part of the file changed (e.g., an earlier row was edited),
+- appended rows are dated before the last processed transaction,
+- the stock splits of an already processed security changed,
+- the cost-basis method changed.
+"""
+
+import hashlib
+import io
+import os
+import pickle
+from pathlib import Path
+
+import pandas as pd
+
+from portfolio_tracker.config import config
+from portfolio_tracker.data_fetching import SplitRegistry, split_registry
+from portfolio_tracker.loader import DataLoader
+from portfolio_tracker.manager import PortfolioBook
+from portfolio_tracker.streaming import stream_type1
+
+# Bumped whenever the persisted state changes shape
+STATE_VERSION = 2
+
+
+def load_portfolio_book(
+    path: Path = config.type1_path,
+    state_path: Path = config.ledger_state_path,
+    splits: SplitRegistry = split_registry,
+    cost_basis: str = config.cost_basis,
+) -> PortfolioBook:
+    """
+    Build the PortfolioBook of a type1 ledger, resuming from the persisted
+    state when only rows were appended since it was saved.
+
+    Parameters:
+    - path: Path of the type1 ledger
+    - state_path: Path of the persisted engine state
+    - splits: Registry the stock splits are taken from
+    - cost_basis: Cost-basis method sold lots are matched with
+
+    Returns:
+    - PortfolioBook of the full ledger.
+    """
+    data = Path(path).read_bytes()
+    state = _load_state(state_path, path, cost_basis)
+    book = _resume(state, data, splits) if state is not None else None
+
+    if book is None:
+        book = _replay(path, splits, cost_basis)
+        _save_state(state_path, path, data, book)
+    elif state["offset"] != len(data):
+        _save_state(state_path, path, data, book)
+    return book
+
+
+def _replay(path: Path, splits: SplitRegistry, cost_basis: str) -> PortfolioBook:
+    """Book of the whole ledger; CSV ledgers are streamed in chunks."""
+    if Path(path).suffix == ".csv":
+        return PortfolioBook.from_chunks(stream_type1(path), splits, cost_basis)
+    return PortfolioBook(DataLoader(path).get_type1_data(), splits, cost_basis)
+
+
+def _resume(state: dict, data: bytes, splits: SplitRegistry) -> PortfolioBook | None:
+    """Book of the persisted state extended with the appended rows, or None if
+    the ledger has to be replayed."""
+    offset = state["offset"]
+    processed = data[:offset]
+    if len(data) < offset or _checksum(processed) != state["checksum"]:
+        return None
+
+    appended = data[offset:]
+    # A last row without line break must not have been extended since
+    if (
+        appended
+        and not processed.endswith(b"\n")
+        and not appended.startswith((b"\n", b"\r\n"))
+    ):
+        return None
+
+    transactions = state["transactions"]
+    securities = transactions["security"].unique()
+    if _split_fingerprints(splits.get(securities)).items() - state["splits"].items():
+        return None
+
+    book = PortfolioBook.restore(state["stocks"], transactions, splits)
+    if appended.strip():
+        header = data[: data.index(b"\n") + 1]
+        new_rows = DataLoader(io.BytesIO(header + appended)).get_type1_data()
+        if new_rows.empty:
+            return book
+        if new_rows["date"].min() < transactions["date"].max():
+            return None
+        # Label the rows as a full read of the ledger would
+        new_rows.index += state["rows"]
+        book.extend(new_rows)
+    return book
+
+
+def _load_state(state_path: Path, path: Path, cost_basis: str) -> dict | None:
+    """Persisted state of the ledger at `path` under the cost-basis method
+    `cost_basis`, if any and readable."""
+    try:
+        with open(state_path, "rb") as file:
+            state = pickle.load(file)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        return None
+    if (
+        state.get("version") != STATE_VERSION
+        or state.get("path") != str(path)
+        or state["stocks"].cost_basis != cost_basis
+    ):
+        return None
+    return state
+
+
+def _save_state(state_path: Path, path: Path, data: bytes, book: PortfolioBook) -> None:
+    """Persist the engine state of a book built from the ledger bytes `data`."""
+    securities = book.transactions["security"].unique()
+    state = {
+        "version": STATE_VERSION,
+        "path": str(path),
+        "offset": len(data),
+        "checksum": _checksum(data),
+        "rows": len(book.transactions),
+        "splits": _split_fingerprints(book.splits.get(securities)),
+        "stocks": book.stocks,
+        "transactions": book.transactions,
+    }
+    state_path = Path(state_path)
+    state_path.parent.mkdir(parents=True, exist_ok=True)
+    # Write to a temporary file first, so a crash never leaves a partial state
+    temporary_path = state_path.with_name(f"{state_path.name}.tmp")
+    with open(temporary_path, "wb") as file:
+        pickle.dump(state, file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporary_path, state_path)
+
+
+def _checksum(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _split_fingerprints(stock_splits: dict[str, pd.Series]) -> dict[str, tuple]:
+    """Hashable summary of the splits of every security."""
+    return {
+        stock: tuple(
+            zip(
+                pd.DatetimeIndex(splits.index).strftime("%Y-%m-%d"),
+                splits.to_numpy(dtype=float).tolist(),
+            )
+        )
+        for stock, splits in stock_splits.items()
+    }
@@ -7,29 +7,54 @@ This is the "fundamental type of dataset, which will be initially implemented in
 Future features will include crypto-currencies and commisions through:
 
 2. type2: ['date', 'security_1', 'security_2', 'quantity_security_1', 'quantity_security_2']
-3. type3: ['date', 'commission', 'amount']
+3. type3: ['date', 'commision_type', 'amount']
 
 """
 
+import os
 import pandas as pd
 import datetime
+from pathlib import Path
 # from portfolio_tracker.config import type1_PATH, type2_PATH, type3_PATH
 
 CURRENT_DATE = datetime.datetime.now().date()
 
+# Columns of the type1 ledger stored as categoricals in Parquet
+TYPE1_CATEGORICAL_COLUMNS = ["security", "type_of_asset", "action", "currency"]
+
+TYPE2_COLUMNS = [
+    "date",
+    "security_1",
+    "security_2",
+    "quantity_security_1",
+    "quantity_security_2",
+]
+TYPE2_DATE_FORMAT = "%d/%m/%Y"
+
+TYPE3_COLUMNS = ["date", "commision_type", "amount"]
+TYPE3_DATE_FORMAT = "%d/%m/%Y"
+# Currency of type3 amounts without a 'currency' column
+TYPE3_DEFAULT_CURRENCY = "USD"
+
 
 class DataLoader:
     """
     A class for loading the three types of datasets (if they exist in the data path).
-    """
 
-    def __init__(self, type1_path, type2_path=None, type3_path=None):
-        self.type1_df = pd.read_csv(type1_path)
-        self.type2_df = pd.read_csv(type2_path) if type2_path else None
-        self.type3_df = pd.read_csv(type3_path) if type3_path else None
+    The type1 dataset is read from a CSV file, or from a Parquet file written by
+    `convert_to_parquet` (which is already typed and sorted, and only reads the
+    requested columns).
+    """
 
-        # Convert columns to appropriate data types
-        self._convert_types()
+    def __init__(self, type1_path, type2_path=None, type3_path=None, columns=None):
+        if _is_parquet(type1_path):
+            self.type1_df = read_type1_parquet(type1_path, columns)
+        else:
+            self.type1_df = pd.read_csv(type1_path, usecols=columns)
+            # Convert columns to appropriate data types
+            self._convert_types()
+        self.type2_df = read_type2(type2_path) if type2_path else None
+        self.type3_df = read_type3(type3_path) if type3_path else None
 
     def _convert_types(self):
         """
@@ -40,19 +65,18 @@ class DataLoader:
             # Ensure the series is a string, then remove commas and convert to float
             return series.astype(str).str.replace(",", "").astype(float)
 
-        self.type1_df["quantity"] = clean_and_convert_to_float(
-            self.type1_df["quantity"]
-        )
-        self.type1_df["price_per_share"] = clean_and_convert_to_float(
-            self.type1_df["price_per_share"]
-        )
-        self.type1_df["total_transaction_price"] = clean_and_convert_to_float(
-            self.type1_df["total_transaction_price"]
-        )
-        self.type1_df["date"] = pd.to_datetime(self.type1_df["date"], format="%m/%d/%Y")
+        for column in ["quantity", "price_per_share", "total_transaction_price"]:
+            if column in self.type1_df:
+                self.type1_df[column] = clean_and_convert_to_float(
+                    self.type1_df[column]
+                )
+        if "date" in self.type1_df:
+            self.type1_df["date"] = pd.to_datetime(
+                self.type1_df["date"], format="%m/%d/%Y"
+            )
 
-        # Sort by date
-        self.type1_df.sort_values(by="date", inplace=True)
+            # Sort by date
+            self.type1_df.sort_values(by="date", inplace=True, kind="stable")
 
     def get_type1_data(self):
         return self.type1_df
@@ -62,3 +86,94 @@ class DataLoader:
 
     def get_type3_data(self):
         return self.type3_df
+
+
+def convert_to_parquet(csv_path, parquet_path=None) -> Path:
+    """
+    Convert a type1 CSV ledger to a typed, date-sorted Parquet file (requires
+    the optional pyarrow dependency). Rows keep their position in the CSV file
+    as index label, as with `DataLoader`, so that errors and lot names still
+    refer to the lines of the CSV file.
+
+    :param csv_path: path of the type1 CSV ledger
+    :param parquet_path: path of the Parquet file (defaults to the CSV path
+        with a .parquet suffix)
+    :return: path of the Parquet file
+    """
+    csv_path = Path(csv_path)
+    parquet_path = (
+        csv_path.with_suffix(".parquet") if parquet_path is None else Path(parquet_path)
+    )
+    transactions = DataLoader(csv_path).get_type1_data()
+    transactions = transactions.astype(
+        {column: "category" for column in TYPE1_CATEGORICAL_COLUMNS}
+    )
+    transactions.to_parquet(parquet_path, index=True)
+    return parquet_path
+
+
+def read_type1_parquet(path, columns=None) -> pd.DataFrame:
+    """
+    Read a type1 ledger written by `convert_to_parquet`, memory-mapping the
+    file and reading only the requested columns.
+
+    :param path: path of the Parquet file
+    :param columns: columns to read (defaults to all)
+    :return: DataFrame of transactions, sorted by date and labelled with their
+        position in the CSV file
+    """
+    return pd.read_parquet(path, columns=columns, memory_map=True)
+
+
+def read_type2(path) -> pd.DataFrame:
+    """
+    Read a type2 ledger of crypto-to-crypto swaps, where `quantity_security_1`
+    of `security_1` were swapped for `quantity_security_2` of `security_2`.
+
+    :param path: path of the type2 CSV ledger
+    :return: DataFrame of swaps with parsed dates and quantities, sorted by date
+        (swaps of the same day keep file order)
+    """
+    swaps = pd.read_csv(path, thousands=",", dtype={"date": str})
+    missing = [column for column in TYPE2_COLUMNS if column not in swaps]
+    if missing:
+        raise ValueError(f"Missing columns in type2 ledger: {missing}")
+    swaps["date"] = pd.to_datetime(swaps["date"], format=TYPE2_DATE_FORMAT)
+    for column in ("security_1", "security_2"):
+        swaps[column] = swaps[column].str.strip().str.upper()
+    for column in ("quantity_security_1", "quantity_security_2"):
+        swaps[column] = swaps[column].astype(float)
+    return swaps.sort_values("date", kind="stable")
+
+
+def read_type3(path) -> pd.DataFrame:
+    """
+    Read a type3 ledger of commissions, where `commision_type` is 'transaction'
+    for a fee charged on trades or 'platform' for a fee charged on the account.
+
+    :param path: path of the type3 CSV ledger
+    :return: DataFrame of fees with parsed dates and amounts, and a 'currency'
+        column (`TYPE3_DEFAULT_CURRENCY` if the ledger has none), sorted by date
+    """
+    fees = pd.read_csv(path, thousands=",", dtype={"date": str})
+    missing = [column for column in TYPE3_COLUMNS if column not in fees]
+    if missing:
+        raise ValueError(f"Missing columns in type3 ledger: {missing}")
+    fees["date"] = pd.to_datetime(fees["date"], format=TYPE3_DATE_FORMAT)
+    fees["commision_type"] = fees["commision_type"].str.strip().str.lower()
+    fees["amount"] = fees["amount"].astype(float)
+    if "currency" not in fees:
+        fees["currency"] = TYPE3_DEFAULT_CURRENCY
+    return fees.sort_values("date", kind="stable")
+
+
+def _is_parquet(path) -> bool:
+    return isinstance(path, (str, os.PathLike)) and Path(path).suffix == ".parquet"
+
+
+if __name__ == "__main__":
+    # One-shot import of the type1 CSV ledger to Parquet
+    from portfolio_tracker.config import config
+
+    csv_path = config.data_path / "type1.csv"
+    print(f"Written {convert_to_parquet(csv_path)}")
@@ -0,0 +1,239 @@
+"""
+FIFO lot matching over NumPy arrays.
+
+The transactions of a single security are matched in one pass: the cumulative
+quantity bought defines a piecewise linear cost curve, and every sell consumes
+the slice of that curve between the cumulative quantity sold before and after it.
+Finding the lots covering a slice is a `searchsorted` over the cumulative
+quantities, so no per-transaction Python loop is needed.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+
+class Position:
+    """
+    Open lots of a single security, stored in growable NumPy arrays.
+
+    Lots are kept in acquisition order between a head and a tail index: buys
+    are written at the tail and FIFO sells advance the head, so consuming lots
+    never shifts memory. The total quantity and cost basis are updated as lots
+    are appended and consumed, so querying them does not require walking the lots.
+    """
+
+    __slots__ = (
+        "_date",
+        "_head",
+        "_price",
+        "_quantity",
+        "_tail",
+        "cost_basis",
+        "quantity",
+    )
+
+    def __init__(self, capacity: int = 8) -> None:
+        self._quantity = np.empty(capacity)
+        self._price = np.empty(capacity)
+        self._date = np.empty(capacity, dtype="datetime64[D]")
+        self._head = 0
+        self._tail = 0
+        self.quantity = 0.0
+        self.cost_basis = 0.0
+
+    @property
+    def lot_quantity(self) -> np.ndarray:
+        """Quantities of the open lots (read-only view)."""
+        return self._view(self._quantity)
+
+    @property
+    def lot_price(self) -> np.ndarray:
+        """Prices per share of the open lots (read-only view)."""
+        return self._view(self._price)
+
+    @property
+    def lot_date(self) -> np.ndarray:
+        """Acquisition dates of the open lots (read-only view)."""
+        return self._view(self._date)
+
+    def _view(self, array: np.ndarray) -> np.ndarray:
+        view = array[self._head : self._tail]
+        view.flags.writeable = False
+        return view
+
+    def __iter__(self):
+        return zip(self.lot_quantity.tolist(), self.lot_price.tolist())
+
+    def __len__(self) -> int:
+        return self._tail - self._head
+
+    @property
+    def nbytes(self) -> int:
+        """Memory used by the lot arrays."""
+        return self._quantity.nbytes + self._price.nbytes + self._date.nbytes
+
+    def _reserve(self, count: int) -> None:
+        """Make room for `count` more lots at the tail."""
+        if self._tail + count <= len(self._quantity):
+            return
+        size = self._tail - self._head
+        capacity = len(self._quantity)
+        while capacity < size + count:
+            capacity *= 2
+        if capacity == len(self._quantity):
+            # Enough room once consumed lots are dropped from the front
+            for array in (self._quantity, self._price, self._date):
+                array[:size] = array[self._head : self._tail]
+        else:
+            for name in ("_quantity", "_price", "_date"):
+                array = getattr(self, name)
+                grown = np.empty(capacity, dtype=array.dtype)
+                grown[:size] = array[self._head : self._tail]
+                setattr(self, name, grown)
+        self._head, self._tail = 0, size
+
+    def append(self, quantity: float, price: float, date=None) -> None:
+        """Add a lot at the end of the FIFO queue."""
+        self.extend(np.array([quantity]), np.array([price]), np.array([date]))
+
+    def extend(
+        self, quantities: np.ndarray, prices: np.ndarray, dates: np.ndarray
+    ) -> None:
+        """Add several lots at once, in acquisition order."""
+        count = len(quantities)
+        self._reserve(count)
+        end = self._tail + count
+        self._quantity[self._tail : end] = quantities
+        self._price[self._tail : end] = prices
+        self._date[self._tail : end] = dates
+        self._tail = end
+        self.quantity += quantities.sum()
+        self.cost_basis += (quantities * prices).sum()
+
+    def consume(self, quantity: float) -> float:
+        """
+        Remove `quantity` shares from the oldest lots (FIFO).
+
+        Returns:
+        - The cost basis of the consumed shares.
+        """
+        lot_quantity = self._quantity[self._head : self._tail]
+        lot_price = self._price[self._head : self._tail]
+        cumulative_quantity = np.cumsum(lot_quantity)
+
+        # Lots fully consumed by the sell, then the partially consumed one
+        consumed = np.searchsorted(cumulative_quantity, quantity, side="right")
+        consumed_cost = (lot_quantity[:consumed] * lot_price[:consumed]).sum()
+        if consumed < len(lot_quantity):
+            remaining_quantity = quantity - (
+                cumulative_quantity[consumed - 1] if consumed else 0.0
+            )
+            lot_quantity[consumed] -= remaining_quantity
+            consumed_cost += remaining_quantity * lot_price[consumed]
+        self._head += consumed
+
+        if len(self):
+            self.quantity -= quantity
+            self.cost_basis -= consumed_cost
+        else:
+            # Reset exactly, so rounding errors do not accumulate
+            self._head = self._tail = 0
+            self.quantity = 0.0
+            self.cost_basis = 0.0
+        return consumed_cost
+
+
+@dataclass(slots=True)
+class RealizedGains:
+    """Realized gain statistics of a single security."""
+
+    realized_gains: float = 0.0
+    total_sold_value: float = 0.0
+    total_shares_sold: float = 0.0
+    date_of_last_sell: pd.Timestamp | None = None
+
+
+@dataclass
+class FifoMatch:
+    """
+    Result of matching the transactions of a single security.
+
+    Attributes:
+    - sell_cost: Cost basis consumed by each transaction (zero for buys)
+    - position: Quantity held after each transaction
+    """
+
+    sell_cost: np.ndarray
+    position: np.ndarray
+
+
+def match_fifo(
+    security: str,
+    quantity: np.ndarray,
+    price: np.ndarray,
+    is_buy: np.ndarray,
+    open_quantity: np.ndarray | None = None,
+    open_price: np.ndarray | None = None,
+) -> FifoMatch:
+    """
+    Match the sells of a security against its buys using the FIFO method.
+
+    Parameters:
+    - security: Name of the security, used in error messages
+    - quantity: Quantities of the transactions, in ledger order
+    - price: Prices per share of the transactions
+    - is_buy: Boolean mask marking buys; all other rows are sells
+    - open_quantity: Quantities of the lots held before the first transaction
+    - open_price: Prices per share of the lots held before the first transaction
+
+    Returns:
+    - FifoMatch with the consumed cost basis and running position.
+    """
+    quantity = np.asarray(quantity, dtype=float)
+    price = np.asarray(price, dtype=float)
+    is_buy = np.asarray(is_buy, dtype=bool)
+    if open_quantity is None:
+        open_quantity = np.empty(0)
+        open_price = np.empty(0)
+
+    # Lots in acquisition order: lots already held, then the new buys
+    lot_quantity = np.concatenate([open_quantity, quantity[is_buy]])
+    lot_price = np.concatenate([open_price, price[is_buy]])
+    cumulative_quantity = np.cumsum(lot_quantity)
+    cumulative_cost = np.cumsum(lot_quantity * lot_price)
+
+    # Running position after each transaction
+    signed_quantity = np.where(is_buy, quantity, -quantity)
+    position = open_quantity.sum() + np.cumsum(signed_quantity)
+
+    oversold = np.flatnonzero(~is_buy & (position < 0))
+    if oversold.size:
+        raise ValueError(
+            f"Not enough shares of {security} to sell {quantity[oversold[0]]}"
+        )
+
+    sold = np.where(is_buy, 0.0, quantity)
+    sold_after = np.cumsum(sold)
+    sold_before = sold_after - sold
+
+    def cost_of_first(units: np.ndarray) -> np.ndarray:
+        """Cost basis of the first `units` shares ever held."""
+        lot = np.searchsorted(cumulative_quantity, units, side="left")
+        lot = np.minimum(lot, len(cumulative_quantity) - 1)
+        return (
+            cumulative_cost[lot] - (cumulative_quantity[lot] - units) * lot_price[lot]
+        )
+
+    if sold_after.size and sold_after[-1] > 0:
+        sell_cost = np.where(
+            is_buy, 0.0, cost_of_first(sold_after) - cost_of_first(sold_before)
+        )
+    else:
+        sell_cost = np.zeros_like(quantity)
+
+    return FifoMatch(
+        sell_cost=sell_cost,
+        position=position,
+    )
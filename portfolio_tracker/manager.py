@@ -1,17 +1,53 @@
+import threading
+
+import numpy as np
 import pandas as pd
-from collections import deque
 
+from portfolio_tracker.benchmark import BenchmarkComparison
+from portfolio_tracker.config import config
+from portfolio_tracker.cost_basis import METHODS, create_pool, lot_names, match_lots
+from portfolio_tracker.fees import FeeAllocation, allocate_fees, fees_by_day
 from portfolio_tracker.format import format_dataframe
+from portfolio_tracker.lots import Position, RealizedGains, match_fifo
 from portfolio_tracker.data_fetching import (
-    fetch_exchange_rate,
-    fetch_stock_prices,
-    fetch_stock_splits,
+    SplitRegistry,
+    fetch_dividends,
+    fx_rates,
+    split_registry,
+)
+from portfolio_tracker.dividends import (
+    DIVIDEND_ASSET_TYPES,
+    dividend_summary,
+    entitled_dividends,
+)
+from portfolio_tracker.performance import portfolio_history
+from portfolio_tracker.reporting import (
+    fees_in_currency,
+    holdings_in_currency,
+    realized_by_method,
+    realized_in_currency,
+)
+from portfolio_tracker.snapshot import PriceSnapshot
+from portfolio_tracker.tax import match_disposals, tax_year_summary
+from portfolio_tracker.validation import (
+    LedgerIndex,
+    check_positions,
+    check_transactions,
+    index_ledger,
 )
 
 
 class Stocks:
-    def __init__(self) -> None:
-        # Dictionary to track owned shares for each stock, where each stock maps to a deque of lots
+    def __init__(self, cost_basis: str = "fifo") -> None:
+        """
+        Parameters:
+        - cost_basis: Order sold lots are matched in (see `cost_basis.METHODS`)
+        """
+        create_pool(cost_basis)  # Reject unknown methods early
+        self.cost_basis = cost_basis
+        # Open lots of each stock, for methods other than FIFO (see `cost_basis`)
+        self.lot_pools = {}
+        # Dictionary to track owned shares for each stock, where each stock maps to a Position
         self.owned_shares = {}
         self.investment_per_asset = {}
         # Track total realized gains and gains per asset
@@ -19,12 +55,12 @@ class Stocks:
         self.realized_gains_per_asset = {}
         # Track unrealized gains per asset
         self.unrealized_gains_per_asset = {}
-        # Initialize exchange rates
-        self.exchange_rates = {}
         # Track stock splits {ticker: {date: split_ratio}}
         self.applied_splits = {}
 
-    def process_transactions(self, transactions: pd.DataFrame) -> None:
+    def process_transactions(
+        self, transactions: pd.DataFrame, index: LedgerIndex | None = None
+    ) -> None:
         """
         Process transactions and update the owned shares dictionary.
 
@@ -36,120 +72,149 @@ class Stocks:
             - 'action': Action of the transaction ('buy' or 'sell')
             - 'quantity': Number of shares involved in the transaction
             - 'total_transaction_price_usd': Total transaction price in USD at the time of transaction
+        - index: LedgerIndex of the transactions (see `validation.validate_ledger`),
+          built here if not given
         """
-        # Extract currencies and fetch exchange rates
-        currencies = transactions["currency"].unique()
-
-        earliest_dates = {}
-        for currency in currencies:
-            if currency != "USD":
-                earliest_date = transactions[transactions["currency"] == currency][
-                    "date"
-                ].min()
-                earliest_dates[currency] = earliest_date
-
-        end_date = pd.Timestamp.now().strftime("%Y-%m-%d")  # Current date
-        for currency, earliest_date in earliest_dates.items():
-            self.exchange_rates[currency] = fetch_exchange_rate(
-                currency, "USD", earliest_date, end_date
+        if index is None:
+            index = index_ledger(transactions)
+
+        # Fetch the exchange rates over the dates traded in each currency at once
+        fx_rates.prefetch(index.currency_spans)
+
+        price_per_share, total_price = self._convert_to_usd(transactions)
+        quantity = transactions["quantity"].to_numpy(dtype=float)
+        is_buy = (transactions["action"] == "buy").to_numpy()
+        is_sell = (transactions["action"] == "sell").to_numpy()
+        dates = transactions["date"].to_numpy()
+        names = lot_names(transactions) if self.cost_basis == "specific" else None
+
+        for security, rows in index.security_rows.items():
+            # Rows that are neither buys nor sells do not change the position
+            rows = rows[is_buy[rows] | is_sell[rows]]
+            if not rows.size:
+                continue
+            self._match_security(
+                security,
+                quantity[rows],
+                price_per_share[rows],
+                total_price[rows],
+                is_buy[rows],
+                dates[rows],
+                None if names is None else names[rows],
             )
 
-        for _, transaction in transactions.iterrows():
-            security = transaction["security"]
-            action = transaction["action"]
-            quantity = transaction["quantity"]
-            total_price = transaction["total_transaction_price"]
-            price_per_share = transaction["price_per_share"]
-            currency = transaction["currency"]
-            date = transaction["date"]
-
-            if currency != "USD":
-                exchange_rate = self.exchange_rates[currency].loc[
-                    date.strftime("%m/%d/%Y"), "exchange_rate"
-                ]
-                if pd.isna(exchange_rate):
-                    raise ValueError(
-                        f"Exchange rate not available for {currency} on {date}"
-                    )
-                price_per_share = price_per_share * exchange_rate
-                total_price = total_price * exchange_rate
-
-            if security not in self.owned_shares:
-                self.owned_shares[security] = deque()
-                self.investment_per_asset[security] = 0
-
-            if action == "buy":
-                # Add the new purchase as a lot to the deque for this security
-                self.owned_shares[security].append((quantity, price_per_share))
-                self.investment_per_asset[security] += total_price
-            elif action == "sell":
-                self._sell_shares(security, quantity, price_per_share, date)
-
-            # Remove the security from owned_shares if the total quantity is zero
-            if sum(quantity for quantity, _ in self.owned_shares[security]) <= 0:
-                del self.owned_shares[security]
-                del self.investment_per_asset[security]
-
-    def _sell_shares(
-        self, security: str, quantity: float, selling_price: float, transaction_date
+    def _convert_to_usd(
+        self, transactions: pd.DataFrame
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Convert prices per share and total prices to USD at the exchange rate
+        of each transaction's date, one vectorized lookup per currency.
+
+        Returns:
+        - price_per_share, total_price: Arrays aligned with the transactions.
+        """
+        currencies = transactions["currency"].to_numpy()
+        dates = transactions["date"].to_numpy()
+        exchange_rate = fx_rates.rates_to("USD", currencies, dates)
+
+        missing = np.isnan(exchange_rate)
+        if missing.any():
+            missing_days = (
+                pd.DataFrame(
+                    {
+                        "currency": currencies[missing],
+                        "date": pd.DatetimeIndex(dates[missing]).strftime("%Y-%m-%d"),
+                    }
+                )
+                .drop_duplicates()
+                .groupby("currency")["date"]
+                .agg(", ".join)
+            )
+            raise ValueError(
+                "Exchange rate not available for "
+                + "; ".join(
+                    f"{currency} on {days}" for currency, days in missing_days.items()
+                )
+            )
+
+        price_per_share = transactions["price_per_share"].to_numpy(dtype=float)
+        total_price = transactions["total_transaction_price"].to_numpy(dtype=float)
+        return price_per_share * exchange_rate, total_price * exchange_rate
+
+    def _match_security(
+        self,
+        security: str,
+        quantity: np.ndarray,
+        price_per_share: np.ndarray,
+        total_price: np.ndarray,
+        is_buy: np.ndarray,
+        dates: np.ndarray,
+        names: np.ndarray | None = None,
     ) -> None:
         """
-        Helper function to sell shares using the FIFO method and update realized gains.
+        Match the transactions of one security against its open lots, using
+        the cost-basis method of the stocks, and update owned shares,
+        investment and realized gains.
+        """
+        if self.cost_basis == "fifo":
+            position = self.owned_shares.get(security, Position())
+            match = match_fifo(
+                security,
+                quantity,
+                price_per_share,
+                is_buy,
+                open_quantity=position.lot_quantity,
+                open_price=position.lot_price,
+            )
+            sell_cost, running_position = match.sell_cost, match.position
+        else:
+            pool = self.lot_pools.setdefault(security, create_pool(self.cost_basis))
+            running_position = pool.quantity + np.cumsum(
+                np.where(is_buy, quantity, -quantity)
+            )
+            sell_cost = match_lots(
+                quantity,
+                price_per_share,
+                is_buy,
+                {self.cost_basis: pool},
+                dates,
+                names,
+            )[self.cost_basis]
 
-        Parameters:
-        - security: The stock being sold.
-        - quantity: The number of shares being sold.
-        - selling_price: The price at which the shares are being sold.
-        - transaction_date
-        """
-        if (
-            security not in self.owned_shares
-            or sum(q for q, _ in self.owned_shares[security]) < quantity
-        ):
-            raise ValueError(f"Not enough shares of {security} to sell {quantity}")
-
-        remaining_quantity = quantity
-
-        while remaining_quantity > 0:
-            lot_quantity, lot_price = self.owned_shares[security][0]
-            if lot_quantity > remaining_quantity:
-                realized_gain = remaining_quantity * (selling_price - lot_price)
-                self.realized_gains += realized_gain
-                if security not in self.realized_gains_per_asset:
-                    self.realized_gains_per_asset[security] = [
-                        0,
-                        0,
-                        0,
-                        0,
-                    ]  # (realized_gains, total_sold_value, total_shares_sold, date_of_last_sell) # 0
-
-                # Updates self.realized_gains_per_asset dictionary
-                self.realized_gains_per_asset[security][0] += realized_gain
-
-                self.owned_shares[security][0] = (
-                    lot_quantity - remaining_quantity,
-                    lot_price,
+        # Investment is reset whenever the position is closed
+        cash_flows = np.where(is_buy, total_price, -sell_cost)
+        closed = np.flatnonzero(running_position <= 0)
+        if closed.size:
+            investment = cash_flows[closed[-1] + 1 :].sum()
+        else:
+            investment = self.investment_per_asset.get(security, 0) + cash_flows.sum()
+
+        if running_position[-1] <= 0:
+            self.owned_shares.pop(security, None)
+            self.investment_per_asset.pop(security, None)
+            self.lot_pools.pop(security, None)
+        else:
+            if self.cost_basis == "fifo":
+                position.extend(
+                    quantity[is_buy], price_per_share[is_buy], dates[is_buy]
                 )
-                self.investment_per_asset[security] -= remaining_quantity * lot_price
-                remaining_quantity = 0
+                position.consume(quantity[~is_buy].sum())
             else:
-                realized_gain = lot_quantity * (selling_price - lot_price)
-                self.realized_gains += realized_gain
-                if security not in self.realized_gains_per_asset:
-                    self.realized_gains_per_asset[security] = [
-                        0,
-                        0,
-                        0,
-                        0,
-                    ]  # (realized_gains, total_sold_value, total_shares_sold, date_of_last_sell)  # 0
-                self.realized_gains_per_asset[security][0] += realized_gain
-                remaining_quantity -= lot_quantity
-                self.investment_per_asset[security] -= lot_quantity * lot_price
-                self.owned_shares[security].popleft()
-
-        self.realized_gains_per_asset[security][1] += quantity * selling_price
-        self.realized_gains_per_asset[security][2] += quantity
-        self.realized_gains_per_asset[security][3] = transaction_date
+                position = pool.to_position()
+            self.owned_shares[security] = position
+            self.investment_per_asset[security] = investment
+
+        sells = ~is_buy
+        if not sells.any():
+            return
+        sold_value = quantity[sells] * price_per_share[sells]
+        realized_gain = (sold_value - sell_cost[sells]).sum()
+        self.realized_gains += realized_gain
+        stats = self.realized_gains_per_asset.setdefault(security, RealizedGains())
+        stats.realized_gains += realized_gain
+        stats.total_sold_value += sold_value.sum()
+        stats.total_shares_sold += quantity[sells].sum()
+        stats.date_of_last_sell = pd.Timestamp(dates[sells][-1])
 
     def get_owned_assets(self) -> dict[str, float]:
         """
@@ -159,42 +224,56 @@ class Stocks:
         - owned_assets (dict): A dictionary where keys are stock names and values are total number of shares owned.
         """
         owned_assets = {
-            security: sum(quantity for quantity, _ in lots)
-            for security, lots in self.owned_shares.items()
+            security: position.quantity
+            for security, position in self.owned_shares.items()
         }
 
         return owned_assets
 
-    def fetch_current_values(self) -> tuple[dict, dict]:
+    def fetch_current_values(
+        self, snapshot: PriceSnapshot | None = None
+    ) -> tuple[dict, dict]:
         """
         Fetch the current values and unrealized gains of the stocks currently owned.
 
+        Parameters:
+        - snapshot: Prices to value the stocks at. If not given, a snapshot of
+          the owned stocks is fetched.
+
         Returns:
         - current_values (dict): A dictionary where keys are stock names and values are current values in USD.
         - unrealized_gains (dict): A dictionary where keys are stock names and values are unrealized gains in USD.
         """
-        owned_assets = self.get_owned_assets()
-        symbols = list(owned_assets.keys())
-
-        # Fetch current prices of owned stocks
-        current_prices = fetch_stock_prices(symbols)
+        if snapshot is None:
+            snapshot = PriceSnapshot(self.owned_shares).refresh()
 
         # Calculate current values and unrealized gains
         current_values = {}
         self.unrealized_gains_per_asset = {}
-        for symbol, shares in owned_assets.items():
-            current_value = shares * current_prices.get(symbol, 0)
+        self.revalue(current_values, self.owned_shares, snapshot.prices)
+
+        return current_values, self.unrealized_gains_per_asset
+
+    def revalue(self, current_values: dict, symbols, prices: dict) -> None:
+        """
+        Update in place the current values and unrealized gains of some owned stocks.
+
+        Parameters:
+        - current_values: Dictionary of current values to update
+        - symbols: Stocks to revalue; stocks not owned are skipped
+        - prices: Dictionary of current prices
+        """
+        for symbol in symbols:
+            position = self.owned_shares.get(symbol)
+            if position is None:
+                continue
+            current_value = position.quantity * prices.get(symbol, 0)
             current_values[symbol] = current_value
 
             # Calculate unrealized gains
-            total_cost_basis = sum(
-                quantity * price for quantity, price in self.owned_shares[symbol]
-            )
-            unrealized_gain = current_value - total_cost_basis
+            unrealized_gain = current_value - position.cost_basis
             self.unrealized_gains_per_asset[symbol] = unrealized_gain
 
-        return current_values, self.unrealized_gains_per_asset
-
     def get_realized_gains(self) -> tuple[float, dict]:
         """
         Get the total realized gains and realized gains per asset.
@@ -205,20 +284,39 @@ class Stocks:
         """
         return self.realized_gains, self.realized_gains_per_asset
 
-    def generate_realized_gains_dataframe(self) -> pd.DataFrame:
-        """Build and return the DataFrame for realized gains."""
+    def generate_realized_gains_dataframe(
+        self,
+        securities=None,
+        converted: pd.DataFrame | None = None,
+        fees: pd.DataFrame | None = None,
+    ) -> pd.DataFrame:
+        """
+        Build and return the DataFrame for realized gains.
+
+        Parameters:
+        - securities: Optional collection of securities to restrict the table to.
+        - converted: Realized gains in a reporting currency, replacing the USD
+          amounts and adding their FX gains (see `reporting.realized_in_currency`)
+        - fees: Transaction fees per security in the same currency (see
+          `reporting.fees_in_currency`), added to the cost of the sold lots and
+          deducted from the proceeds, which reports 'Net realized gains'
+        """
         _, realized_gains_dict = self.get_realized_gains()
 
         data = []
-        for asset, gains_data in realized_gains_dict.items():
-            realized_gains, total_sold_value, total_shares_sold, date_of_last_sell = (
-                gains_data
+        for asset, stats in realized_gains_dict.items():
+            if securities is not None and asset not in securities:
+                continue
+            total_sold_value, realized_gains = (
+                (stats.total_sold_value, stats.realized_gains)
+                if converted is None
+                else converted.loc[asset, ["total_sold_value", "realized_gains"]]
             )
             data.append(
                 [
                     asset,
-                    total_shares_sold,
-                    date_of_last_sell,
+                    stats.total_shares_sold,
+                    stats.date_of_last_sell,
                     total_sold_value,
                     realized_gains,
                 ]
@@ -235,17 +333,32 @@ class Stocks:
             ],
         )
 
+        gains = "Realized gains"
+        if fees is not None:
+            fees = fees.reindex(df["Asset"]).fillna(0)
+            df["Total value sold"] -= fees["sale_fees"].to_numpy()
+            df[gains] -= (fees["sale_fees"] + fees["cost_fees"]).to_numpy()
+            gains = "Net realized gains"
+            df = df.rename(columns={"Realized gains": gains})
+
         # Add additional columns
-        df["Initial investment"] = df["Total value sold"] + df["Realized gains"]
-        df["Rate of return (%)"] = df["Realized gains"] / df["Initial investment"] * 100
+        df["Initial investment"] = df["Total value sold"] + df[gains]
+        df["Rate of return (%)"] = df[gains] / df["Initial investment"] * 100
         df["Date last sell"] = pd.to_datetime(df["Date last sell"])
 
         COLUMNS_TO_FORMAT = [
-            "Realized gains",
+            gains,
             "Rate of return (%)",
             "Initial investment",
             "Total value sold",
         ]
+        if converted is not None:
+            df.insert(
+                df.columns.get_loc(gains) + 1,
+                "FX gains",
+                converted["fx_gains"].reindex(df["Asset"]).to_numpy(),
+            )
+            COLUMNS_TO_FORMAT.append("FX gains")
         DATE_COLUMN = "Date last sell"
 
         return format_dataframe(
@@ -255,64 +368,610 @@ class Stocks:
         )
 
 
+def apply_stock_splits(
+    transactions: pd.DataFrame,
+    stock_splits: dict[str, pd.Series],
+) -> tuple[pd.DataFrame, dict]:
+    """
+    Adjusts quantities and prices per share of transactions for stock splits.
+
+    Every transaction is scaled by the product of the ratios of all splits of
+    its security that happened after it. Per security, these products are the
+    reverse cumulative products of the split ratios, matched to the
+    transactions with a single forward `merge_asof`.
+
+    Parameters:
+    - transactions: DataFrame of transactions (not modified)
+    - stock_splits: Dictionary of split ratios indexed by split date, per security
+
+    Returns:
+    - A split-adjusted copy of the transactions.
+    - Dictionary of the splits that affected at least one transaction,
+      {ticker: {date: split_ratio}}.
+    """
+    splits = [
+        pd.DataFrame(
+            {
+                "security": stock,
+                "split_date": pd.DatetimeIndex(splits.index).tz_localize(None),
+                "split_ratio": splits.to_numpy(dtype=float),
+            }
+        )
+        for stock, splits in stock_splits.items()
+        if not splits.empty
+    ]
+    if not splits:
+        return transactions.copy(), {}
+
+    # Cumulative factor of each split and all later splits of the same security
+    splits = pd.concat(splits, ignore_index=True).sort_values(
+        ["security", "split_date"], ascending=[True, False]
+    )
+    splits["factor"] = splits.groupby("security")["split_ratio"].cumprod()
+    splits = splits.sort_values("split_date")
+
+    # Match every transaction to the first split strictly after it
+    keys = pd.DataFrame(
+        {
+            "date": transactions["date"].to_numpy(dtype="datetime64[ns]"),
+            "security": transactions["security"].to_numpy(),
+            "row": np.arange(len(transactions)),
+        }
+    ).sort_values("date", kind="stable")
+    splits["split_date"] = splits["split_date"].astype("datetime64[ns]")
+    matched = pd.merge_asof(
+        keys,
+        splits,
+        left_on="date",
+        right_on="split_date",
+        by="security",
+        direction="forward",
+        allow_exact_matches=False,
+    )
+
+    factor = np.ones(len(transactions))
+    factor[matched["row"].to_numpy()] = matched["factor"].fillna(1.0).to_numpy()
+    adjusted = transactions.assign(
+        quantity=transactions["quantity"].to_numpy() * factor,
+        price_per_share=transactions["price_per_share"].to_numpy() / factor,
+    )
+
+    # Splits after the first transaction of their security were applied
+    first_dates = keys.groupby("security")["date"].min()
+    applied = splits[
+        splits["split_date"] > splits["security"].map(first_dates).to_numpy()
+    ]
+    applied_splits = {
+        stock: dict(zip(group["split_date"], group["split_ratio"]))
+        for stock, group in applied.groupby("security")
+    }
+
+    return adjusted, applied_splits
+
+
+class PortfolioBook:
+    """
+    Portfolio built from the full ledger in a single pass.
+
+    Splits are applied and lots are matched once for all asset types, and
+    quotes are fetched once for all owned securities. The per-asset-type views
+    returned by `view` share this state, so adding a view costs no additional
+    processing or network I/O. Sold lots are matched with the cost-basis
+    method `cost_basis` (see `cost_basis.METHODS`).
+
+    Transactions of `separate_asset_types` are processed in a book of their
+    own (see `crypto.load_crypto_book`): this book keeps them, but neither
+    checks their positions nor quotes them, and leaves them out of its
+    performance history and capital gains.
+    """
+
+    # Asset types valued by their own book
+    separate_asset_types = ("crypto",)
+
+    def __init__(
+        self,
+        transactions: pd.DataFrame,
+        splits: SplitRegistry = split_registry,
+        cost_basis: str = config.cost_basis,
+    ) -> None:
+        self.splits = splits
+        self.stocks = Stocks(cost_basis)
+        # Processed chunks of transactions, concatenated when first read, so
+        # that extending the book does not copy the transactions already in it
+        self._chunks = [transactions.iloc[:0]]
+        self.index = LedgerIndex()
+        self._init_prices()
+        self.set_fees(None)
+        self.extend(transactions)
+
+    @classmethod
+    def from_chunks(
+        cls,
+        chunks,
+        splits: SplitRegistry = split_registry,
+        cost_basis: str = config.cost_basis,
+    ) -> "PortfolioBook":
+        """
+        Book built from transactions arriving in date-ordered chunks (e.g., from
+        `streaming.stream_type1`), processing each chunk as it arrives.
+
+        The processed chunks are kept for the views (see `transactions`), so
+        peak memory still grows with the size of the ledger.
+        """
+        chunks = iter(chunks)
+        first_chunk = next(chunks, None)
+        if first_chunk is None:
+            raise ValueError("No transactions found in the ledger")
+        book = cls(first_chunk, splits, cost_basis)
+        for chunk in chunks:
+            book.extend(chunk)
+        return book
+
+    @classmethod
+    def restore(
+        cls,
+        stocks: Stocks,
+        transactions: pd.DataFrame,
+        splits: SplitRegistry = split_registry,
+    ) -> "PortfolioBook":
+        """
+        Book resumed from a previously computed state, without replaying the ledger.
+
+        Parameters:
+        - stocks: Stocks after processing the transactions
+        - transactions: Split-adjusted transactions processed into `stocks`
+        """
+        book = cls.__new__(cls)
+        book.splits = splits
+        book.stocks = stocks
+        book._chunks = [transactions]
+        book.index = index_ledger(transactions)
+        book._init_prices()
+        book.set_fees(None)
+        return book
+
+    @property
+    def transactions(self) -> pd.DataFrame:
+        """Split-adjusted transactions processed into the book, in ledger order."""
+        if len(self._chunks) > 1:
+            self._chunks = [pd.concat(self._chunks)]
+        return self._chunks[0]
+
+    def _init_prices(self) -> None:
+        # Prices shared by all views, and values derived from them
+        self.snapshot = PriceSnapshot()
+        self._current_values = None
+        self._current_values_version = None
+        self._valued_prices = {}
+        self._lock = threading.Lock()
+
+    def set_fees(self, fees: pd.DataFrame | None) -> None:
+        """
+        Set the fees of the type3 ledger (see `fees.load_fees`), allocated to
+        the transactions when first needed. Without fees, amounts are gross.
+        """
+        self.fees = fees
+        self._fee_allocation = None
+
+    def fee_allocation(self) -> FeeAllocation | None:
+        """Fees allocated to the transactions of the book, None without fees."""
+        if self.fees is None:
+            return None
+        if self._fee_allocation is None:
+            self._fee_allocation = allocate_fees(self.fees, self.transactions)
+        return self._fee_allocation
+
+    def extend(self, transactions: pd.DataFrame) -> None:
+        """
+        Validate new transactions, apply stock splits to them and process them.
+
+        The transactions must not be dated before those already processed,
+        since lots are matched in ledger order. Invalid transactions raise a
+        ValueError before any of them is processed.
+        """
+        if transactions.empty:
+            return
+        # Splits are looked up for the securities of valid rows only
+        transactions = check_transactions(transactions)
+        # Rows of `separate_asset_types` are only kept here: their positions
+        # are checked and matched by their own book (e.g., after swaps)
+        own = ~transactions["type_of_asset"].isin(self.separate_asset_types).to_numpy()
+        stock_splits = self.splits.get(transactions["security"][own].unique())
+        transactions, applied_splits = apply_stock_splits(transactions, stock_splits)
+        own_transactions = transactions if own.all() else transactions[own]
+        own_index = check_positions(
+            own_transactions,
+            open_quantity={
+                security: position.lot_quantity.sum()
+                for security, position in self.stocks.owned_shares.items()
+            },
+        )
+        for stock, splits in applied_splits.items():
+            self.stocks.applied_splits.setdefault(stock, {}).update(splits)
+        self.stocks.process_transactions(own_transactions, own_index)
+        index = own_index if own.all() else index_ledger(transactions)
+
+        self.index.extend(index, offset=sum(len(chunk) for chunk in self._chunks))
+        if len(self._chunks[0]):
+            self._chunks.append(transactions)
+        else:
+            self._chunks = [transactions]
+
+        # Transaction fees are split among all trades of a day
+        self._fee_allocation = None
+
+        # Owned securities may have changed: value them all again
+        with self._lock:
+            self._current_values = None
+            self._current_values_version = None
+
+    def securities_of_type(self, asset_type: str) -> set[str]:
+        """Securities of the ledger with the given asset type."""
+        return self.index.securities_of_type(asset_type)
+
+    def own_rows(self) -> np.ndarray:
+        """Positions of the transactions not of `separate_asset_types`."""
+        separate = [np.empty(0, dtype=int)] + [
+            self.index.type_rows.get(asset_type, np.empty(0, dtype=int))
+            for asset_type in self.separate_asset_types
+        ]
+        return np.setdiff1d(np.arange(len(self.transactions)), np.concatenate(separate))
+
+    def refresh_prices(self, force: bool = False) -> PriceSnapshot:
+        """
+        Fetch the current prices of all owned securities into the shared snapshot.
+
+        Parameters:
+        - force: Bypass quotes cached on disk, even if younger than the quote TTL
+        """
+        separate = set().union(*map(self.securities_of_type, self.separate_asset_types))
+        owned_assets = {
+            security: quantity
+            for security, quantity in self.stocks.get_owned_assets().items()
+            if security not in separate
+        }
+        return self.snapshot.refresh(owned_assets, force=force)
+
+    def fetch_current_values(self) -> tuple[dict, dict]:
+        """
+        Get the current values and unrealized gains of all owned securities.
+
+        Prices come from the shared snapshot, which is only refreshed here if it
+        was never fetched. On a new snapshot version, only the securities whose
+        price moved are revalued.
+        """
+        if self.snapshot.is_empty:
+            self.refresh_prices()
+        with self._lock:
+            self._revalue()
+            return self._current_values
+
+    def fetch_versioned_values(self) -> tuple[int, dict, dict]:
+        """
+        Get the current values and unrealized gains of all owned securities
+        (see `fetch_current_values`), as copies that later price refreshes do
+        not update, with the version of the snapshot they were valued at.
+        """
+        if self.snapshot.is_empty:
+            self.refresh_prices()
+        with self._lock:
+            self._revalue()
+            current_values, unrealized_gains = self._current_values
+            return (
+                self._current_values_version,
+                dict(current_values),
+                dict(unrealized_gains),
+            )
+
+    def _revalue(self) -> None:
+        """Value the owned securities at the latest snapshot, holding the lock."""
+        version, prices = self.snapshot.read()
+        if self._current_values is None:
+            self.stocks.unrealized_gains_per_asset = {}
+            self._current_values = ({}, self.stocks.unrealized_gains_per_asset)
+            changed = list(self.stocks.owned_shares)
+        elif self._current_values_version != version:
+            changed = [
+                symbol
+                for symbol in self.stocks.owned_shares
+                if prices.get(symbol) != self._valued_prices.get(symbol)
+            ]
+        else:
+            return
+
+        self.stocks.revalue(self._current_values[0], changed, prices)
+        self._valued_prices = prices
+        self._current_values_version = version
+
+    def get_performance_history(
+        self, currency: str = config.reporting_currency
+    ) -> pd.DataFrame:
+        """
+        Daily value and returns of the portfolio but `separate_asset_types`,
+        net of all fees but their transaction fees (see `portfolio_history`).
+        """
+        rows = self.own_rows()
+        transactions = self.transactions.iloc[rows]
+        fees = self.fee_allocation()
+        if fees is not None:
+            separate = np.setdiff1d(np.arange(len(self.transactions)), rows)
+            fees = fees.daily_fees.sub(
+                fees_by_day(
+                    self.transactions["date"].to_numpy()[separate],
+                    fees.transaction_fees[separate],
+                ),
+                fill_value=0,
+            )
+        return portfolio_history(transactions, currency=currency, fees=fees)
+
+    def get_capital_gains(self) -> tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        UK capital gains of the portfolio but `separate_asset_types`, in GBP
+        (see `tax`).
+
+        Returns:
+        - Disposals matched by the share matching rules (see `tax.match_disposals`).
+        - Gains per tax year (see `tax.tax_year_summary`).
+        """
+        rows = self.own_rows()
+        fees = self.fee_allocation()
+        disposals = match_disposals(
+            self.transactions.iloc[rows],
+            None if fees is None else fees.transaction_fees[rows],
+        )
+        return disposals, tax_year_summary(disposals)
+
+    def get_dividends(
+        self, currency: str = config.reporting_currency
+    ) -> tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Dividends of the stocks and index funds of the portfolio (see `dividends`).
+
+        Parameters:
+        - currency: Currency of the amounts
+
+        Returns:
+        - Dividends the holdings were entitled to (see `dividends.entitled_dividends`).
+        - Income per security, with the yield on the cost of the owned shares
+          (see `dividends.dividend_summary`).
+        """
+        rows = np.concatenate(
+            [
+                self.index.type_rows.get(asset_type, np.empty(0, dtype=int))
+                for asset_type in DIVIDEND_ASSET_TYPES
+            ]
+        )
+        transactions = self.transactions.iloc[np.sort(rows)]
+        securities = transactions["security"].unique()
+        dividends = (
+            fetch_dividends(securities, transactions["date"].min())
+            if len(securities)
+            else {}
+        )
+        events = entitled_dividends(transactions, dividends, currency)
+
+        # Prices are not needed for the cost basis of the owned shares
+        positions = {
+            security: position
+            for security, position in self.stocks.owned_shares.items()
+            if security in set(securities)
+        }
+        cost_basis = holdings_in_currency(positions, {}, currency)["cost_basis"]
+        return events, dividend_summary(events, cost_basis)
+
+    def view(
+        self, asset_type: str, reporting_currency: str = config.reporting_currency
+    ) -> "PortfolioManager":
+        """Portfolio manager restricted to one asset type of the book."""
+        return PortfolioManager(
+            self.transactions,
+            asset_type,
+            book=self,
+            reporting_currency=reporting_currency,
+        )
+
+
 class PortfolioManager:
-    def __init__(self, transactions: pd.DataFrame, asset_type: str) -> None:
+    def __init__(
+        self,
+        transactions: pd.DataFrame,
+        asset_type: str,
+        splits: SplitRegistry = split_registry,
+        book: PortfolioBook | None = None,
+        reporting_currency: str = config.reporting_currency,
+    ) -> None:
+        """
+        Parameters:
+        - transactions: Transactions of the type1 ledger
+        - asset_type: Asset type the manager is restricted to (e.g., 'stock')
+        - splits: Registry the stock splits are taken from
+        - book: Book to share (see `PortfolioBook.view`); if not given, a book
+          of this asset type's transactions is built
+        - reporting_currency: Currency of the reported amounts (e.g., 'GBP').
+          Cost bases are converted at the rate of their trade dates and market
+          values at the rate of the price snapshot (see `reporting`).
+        """
         self.asset_type = asset_type
-        self.transactions = transactions[transactions["type_of_asset"] == asset_type]
+        self.reporting_currency = reporting_currency
+
+        if book is None:
+            # Standalone manager: build a book over this asset type only
+            transactions = transactions[transactions["type_of_asset"] == asset_type]
+            if transactions.empty:
+                raise ValueError(f"No transactions found for asset type: {asset_type}")
+            book = PortfolioBook(transactions, splits)
 
-        if self.transactions.empty:
+        self.book = book
+        self.stocks = book.stocks
+        self.securities = book.securities_of_type(asset_type)
+        if not self.securities:
             raise ValueError(f"No transactions found for asset type: {asset_type}")
+        # Fees of this asset type, and the allocation they were computed from
+        self._fees = (None, None)
 
-        # Apply stock splits
-        self._apply_stock_splits()
+    @property
+    def rows(self) -> np.ndarray:
+        """Positions of the transactions of this asset type in the book."""
+        return self.book.index.type_rows.get(self.asset_type, np.empty(0, dtype=int))
 
-        # Initialize Stocks and process transactions
-        self.stocks = Stocks()
-        self.stocks.process_transactions(
-            self.transactions
-        )
-        self._current_values = None
+    @property
+    def transactions(self) -> pd.DataFrame:
+        """Split-adjusted transactions of this asset type."""
+        return self.book.transactions.iloc[self.rows]
+
+    def transaction_fees(self) -> np.ndarray | None:
+        """
+        Transaction fee of every transaction of this asset type in USD, None
+        if the book has no fees.
+        """
+        fees = self.book.fee_allocation()
+        return None if fees is None else fees.transaction_fees[self.rows]
+
+    def get_fees(self) -> pd.DataFrame | None:
+        """
+        Transaction fees of the sold and of the open shares of this asset type,
+        in the reporting currency (see `reporting.fees_in_currency`), None if
+        the book has no fees.
+        """
+        allocation = self.book.fee_allocation()
+        if allocation is None:
+            return None
+        cached_allocation, fees = self._fees
+        if cached_allocation is not allocation:
+            fees = fees_in_currency(
+                self.transactions,
+                allocation.transaction_fees[self.rows],
+                self.reporting_currency,
+                self.stocks.cost_basis,
+            )
+            self._fees = (allocation, fees)
+        return fees
 
-    def _apply_stock_splits(self) -> None:
-        """Applies stock splits to the transactions DataFrame."""
-        symbols = self.transactions["security"].unique()
-        stock_splits = fetch_stock_splits(symbols)
+    def get_owned_assets(self) -> dict[str, float]:
+        """Get the current number of shares owned for each security of this asset type."""
+        return {
+            security: quantity
+            for security, quantity in self.stocks.get_owned_assets().items()
+            if security in self.securities
+        }
+
+    @property
+    def in_usd(self) -> bool:
+        """Whether amounts are reported in USD, the currency they are processed in."""
+        return self.reporting_currency == "USD"
+
+    def fetch_current_values(self) -> tuple[dict, dict]:
+        """
+        Get the current values and unrealized gains of the owned securities of
+        this asset type, from the quotes shared by the book, in the reporting
+        currency.
+        """
+        _, current_values, unrealized_gains = self.fetch_versioned_values()
+        return current_values, unrealized_gains
+
+    def fetch_versioned_values(self) -> tuple[int, dict, dict]:
+        """
+        Get the current values and unrealized gains of the owned securities of
+        this asset type (see `fetch_current_values`), with the version of the
+        snapshot they were valued at.
+        """
+        if not self.in_usd:
+            version, holdings = self._versioned_holdings()
+            return (
+                version,
+                holdings["value"].to_dict(),
+                holdings["unrealized_gain"].to_dict(),
+            )
+        version, current_values, unrealized_gains = self.book.fetch_versioned_values()
+        return (
+            version,
+            {k: v for k, v in current_values.items() if k in self.securities},
+            {k: v for k, v in unrealized_gains.items() if k in self.securities},
+        )
 
-        for stock, splits in stock_splits.items():
-            if splits.empty:
-                continue  # Skip if no splits for this stock
+    def get_holdings(self) -> pd.DataFrame:
+        """
+        Value, cost basis and unrealized gains of the owned securities of this
+        asset type in the reporting currency, with the gains split into price
+        and FX gains (see `reporting.holdings_in_currency`).
+        """
+        _, holdings = self._versioned_holdings()
+        return holdings
 
-            self._apply_splits_to_stock(stock, splits)
+    def _versioned_holdings(self) -> tuple[int, pd.DataFrame]:
+        """Holdings (see `get_holdings`) and the snapshot version they were valued at."""
+        if self.book.snapshot.is_empty:
+            self.book.refresh_prices()
+        version, prices = self.book.snapshot.read()
+        positions = {
+            security: position
+            for security, position in self.stocks.owned_shares.items()
+            if security in self.securities
+        }
+        return version, holdings_in_currency(
+            positions, prices, self.reporting_currency, self.book.snapshot.fetched_at
+        )
 
-    def _apply_splits_to_stock(self, stock: str, splits: pd.Series) -> None:
-        """Applies splits to the transactions of a single stock."""
-        for split_date, split_ratio in splits.sort_index().items():
-            split_date = pd.to_datetime(split_date).tz_localize(None)
+    def generate_realized_gains_dataframe(self) -> pd.DataFrame:
+        """
+        Build and return the DataFrame for realized gains of this asset type,
+        in the reporting currency, net of fees if the book has any.
+        """
+        converted = (
+            None
+            if self.in_usd
+            else realized_in_currency(
+                self.transactions, self.reporting_currency, self.stocks.cost_basis
+            )
+        )
+        return self.stocks.generate_realized_gains_dataframe(
+            self.securities, converted, self.get_fees()
+        )
 
-            # Identify relevant transactions for this stock and split date
-            mask = (self.transactions["security"] == stock) & (self.transactions["date"] < split_date)
+    def compare_cost_basis(self, methods: list[str] = METHODS) -> pd.DataFrame:
+        """
+        Realized gains of this asset type under several cost-basis methods,
+        side by side, in the reporting currency (see `reporting.realized_by_method`).
+        """
+        return realized_by_method(self.transactions, self.reporting_currency, methods)
 
-            if mask.any():
-                self.transactions.loc[mask, "quantity"] *= split_ratio
-                self.transactions.loc[mask, "price_per_share"] /= split_ratio
+    def get_performance_history(self) -> pd.DataFrame:
+        """
+        Daily value and returns of this asset type, net of its transaction fees
+        (see `portfolio_history`).
+        """
+        fees = self.transaction_fees()
+        return portfolio_history(
+            self.transactions,
+            currency=self.reporting_currency,
+            fees=(
+                None
+                if fees is None
+                else fees_by_day(self.transactions["date"].to_numpy(), fees)
+            ),
+        )
 
-    def _update_current_values(self) -> None:
+    def get_benchmark_comparison(self, **kwargs) -> BenchmarkComparison:
         """
-        Update the current values of the stocks and store them in an internal attribute.
+        Rolling comparison of this asset type against a benchmark.
+
+        Parameters:
+        - kwargs: 'ticker' and 'window' of the comparison (default to `config.benchmark`)
         """
-        self._current_values = self.stocks.fetch_current_values()[0]
+        return BenchmarkComparison(
+            self.get_performance_history(), currency=self.reporting_currency, **kwargs
+        )
 
     def current_portfolio_value(self) -> float:
         """
         Calculate the current value of the portfolio.
 
         Returns:
-        - total_value (float): The total current value of the portfolio in USD.
+        - total_value (float): The total current value of the portfolio in the reporting currency.
         """
-        if self._current_values is None:
-            self._update_current_values()
+        current_values, _ = self.fetch_current_values()
 
-        total_value = sum(self._current_values.values())
+        total_value = sum(current_values.values())
         return total_value
 
     def stock_percentage_of_portfolio(self) -> dict:
@@ -322,13 +981,12 @@ class PortfolioManager:
         Returns:
         - stock_percentages (dict): A dictionary where keys are stock names and values are their percentage of the total portfolio.
         """
-        if self._current_values is None:
-            self._update_current_values()
+        current_values, _ = self.fetch_current_values()
 
         total_value = self.current_portfolio_value()
 
         stock_percentages = {}
-        for symbol, value in self._current_values.items():
+        for symbol, value in current_values.items():
             stock_percentages[symbol] = (
                 (value / total_value) * 100 if total_value != 0 else 0
             )
@@ -340,22 +998,35 @@ class PortfolioManager:
 
         Returns:
         - pd.DataFrame: A DataFrame with columns 'Index Funds' and 'Stocks',
-          and rows ['Current Value', 'Investment', 'Unrealized Gains'].
+          and rows ['Current Value', 'Investment', 'Unrealized Gains'], in the
+          reporting currency. Outside USD, the unrealized gains are split into
+          the rows 'Price Gains' and 'FX Gains'. If the book has fees, the
+          fees of the owned shares add to their investment and reduce their
+          gains.
         """
-        # Ensure current values are updated
-        if self._current_values is None:
-            self._update_current_values()
+        if not self.in_usd:
+            holdings = self.get_holdings().sum()
+            overview = {
+                "Metric": [
+                    "Current Value",
+                    "Investment",
+                    "Unrealized Gains",
+                    "Price Gains",
+                    "FX Gains",
+                ],
+                "Stocks": holdings[
+                    ["value", "cost_basis", "unrealized_gain", "price_gain", "fx_gain"]
+                ].to_list(),
+            }
+            return self._with_fees(pd.DataFrame(overview).set_index("Metric"))
 
         # Calculate current values and unrealized gains
-        current_values, unrealized_gains = self.stocks.fetch_current_values()
+        current_values, unrealized_gains = self.fetch_current_values()
 
         owned_stocks = {
             k: v
             for k, v in self.stocks.investment_per_asset.items()
-            if self.transactions[self.transactions["security"] == k][
-                "type_of_asset"
-            ].iloc[0]
-            == self.asset_type
+            if k in self.securities
         }
         total_investment_stocks = sum(owned_stocks.values())
         current_value_stocks = sum(
@@ -375,4 +1046,18 @@ class PortfolioManager:
             ],
         }
 
-        return pd.DataFrame(overview).set_index("Metric")
+        return self._with_fees(pd.DataFrame(overview).set_index("Metric"))
+
+    def _with_fees(self, overview: pd.DataFrame) -> pd.DataFrame:
+        """Overview with the fees of the owned shares in their cost."""
+        fees = self.get_fees()
+        if fees is None:
+            return overview
+        owned = fees.index.intersection(list(self.get_owned_assets()))
+        open_fees = fees.loc[owned, "open_fees"].sum()
+        overview.loc["Investment"] += open_fees
+        overview.loc["Unrealized Gains"] -= open_fees
+        if not self.in_usd:
+            # Fees are counted against the price gains
+            overview.loc["Price Gains"] -= open_fees
+        return overview
@@ -0,0 +1,271 @@
+"""
+Portfolio performance over time.
+
+The holdings of every security on every calendar day are the cumulative sums of
+the signed (split-adjusted) transaction quantities, giving a dates × securities
+matrix. Multiplying it by the matching matrices of daily closing prices and
+exchange rates values the whole history in the reporting currency (USD by
+default) in a single NumPy operation, and the returns are derived from the
+daily values and cash flows:
+
+- time-weighted return (TWR): chained daily returns net of cash flows, which
+  measures the investments regardless of when money was added or withdrawn;
+- money-weighted return (MWR): the annualized internal rate of return of the
+  cash flows (XIRR), which measures the return of the money actually invested.
+
+Buys are cash flows into the portfolio and sell proceeds are cash flows out of
+it, since cash positions are not tracked. Fees (see `fees`) are cash flows into
+the portfolio that add no value, so they lower both returns.
+"""
+
+import numpy as np
+import pandas as pd
+
+from portfolio_tracker.data_fetching import fetch_close_prices, fx_rates
+
+DAYS_PER_YEAR = 365.0
+
+
+def portfolio_history(
+    transactions: pd.DataFrame,
+    end_date=None,
+    currency: str = "USD",
+    fees: pd.Series | None = None,
+) -> pd.DataFrame:
+    """
+    Compute the daily value and returns of a portfolio.
+
+    Parameters:
+    - transactions: Split-adjusted transactions, with the columns of the type1 ledger
+    - end_date: Last date of the history (defaults to today)
+    - currency: Currency of the amounts; holdings are valued at the exchange
+      rate of every day and cash flows at the rate of their trade date
+    - fees: Fees paid on each day in USD, indexed by date (see
+      `fees.FeeAllocation`); fees before the first transaction are paid on its day
+
+    Returns:
+    - DataFrame indexed by calendar date, from the first transaction to
+      `end_date`, with the columns:
+        - 'value': Value of the holdings at the close
+        - 'cash_flow': Net amount invested on the day (sells are negative),
+          including fees
+        - 'fees': Fees paid on the day
+        - 'invested_capital': Cumulative net amount invested
+        - 'twr': Cumulative time-weighted return since the first transaction
+        - 'mwr': Annualized money-weighted return since the first transaction
+    """
+    end_date = pd.Timestamp.now() if end_date is None else pd.Timestamp(end_date)
+    transactions = transactions[
+        transactions["action"].isin(["buy", "sell"])
+        & (transactions["date"] <= end_date)
+    ]
+    if transactions.empty:
+        return pd.DataFrame(
+            columns=["value", "cash_flow", "fees", "invested_capital", "twr", "mwr"],
+            index=pd.DatetimeIndex([], name="date"),
+        )
+
+    dates = pd.date_range(
+        transactions["date"].min().normalize(), end_date.normalize(), name="date"
+    )
+    day = dates.searchsorted(transactions["date"].dt.normalize())
+    is_buy = (transactions["action"] == "buy").to_numpy()
+
+    holdings = holdings_matrix(transactions, dates)
+    prices = price_matrix(transactions, dates, holdings.columns)
+
+    # Exchange rate of each security's trading currency, as a matrix of the same shape
+    currency_names = pd.Index(transactions["currency"].unique())
+    currencies = transactions.drop_duplicates("security").set_index("security")[
+        "currency"
+    ]
+    currency_codes = currency_names.get_indexer(currencies.reindex(holdings.columns))
+    exchange_rates = exchange_rate_matrix(list(currency_names), dates, currency)
+
+    held = holdings.to_numpy()
+    values = np.where(
+        held != 0,
+        held * prices.to_numpy() * exchange_rates[:, currency_codes],
+        0.0,
+    ).sum(axis=1)
+
+    # Cash flows at the exchange rate of the trade date
+    transaction_rates = exchange_rates[
+        day, currency_names.get_indexer(transactions["currency"])
+    ]
+    amounts = transactions["total_transaction_price"].to_numpy(dtype=float)
+    cash_flows = np.bincount(
+        day,
+        weights=np.where(is_buy, amounts, -amounts) * transaction_rates,
+        minlength=len(dates),
+    )
+    daily_fees = np.zeros(len(dates))
+    if fees is not None:
+        fees = fees[fees.index <= end_date]
+        daily_fees = np.bincount(
+            dates.searchsorted(fees.index.normalize()),
+            weights=fees.to_numpy(dtype=float)
+            * fx_rates.rates_for("USD", currency, fees.index),
+            minlength=len(dates),
+        )
+        cash_flows = cash_flows + daily_fees
+
+    return pd.DataFrame(
+        {
+            "value": values,
+            "cash_flow": cash_flows,
+            "fees": daily_fees,
+            "invested_capital": np.cumsum(cash_flows),
+            "twr": time_weighted_returns(values, cash_flows),
+            "mwr": money_weighted_returns(dates, values, cash_flows),
+        },
+        index=dates,
+    )
+
+
+def holdings_matrix(
+    transactions: pd.DataFrame,
+    dates: pd.DatetimeIndex,
+) -> pd.DataFrame:
+    """
+    Quantity held of every security at the end of every day.
+
+    Parameters:
+    - transactions: Split-adjusted buys and sells, dated within `dates`
+    - dates: Consecutive calendar days
+
+    Returns:
+    - DataFrame indexed by `dates`, with a column per security.
+    """
+    day = dates.searchsorted(transactions["date"].dt.normalize())
+    codes, securities = pd.factorize(transactions["security"])
+    quantity = transactions["quantity"].to_numpy(dtype=float)
+    signed_quantity = np.where(transactions["action"] == "buy", quantity, -quantity)
+
+    changes = np.zeros((len(dates), len(securities)))
+    np.add.at(changes, (day, codes), signed_quantity)
+
+    return pd.DataFrame(np.cumsum(changes, axis=0), index=dates, columns=securities)
+
+
+def price_matrix(
+    transactions: pd.DataFrame,
+    dates: pd.DatetimeIndex,
+    securities: pd.Index,
+) -> pd.DataFrame:
+    """
+    Price of every security at the end of every day, in its trading currency.
+
+    Closing prices are carried forward over weekends and holidays. Where no
+    close is available yet (e.g., a price history missing from the market
+    data), the last transaction price is used instead.
+
+    Returns:
+    - DataFrame indexed by `dates`, with a column per security.
+    """
+    closes = fetch_close_prices(list(securities), dates[0], dates[-1])
+    if not closes.empty:
+        closes.index = pd.DatetimeIndex(closes.index).normalize()
+    closes = closes.reindex(index=dates, columns=securities)
+
+    last_trades = transactions.assign(
+        date=transactions["date"].dt.normalize()
+    ).drop_duplicates(["date", "security"], keep="last")
+    trade_prices = last_trades.pivot(
+        index="date", columns="security", values="price_per_share"
+    ).reindex(index=dates, columns=securities)
+
+    return closes.fillna(trade_prices).ffill()
+
+
+def exchange_rate_matrix(
+    currencies: list[str],
+    dates: pd.DatetimeIndex,
+    target_currency: str = "USD",
+) -> np.ndarray:
+    """
+    Exchange rate of every currency to `target_currency` on every day.
+
+    Returns:
+    - Array of shape (len(dates), len(currencies)).
+    """
+    fx_rates.prefetch(
+        {currency: (dates[0], dates[-1]) for currency in [*currencies, target_currency]}
+    )
+    exchange_rates = np.ones((len(dates), len(currencies)))
+    for column, currency in enumerate(currencies):
+        if currency == target_currency:
+            continue
+        rates = fx_rates.rates_for(currency, target_currency, dates)
+        if np.isnan(rates).any():
+            raise ValueError(f"Exchange rate not available for {currency}")
+        exchange_rates[:, column] = rates
+    return exchange_rates
+
+
+def time_weighted_returns(
+    values: np.ndarray,
+    cash_flows: np.ndarray,
+) -> np.ndarray:
+    """
+    Cumulative time-weighted returns.
+
+    Cash flows are assumed to happen at the close, so the return of a day is
+    the change in value not explained by the cash flows, relative to the value
+    of the previous day. Days starting with an empty portfolio have no return.
+    """
+    previous_values = np.concatenate([[0.0], values[:-1]])
+    growth = np.divide(
+        values - cash_flows,
+        previous_values,
+        out=np.ones_like(values),
+        where=previous_values > 0,
+    )
+    return np.cumprod(growth) - 1
+
+
+def money_weighted_returns(
+    dates: pd.DatetimeIndex,
+    values: np.ndarray,
+    cash_flows: np.ndarray,
+    iterations: int = 50,
+    chunk_size: int = 256,
+) -> np.ndarray:
+    """
+    Annualized money-weighted returns (XIRR) from the first day to every day.
+
+    For every end day T, solves sum_t cash_flow_t * (1 + r) ** years(t, T) =
+    value_T for r with Newton's method. All end days are solved at once, in
+    chunks of `chunk_size` days to bound memory. Days without a solution are NaN.
+    """
+    flow_days = np.flatnonzero(cash_flows)
+    flows = cash_flows[flow_days][:, np.newaxis]
+    years = (dates - dates[0]).days.to_numpy() / DAYS_PER_YEAR
+
+    returns = np.full(len(dates), np.nan)
+    for start in range(0, len(dates), chunk_size):
+        end_days = np.arange(start, min(start + chunk_size, len(dates)))
+        # Years from every cash flow to every end day; later flows do not count
+        elapsed = years[end_days] - years[flow_days][:, np.newaxis]
+        weights = np.where(elapsed >= 0, flows, 0.0)
+        elapsed = np.maximum(elapsed, 0.0)
+        target = values[end_days]
+
+        rate = np.full(len(end_days), 0.1)
+        for _ in range(iterations):
+            log_growth = np.log1p(rate)
+            growth = np.exp(elapsed * log_growth)
+            residual = (weights * growth).sum(axis=0) - target
+            slope = (weights * elapsed * growth).sum(axis=0) / (1 + rate)
+            step = np.divide(residual, slope, out=np.zeros_like(rate), where=slope != 0)
+            rate = np.maximum(rate - step, -0.9999)
+            if np.abs(step).max() < 1e-12:
+                break
+
+        growth = np.exp(elapsed * np.log1p(rate))
+        residual = (weights * growth).sum(axis=0) - target
+        scale = np.abs(weights).sum(axis=0) + np.abs(target)
+        solved = (np.abs(residual) <= 1e-6 * scale) & (elapsed.max(axis=0) > 0)
+        returns[end_days] = np.where(solved, rate, np.nan)
+
+    return returns
@@ -67,3 +67,229 @@ def create_unrealized_gains_plot(
         marker_line_width=1,
     )
     return fig
+
+
+def create_value_history_plot(
+    history: pd.DataFrame,
+    currency: str = "USD",
+) -> Figure:
+    """Create a line plot of the portfolio value against the invested capital.
+
+    :param history: daily portfolio history (see `performance.portfolio_history`)
+    :param currency: currency of the history
+    :return: a go.Figure
+
+    """
+    fig = go.Figure(
+        data=[
+            go.Scatter(
+                x=history.index,
+                y=history["value"],
+                name="Value",
+                line=dict(color=config.colors.blue_color),
+            ),
+            go.Scatter(
+                x=history.index,
+                y=history["invested_capital"],
+                name="Invested capital",
+                line=dict(color=config.colors.txt_color, dash="dot"),
+            ),
+        ]
+    )
+    fig.update_layout(
+        paper_bgcolor=config.colors.bg_color,  # Background of figure
+        plot_bgcolor=config.colors.bg_color,  # Background of plot area
+        font=dict(color=config.colors.txt_color),  # Text color
+        yaxis_title=currency,
+    )
+    return fig
+
+
+def create_returns_plot(
+    history: pd.DataFrame,
+) -> Figure:
+    """Create a line plot of the time- and money-weighted returns.
+
+    :param history: daily portfolio history (see `performance.portfolio_history`)
+    :return: a go.Figure
+
+    """
+    fig = go.Figure(
+        data=[
+            go.Scatter(
+                x=history.index,
+                y=history["twr"] * 100,
+                name="Time-weighted (cumulative)",
+                line=dict(color=config.colors.blue_color),
+            ),
+            go.Scatter(
+                x=history.index,
+                y=history["mwr"] * 100,
+                name="Money-weighted (annualized)",
+                line=dict(color=config.colors.txt_color),
+            ),
+        ]
+    )
+    fig.update_layout(
+        paper_bgcolor=config.colors.bg_color,  # Background of figure
+        plot_bgcolor=config.colors.bg_color,  # Background of plot area
+        font=dict(color=config.colors.txt_color),  # Text color
+        yaxis_title="Return (%)",
+    )
+    return fig
+
+
+def create_benchmark_plot(
+    levels: pd.DataFrame,
+    ticker: str,
+) -> Figure:
+    """Create a line plot of the portfolio growth against a benchmark.
+
+    :param levels: portfolio growth and benchmark closes (see `BenchmarkComparison.levels`)
+    :param ticker: ticker of the benchmark
+    :return: a go.Figure
+
+    """
+    # Both series rebased to the first day compared
+    rebased = (levels / levels.iloc[0] - 1) * 100 if len(levels) else levels
+    fig = go.Figure(
+        data=[
+            go.Scatter(
+                x=rebased.index,
+                y=rebased["portfolio"],
+                name="Portfolio (time-weighted)",
+                line=dict(color=config.colors.blue_color),
+            ),
+            go.Scatter(
+                x=rebased.index,
+                y=rebased["benchmark"],
+                name=ticker,
+                line=dict(color=config.colors.txt_color),
+            ),
+        ]
+    )
+    fig.update_layout(
+        paper_bgcolor=config.colors.bg_color,  # Background of figure
+        plot_bgcolor=config.colors.bg_color,  # Background of plot area
+        font=dict(color=config.colors.txt_color),  # Text color
+        yaxis_title="Cumulative return (%)",
+    )
+    return fig
+
+
+def create_drawdown_plot(
+    metrics: pd.DataFrame,
+    ticker: str,
+) -> Figure:
+    """Create a line plot of the drawdowns of the portfolio and a benchmark.
+
+    :param metrics: rolling metrics (see `BenchmarkComparison.metrics`)
+    :param ticker: ticker of the benchmark
+    :return: a go.Figure
+
+    """
+    fig = go.Figure(
+        data=[
+            go.Scatter(
+                x=metrics.index,
+                y=metrics["portfolio_drawdown"] * 100,
+                name="Portfolio",
+                line=dict(color=config.colors.blue_color),
+            ),
+            go.Scatter(
+                x=metrics.index,
+                y=metrics["benchmark_drawdown"] * 100,
+                name=ticker,
+                line=dict(color=config.colors.txt_color),
+            ),
+        ]
+    )
+    fig.update_layout(
+        paper_bgcolor=config.colors.bg_color,  # Background of figure
+        plot_bgcolor=config.colors.bg_color,  # Background of plot area
+        font=dict(color=config.colors.txt_color),  # Text color
+        yaxis_title="Drawdown (%)",
+    )
+    return fig
+
+
+def create_rolling_risk_plot(
+    metrics: pd.DataFrame,
+    ticker: str,
+) -> Figure:
+    """Create a line plot of rolling volatilities, tracking error and beta.
+
+    :param metrics: rolling metrics (see `BenchmarkComparison.metrics`)
+    :param ticker: ticker of the benchmark
+    :return: a go.Figure
+
+    """
+    fig = go.Figure(
+        data=[
+            go.Scatter(
+                x=metrics.index,
+                y=metrics["portfolio_volatility"] * 100,
+                name="Portfolio volatility",
+                line=dict(color=config.colors.blue_color),
+            ),
+            go.Scatter(
+                x=metrics.index,
+                y=metrics["benchmark_volatility"] * 100,
+                name=f"{ticker} volatility",
+                line=dict(color=config.colors.txt_color),
+            ),
+            go.Scatter(
+                x=metrics.index,
+                y=metrics["tracking_error"] * 100,
+                name="Tracking error",
+                line=dict(color=config.colors.txt_color, dash="dot"),
+            ),
+            go.Scatter(
+                x=metrics.index,
+                y=metrics["beta"],
+                name="Beta",
+                line=dict(color=config.colors.blue_color, dash="dot"),
+                yaxis="y2",
+            ),
+        ]
+    )
+    fig.update_layout(
+        paper_bgcolor=config.colors.bg_color,  # Background of figure
+        plot_bgcolor=config.colors.bg_color,  # Background of plot area
+        font=dict(color=config.colors.txt_color),  # Text color
+        yaxis_title="Annualized (%)",
+        yaxis2=dict(title="Beta", overlaying="y", side="right", showgrid=False),
+    )
+    return fig
+
+
+def create_dividend_income_plot(
+    income: pd.Series,
+    currency: str = "USD",
+) -> Figure:
+    """Create a bar plot of the dividend income per month.
+
+    :param income: income per month (see `dividends.monthly_income`)
+    :param currency: currency of the income
+    :return: a go.Figure
+
+    """
+    fig = go.Figure(
+        data=[
+            go.Bar(
+                x=income.index.to_timestamp(),
+                y=income.to_numpy(),
+                name="Dividend income",
+                marker_color=config.colors.blue_color,
+                marker_line_color="black",
+                marker_line_width=1,
+            )
+        ]
+    )
+    fig.update_layout(
+        paper_bgcolor=config.colors.bg_color,  # Background of figure
+        plot_bgcolor=config.colors.bg_color,  # Background of plot area
+        font=dict(color=config.colors.txt_color),  # Text color
+        yaxis_title=currency,
+    )
+    return fig
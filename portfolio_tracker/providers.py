@@ -0,0 +1,248 @@
+"""
+Market data providers.
+
+`MarketDataProvider` is the interface used by `data_fetching` to obtain quotes,
+daily histories, exchange rates, stock splits, dividends and crypto quotes:
+
+- `YahooProvider` fetches live data from yfinance (stocks, FX) and ccxt (crypto).
+- `FixtureProvider` reads recorded CSV/Parquet fixtures from a local folder, for
+  deterministic benchmarks and air-gapped use.
+
+The provider is selected through `config.market_data.provider`.
+"""
+
+from functools import cache, lru_cache
+from pathlib import Path
+from typing import Protocol
+
+import ccxt
+import pandas as pd
+import yfinance as yf
+from yfinance.exceptions import YFException
+
+from portfolio_tracker.config import config
+
+# Errors of market data requests that may not recur: network and HTTP errors
+# (OSError, which the errors of requests and curl_cffi derive from), Yahoo
+# errors such as rate limits, and exchange errors
+PROVIDER_ERRORS = (OSError, YFException, ccxt.BaseError)
+
+
+class MarketDataProvider(Protocol):
+    # Whether responses should go through the on-disk market data cache
+    cacheable: bool
+
+    def get_quotes(self, symbols: list[str]) -> dict[str, float]:
+        """Latest prices of stocks or index funds, for the symbols available."""
+        ...
+
+    def get_history(
+        self, ticker: str, start_date: pd.Timestamp, end_date: pd.Timestamp
+    ) -> pd.Series:
+        """
+        Daily closing prices between two dates (inclusive), indexed by date,
+        adjusted for splits but not for dividends.
+        """
+        ...
+
+    def get_fx_history(
+        self,
+        base_currency: str,
+        target_currency: str,
+        start_date: pd.Timestamp,
+        end_date: pd.Timestamp,
+    ) -> pd.Series:
+        """Daily exchange rates between two dates (inclusive), indexed by date."""
+        ...
+
+    def get_splits(self, symbol: str) -> pd.Series:
+        """Split ratios of a stock, indexed by split date."""
+        ...
+
+    def get_dividends(self, symbol: str) -> pd.Series:
+        """
+        Split-adjusted dividends per share of a stock or index fund, in its
+        trading currency, indexed by ex-dividend date.
+        """
+        ...
+
+    def get_crypto_quotes(
+        self, symbols: list[str], exchange_name: str
+    ) -> dict[str, float]:
+        """Latest USDT prices of cryptocurrencies on an exchange."""
+        ...
+
+
+class YahooProvider:
+    """Live market data from yfinance, and from ccxt for cryptocurrencies."""
+
+    cacheable = True
+
+    def get_quotes(self, symbols: list[str]) -> dict[str, float]:
+        prices = {}
+
+        for symbol in symbols:
+            data = yf.Ticker(symbol).history(
+                period="1d", timeout=config.market_data.timeout
+            )
+            if not data.empty:
+                prices[symbol] = data["Close"].iloc[-1]
+
+        return prices
+
+    def get_history(
+        self, ticker: str, start_date: pd.Timestamp, end_date: pd.Timestamp
+    ) -> pd.Series:
+        # Closes adjusted for splits only, like the ledger: dividend-adjusted
+        # closes would lower past values (dividends are income, see `dividends`)
+        hist = yf.Ticker(ticker).history(
+            start=start_date,
+            end=end_date + pd.Timedelta(days=1),
+            auto_adjust=False,
+            timeout=config.market_data.timeout,
+        )
+        return hist["Close"] if not hist.empty else pd.Series(dtype=float)
+
+    def get_fx_history(
+        self,
+        base_currency: str,
+        target_currency: str,
+        start_date: pd.Timestamp,
+        end_date: pd.Timestamp,
+    ) -> pd.Series:
+        return self.get_history(
+            f"{base_currency}{target_currency}=X", start_date, end_date
+        )
+
+    def get_splits(self, symbol: str) -> pd.Series:
+        return yf.Ticker(symbol).splits
+
+    def get_dividends(self, symbol: str) -> pd.Series:
+        return yf.Ticker(symbol).dividends
+
+    def get_crypto_quotes(
+        self, symbols: list[str], exchange_name: str
+    ) -> dict[str, float]:
+        exchange = _crypto_exchange(exchange_name)
+        # Markets are loaded once per client; unlisted pairs would fail the batch
+        markets = exchange.load_markets()
+        pairs = {
+            f"{symbol}/USDT": symbol
+            for symbol in symbols
+            if f"{symbol}/USDT" in markets
+        }
+        if not pairs:
+            return {}
+        if exchange.has.get("fetchTickers"):
+            # All symbols of the exchange in one round trip
+            tickers = exchange.fetch_tickers(list(pairs))
+        else:
+            tickers = {pair: exchange.fetch_ticker(pair) for pair in pairs}
+        return {
+            pairs[pair]: ticker["last"]
+            for pair, ticker in tickers.items()
+            if pair in pairs and ticker.get("last") is not None
+        }
+
+
+class FixtureProvider:
+    """
+    Recorded market data read from a local folder.
+
+    Each fixture is a CSV file, or a Parquet file with the same name and a
+    `.parquet` suffix (which takes precedence):
+
+    - quotes.csv: columns 'symbol', 'price'
+    - crypto_quotes.csv: columns 'symbol', 'price'
+    - history/<ticker>.csv: columns 'date', 'close' (FX rates use tickers
+      such as 'EURUSD=X')
+    - splits/<ticker>.csv: columns 'date', 'ratio'
+    - dividends/<ticker>.csv: columns 'date' (ex-dividend date), 'amount'
+    """
+
+    cacheable = False
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+
+    def _read(self, name: str) -> pd.DataFrame | None:
+        return _read_fixture(self.path / name)
+
+    def _read_prices(self, name: str) -> dict[str, float]:
+        prices = self._read(name)
+        if prices is None:
+            return {}
+        return dict(zip(prices["symbol"], prices["price"].astype(float)))
+
+    def _read_series(self, name: str, column: str) -> pd.Series:
+        data = self._read(name)
+        if data is None:
+            return pd.Series(dtype=float, index=pd.DatetimeIndex([]))
+        return pd.Series(
+            data[column].to_numpy(dtype=float),
+            index=pd.DatetimeIndex(pd.to_datetime(data["date"])),
+        ).sort_index()
+
+    def get_quotes(self, symbols: list[str]) -> dict[str, float]:
+        prices = self._read_prices("quotes")
+        return {symbol: prices[symbol] for symbol in symbols if symbol in prices}
+
+    def get_history(
+        self, ticker: str, start_date: pd.Timestamp, end_date: pd.Timestamp
+    ) -> pd.Series:
+        history = self._read_series(f"history/{ticker}", "close")
+        return history[start_date:end_date]
+
+    def get_fx_history(
+        self,
+        base_currency: str,
+        target_currency: str,
+        start_date: pd.Timestamp,
+        end_date: pd.Timestamp,
+    ) -> pd.Series:
+        return self.get_history(
+            f"{base_currency}{target_currency}=X", start_date, end_date
+        )
+
+    def get_splits(self, symbol: str) -> pd.Series:
+        return self._read_series(f"splits/{symbol}", "ratio")
+
+    def get_dividends(self, symbol: str) -> pd.Series:
+        return self._read_series(f"dividends/{symbol}", "amount")
+
+    def get_crypto_quotes(
+        self, symbols: list[str], exchange_name: str
+    ) -> dict[str, float]:
+        prices = self._read_prices("crypto_quotes")
+        return {symbol: prices[symbol] for symbol in symbols if symbol in prices}
+
+
+@cache
+def _crypto_exchange(exchange_name: str) -> ccxt.Exchange:
+    """Client of a crypto exchange, created once per process and reused."""
+    return getattr(ccxt, exchange_name)(
+        {"timeout": int(config.market_data.timeout * 1000)}
+    )
+
+
+@cache
+def _read_fixture(path: Path) -> pd.DataFrame | None:
+    """Reads a fixture file once per process; Parquet takes precedence over CSV."""
+    parquet_file = path.with_name(f"{path.name}.parquet")
+    if parquet_file.exists():
+        return pd.read_parquet(parquet_file)
+    csv_file = path.with_name(f"{path.name}.csv")
+    if csv_file.exists():
+        return pd.read_csv(csv_file)
+    return None
+
+
+@lru_cache(maxsize=1)
+def get_provider() -> MarketDataProvider:
+    """Market data provider selected in the configuration."""
+    settings = config.market_data
+    if settings.provider == "yahoo":
+        return YahooProvider()
+    if settings.provider == "fixtures":
+        return FixtureProvider(settings.fixtures_path)
+    raise ValueError(f"Unknown market data provider: {settings.provider}")
@@ -0,0 +1,44 @@
+import logging
+import threading
+
+from portfolio_tracker.manager import PortfolioBook
+from portfolio_tracker.providers import PROVIDER_ERRORS
+
+logger = logging.getLogger(__name__)
+
+
+class PriceRefresher:
+    """
+    Refreshes the prices of a PortfolioBook on a background thread.
+
+    Every `interval` seconds the book's price snapshot is refreshed and the
+    values of the securities whose price moved are recomputed. Lot matching is
+    never re-run, and request handlers keep reading the last computed values
+    while quotes are being fetched.
+    """
+
+    def __init__(self, book: PortfolioBook, interval: float) -> None:
+        self.book = book
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="price-refresher", daemon=True
+        )
+
+    def start(self) -> None:
+        """Start refreshing in the background."""
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop refreshing, waiting for an ongoing refresh to finish."""
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.book.refresh_prices(force=True)
+                self.book.fetch_current_values()
+            # Quotes that cannot be fetched are retried on the next refresh
+            except (*PROVIDER_ERRORS, LookupError, ValueError):
+                logger.exception("Error refreshing prices")
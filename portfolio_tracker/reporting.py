@@ -0,0 +1,276 @@
+"""
+Conversion of the portfolio to a reporting currency.
+
+The lot matching keeps every amount in USD. In another reporting currency, the
+cost basis of a lot is converted at the exchange rate of its acquisition date
+and market values at the rate of the price snapshot, so unrealized gains split
+into:
+
+- price gains: the gain in USD, converted at the current rate,
+- FX gains: the change of the exchange rate since acquisition, applied to the
+  USD cost basis.
+
+Realized gains split the same way, at the rate of the date of each sell, with
+the lots matched by any cost-basis method (see `cost_basis`). Transaction fees
+(see `fees`) are matched with the same lots as the shares they were paid for:
+the fee of a buy adds to the cost of its lots, and the fee of a sell reduces
+its proceeds.
+Conversions are whole-array multiplies over the lots (or transactions) of all
+securities at once, with one exchange rate lookup per currency.
+"""
+
+import numpy as np
+import pandas as pd
+
+from portfolio_tracker.cost_basis import METHODS, create_pool, lot_names, match_lots
+from portfolio_tracker.data_fetching import fx_rates
+from portfolio_tracker.lots import Position, match_fifo
+
+
+def holdings_in_currency(
+    positions: dict[str, Position],
+    prices: dict[str, float],
+    currency: str,
+    date=None,
+) -> pd.DataFrame:
+    """
+    Value and cost basis of open positions in a reporting currency.
+
+    Parameters:
+    - positions: Open positions, with lot prices in USD
+    - prices: Current prices in USD
+    - currency: Reporting currency (e.g., 'GBP')
+    - date: Time of the prices (defaults to today)
+
+    Returns:
+    - DataFrame indexed by security, with the columns 'value', 'cost_basis',
+      'unrealized_gain', 'price_gain' and 'fx_gain', in `currency`.
+    """
+    securities = list(positions)
+    lot_counts = [len(position) for position in positions.values()]
+    owner = np.repeat(np.arange(len(securities)), lot_counts)
+    if securities:
+        lot_cost = np.concatenate(
+            [
+                position.lot_quantity * position.lot_price
+                for position in positions.values()
+            ]
+        )
+        lot_date = np.concatenate(
+            [position.lot_date for position in positions.values()]
+        )
+    else:
+        lot_cost, lot_date = np.empty(0), np.empty(0, dtype="datetime64[D]")
+
+    lot_rates = fx_rates.rates_for("USD", currency, lot_date)
+    rate = fx_rates.rate("USD", currency, date)
+    cost_usd = np.bincount(owner, weights=lot_cost, minlength=len(securities))
+    cost_basis = np.bincount(
+        owner, weights=lot_cost * lot_rates, minlength=len(securities)
+    )
+    value_usd = np.array(
+        [
+            positions[security].quantity * prices.get(security, 0)
+            for security in securities
+        ],
+        dtype=float,
+    )
+
+    return pd.DataFrame(
+        {
+            "value": value_usd * rate,
+            "cost_basis": cost_basis,
+            "unrealized_gain": value_usd * rate - cost_basis,
+            "price_gain": (value_usd - cost_usd) * rate,
+            "fx_gain": cost_usd * rate - cost_basis,
+        },
+        index=pd.Index(securities, name="security"),
+    )
+
+
+def realized_in_currency(
+    transactions: pd.DataFrame, currency: str, method: str = "fifo"
+) -> pd.DataFrame:
+    """
+    Realized gains of matched sells in a reporting currency.
+
+    Sold shares cost their lots' USD cost at the rate of each lot's
+    acquisition date, and proceeds are converted at the rate of the sell date.
+
+    Parameters:
+    - transactions: Split-adjusted, validated transactions
+    - currency: Reporting currency (e.g., 'GBP')
+    - method: Cost-basis method the lots are matched with (see `cost_basis.METHODS`)
+
+    Returns:
+    - DataFrame indexed by security, with the columns 'total_sold_value',
+      'realized_gains', 'price_gains' and 'fx_gains', in `currency`.
+    """
+    trades = _Trades(transactions, currency)
+    sell_cost_usd = np.zeros(len(trades.quantity))
+    sell_cost = np.zeros(len(trades.quantity))
+    for security, rows in trades.groups():
+        # Lots are consumed in the same order whatever the currency of their
+        # prices (HIFO ranks them by USD price), so the cost in the reporting
+        # currency matches the same slices of lots
+        for cost, prices in (
+            (sell_cost_usd, trades.price_usd[rows]),
+            (sell_cost, trades.price_usd[rows] * trades.rates[rows]),
+        ):
+            cost[rows] = trades.sell_cost(security, rows, prices, [method])[method]
+
+    sold_value_usd = trades.sold_value_usd
+    rates = trades.rates
+    return trades.per_security(
+        {
+            "total_sold_value": sold_value_usd * rates,
+            "realized_gains": sold_value_usd * rates - sell_cost,
+            "price_gains": (sold_value_usd - sell_cost_usd) * rates,
+            "fx_gains": sell_cost_usd * rates - sell_cost,
+        }
+    )
+
+
+def realized_by_method(
+    transactions: pd.DataFrame, currency: str = "USD", methods: list[str] = METHODS
+) -> pd.DataFrame:
+    """
+    Realized gains under several cost-basis methods, for side-by-side
+    comparison. The lots of every method are matched in a single pass over the
+    transactions.
+
+    Parameters:
+    - transactions: Split-adjusted, validated transactions
+    - currency: Reporting currency (e.g., 'GBP')
+    - methods: Cost-basis methods to compare (see `cost_basis.METHODS`)
+
+    Returns:
+    - DataFrame indexed by security, with the realized gains of each method as
+      columns, in `currency`.
+    """
+    trades = _Trades(transactions, currency)
+    sell_cost = {method: np.zeros(len(trades.quantity)) for method in methods}
+    for security, rows in trades.groups():
+        prices = trades.price_usd[rows] * trades.rates[rows]
+        for method, cost in trades.sell_cost(security, rows, prices, methods).items():
+            sell_cost[method][rows] = cost
+
+    sold_value = trades.sold_value_usd * trades.rates
+    return trades.per_security(
+        {method: sold_value - sell_cost[method] for method in methods}
+    )
+
+
+def fees_in_currency(
+    transactions: pd.DataFrame,
+    fees: np.ndarray,
+    currency: str = "USD",
+    method: str = "fifo",
+) -> pd.DataFrame:
+    """
+    Transaction fees of the sold and of the open shares, in a reporting currency.
+
+    The fee of a buy is part of the cost basis of its shares, at the rate of
+    the buy date: it is realized with the lots its shares are sold from, and is
+    open until then. The fee of a sell is realized at the rate of the sell date.
+
+    Parameters:
+    - transactions: Split-adjusted, validated transactions
+    - fees: Transaction fee of every transaction in USD (see `fees.allocate_fees`)
+    - currency: Reporting currency (e.g., 'GBP')
+    - method: Cost-basis method the lots are matched with (see `cost_basis.METHODS`)
+
+    Returns:
+    - DataFrame indexed by security, in `currency`, with the columns
+      'cost_fees' (fees of the sold lots, part of their cost), 'sale_fees'
+      (fees of the sells, deducted from their proceeds) and 'open_fees' (fees
+      of the open lots).
+    """
+    trades = _Trades(transactions, currency, fees)
+    fees = trades.fees_usd * trades.rates
+    # Fee per share of the lots, so that the fees of sold shares are matched as
+    # their cost basis
+    fee_per_share = np.divide(
+        fees, trades.quantity, out=np.zeros_like(fees), where=trades.is_buy
+    )
+    sold_fees = np.zeros(len(trades.quantity))
+    for security, rows in trades.groups():
+        sold_fees[rows] = trades.sell_cost(
+            security, rows, fee_per_share[rows], [method]
+        )[method]
+
+    buy_fees = np.where(trades.is_buy, fees, 0.0)
+    sell_fees = fees - buy_fees
+    count = len(trades.securities)
+    return pd.DataFrame(
+        {
+            "cost_fees": np.bincount(trades.codes, weights=sold_fees, minlength=count),
+            "sale_fees": np.bincount(trades.codes, weights=sell_fees, minlength=count),
+            "open_fees": np.bincount(
+                trades.codes, weights=buy_fees - sold_fees, minlength=count
+            ),
+        },
+        index=pd.Index(trades.securities, name="security"),
+    )
+
+
+class _Trades:
+    """Buys and sells of a ledger, as USD arrays grouped by security."""
+
+    def __init__(
+        self,
+        transactions: pd.DataFrame,
+        currency: str,
+        fees: np.ndarray | None = None,
+    ) -> None:
+        trades = transactions["action"].isin(["buy", "sell"]).to_numpy()
+        transactions = transactions[trades]
+        self.fees_usd = np.zeros(len(transactions)) if fees is None else fees[trades]
+        self.dates = transactions["date"].to_numpy()
+        to_usd = fx_rates.rates_to(
+            "USD", transactions["currency"].to_numpy(), self.dates
+        )
+        self.price_usd = transactions["price_per_share"].to_numpy(dtype=float) * to_usd
+        self.rates = fx_rates.rates_for("USD", currency, self.dates)
+        self.quantity = transactions["quantity"].to_numpy(dtype=float)
+        self.is_buy = (transactions["action"] == "buy").to_numpy()
+        self.names = lot_names(transactions)
+        self.codes, self.securities = pd.factorize(transactions["security"])
+        self.sold_value_usd = np.where(self.is_buy, 0.0, self.quantity * self.price_usd)
+
+    def groups(self):
+        """Securities with sells, and the positions of their rows."""
+        order = np.argsort(self.codes, kind="stable")
+        for rows in np.split(order, np.cumsum(np.bincount(self.codes))[:-1]):
+            if not self.is_buy[rows].all():
+                yield self.securities[self.codes[rows[0]]], rows
+
+    def sell_cost(
+        self, security: str, rows: np.ndarray, prices: np.ndarray, methods: list[str]
+    ) -> dict[str, np.ndarray]:
+        """
+        Cost basis consumed by the rows of a security under each method, with
+        lots priced at `prices` and ranked by USD price.
+        """
+        pools = {method: create_pool(method) for method in methods if method != "fifo"}
+        sell_cost = match_lots(
+            self.quantity[rows],
+            prices,
+            self.is_buy[rows],
+            pools,
+            self.dates[rows],
+            self.names[rows],
+            keys=self.price_usd[rows],
+        )
+        if "fifo" in methods:
+            sell_cost["fifo"] = match_fifo(
+                security, self.quantity[rows], prices, self.is_buy[rows]
+            ).sell_cost
+        return sell_cost
+
+    def per_security(self, columns: dict[str, np.ndarray]) -> pd.DataFrame:
+        """Sums of per-row amounts over the sells of every security."""
+        sells = ~self.is_buy
+        totals = pd.DataFrame(columns)[sells].groupby(self.codes[sells]).sum()
+        totals.index = pd.Index(self.securities[totals.index], name="security")
+        return totals
@@ -0,0 +1,79 @@
+import threading
+
+import pandas as pd
+
+from portfolio_tracker.data_fetching import fetch_stock_quotes
+
+
+class PriceSnapshot:
+    """
+    Current prices of a set of securities, taken at one point in time.
+
+    Prices are only fetched by `refresh`, so every consumer of a snapshot sees
+    the same quotes and a full dashboard build triggers one quote fetch per
+    ticker. `version` increases with every refresh, for consumers caching
+    values derived from the prices.
+
+    Refreshing is thread-safe: quotes are fetched without holding any lock and
+    swapped in at once, so readers never wait on the network.
+    """
+
+    def __init__(self, symbols=(), fetch_quotes=fetch_stock_quotes) -> None:
+        """
+        Parameters:
+        - symbols: Symbols to quote
+        - fetch_quotes: Fetches the quotes of symbols, with the signature of
+          `data_fetching.fetch_stock_quotes` (e.g., `fetch_crypto_quotes`)
+        """
+        self.symbols = list(symbols)
+        self.fetch_quotes = fetch_quotes
+        self.prices = {}
+        self.failures = {}
+        self.fetched_at = None
+        self.version = 0
+        self._lock = threading.Lock()
+
+    def refresh(self, symbols=None, force: bool = False) -> "PriceSnapshot":
+        """
+        Fetch the current prices.
+
+        Parameters:
+        - symbols: Symbols to quote from now on (defaults to the current ones)
+        - force: Bypass quotes cached on disk, even if younger than the quote TTL
+        """
+        symbols = self.symbols if symbols is None else list(symbols)
+
+        prices, failures = self.fetch_quotes(symbols, ttl=0 if force else None)
+        for symbol, reason in failures.items():
+            print(f"Error fetching price for {symbol}: {reason}")
+
+        with self._lock:
+            self.symbols = symbols
+            self.prices = prices
+            self.failures = failures
+            self.fetched_at = pd.Timestamp.now()
+            self.version += 1
+        return self
+
+    def read(self) -> tuple[int, dict[str, float]]:
+        """Version and prices of the snapshot, read consistently."""
+        with self._lock:
+            return self.version, self.prices
+
+    @property
+    def is_empty(self) -> bool:
+        """Whether the snapshot was never refreshed."""
+        return self.fetched_at is None
+
+    @property
+    def age(self) -> pd.Timedelta | None:
+        """Time elapsed since the last refresh."""
+        return None if self.is_empty else pd.Timestamp.now() - self.fetched_at
+
+    def is_stale(self, max_age: pd.Timedelta) -> bool:
+        """Whether the snapshot was never refreshed or is older than `max_age`."""
+        return self.is_empty or self.age > max_age
+
+    def get(self, symbol: str, default: float = 0) -> float:
+        """Price of a symbol, or `default` if it could not be fetched."""
+        return self.prices.get(symbol, default)
@@ -0,0 +1,215 @@
+"""
+Streaming reader for large type1 CSV ledgers.
+
+`stream_type1` reads the ledger in chunks of `chunk_size` rows with explicit
+dtypes, parsing the thousand-separated amounts in pandas' C parser, and yields
+typed chunks in date order, so the ledger can be processed without parsing the
+whole file at once (see `PortfolioBook.from_chunks`, which still keeps every
+processed chunk):
+
+- a date-sorted ledger (checked by a first pass over the date column only) is
+  yielded as it is read;
+- otherwise, the chunks are sorted and spilled to temporary runs, which are
+  merged back in date order (external merge sort). Merges read at most
+  `FAN_IN` runs at once, in blocks of `chunk_size // FAN_IN` rows.
+
+Rows keep their position in the file as index label, and rows of the same day
+keep file order, as with `DataLoader`.
+"""
+
+import pickle
+import tempfile
+from collections.abc import Iterator
+from pathlib import Path
+
+import pandas as pd
+
+# Number of runs merged at once by the external merge sort
+FAN_IN = 16
+
+TYPE1_STRING_COLUMNS = ["security", "type_of_asset", "action", "currency"]
+TYPE1_AMOUNT_COLUMNS = ["quantity", "price_per_share", "total_transaction_price"]
+TYPE1_DATE_FORMAT = "%m/%d/%Y"
+
+
+def stream_type1(path, chunk_size: int = 100_000) -> Iterator[pd.DataFrame]:
+    """
+    Yield the transactions of a type1 CSV ledger in date order, in chunks.
+
+    :param path: path of the type1 CSV ledger
+    :param chunk_size: number of rows parsed at once
+    :return: iterator of typed DataFrames of at most about `chunk_size` rows
+    """
+    if _is_date_sorted(path, chunk_size):
+        yield from _read_chunks(path, chunk_size)
+        return
+
+    block_size = max(1, chunk_size // FAN_IN)
+    with tempfile.TemporaryDirectory() as folder:
+        folder = Path(folder)
+        runs = [
+            _write_run(
+                folder / f"run-{number}",
+                [chunk.sort_values("date", kind="stable")],
+                block_size,
+            )
+            for number, chunk in enumerate(_read_chunks(path, chunk_size))
+        ]
+        # Merge passes until the remaining runs can be merged at once
+        while len(runs) > FAN_IN:
+            runs = [
+                _write_run(
+                    folder / f"run-{len(runs)}-{start}",
+                    _merge(runs[start : start + FAN_IN]),
+                    block_size,
+                )
+                for start in range(0, len(runs), FAN_IN)
+            ]
+        yield from _rebatch(_merge(runs), chunk_size)
+
+
+def _read_chunks(path, chunk_size: int) -> Iterator[pd.DataFrame]:
+    """Parse and validate the ledger chunk by chunk, in file order."""
+    reader = pd.read_csv(
+        path,
+        chunksize=chunk_size,
+        thousands=",",
+        dtype={"date": str, **{column: str for column in TYPE1_STRING_COLUMNS}},
+    )
+    for chunk in reader:
+        yield _convert_chunk(chunk)
+
+
+def _convert_chunk(chunk: pd.DataFrame) -> pd.DataFrame:
+    """Convert the dates and amounts of a chunk, reporting unparsable rows."""
+    missing = {"date", *TYPE1_STRING_COLUMNS, *TYPE1_AMOUNT_COLUMNS} - set(chunk)
+    if missing:
+        raise ValueError(f"Missing columns in type1 ledger: {sorted(missing)}")
+
+    invalid = {}
+    for column in TYPE1_AMOUNT_COLUMNS:
+        if chunk[column].dtype == object:
+            # Not parsed as numbers by the C parser: find the offending rows
+            chunk[column] = pd.to_numeric(
+                chunk[column].str.replace(",", "", regex=False), errors="coerce"
+            )
+        chunk[column] = chunk[column].astype(float)
+        invalid[column] = chunk[column].isna()
+
+    chunk["date"] = pd.to_datetime(
+        chunk["date"], format=TYPE1_DATE_FORMAT, errors="coerce"
+    )
+    invalid["date"] = chunk["date"].isna()
+
+    errors = [
+        f"line {label + 2}: invalid {column}"
+        for column, rows in invalid.items()
+        for label in chunk.index[rows.to_numpy()]
+    ]
+    if errors:
+        raise ValueError("Invalid rows in type1 ledger:\n" + "\n".join(errors))
+    return chunk
+
+
+def _is_date_sorted(path, chunk_size: int) -> bool:
+    """Whether the rows of the ledger are sorted by date, reading only dates."""
+    last_date = None
+    for chunk in pd.read_csv(
+        path, usecols=["date"], dtype={"date": str}, chunksize=chunk_size
+    ):
+        dates = pd.to_datetime(chunk["date"], format=TYPE1_DATE_FORMAT, errors="coerce")
+        if dates.isna().any():
+            # Reported with line numbers when the chunks are converted
+            return True
+        if not dates.is_monotonic_increasing or (
+            last_date is not None and dates.iloc[0] < last_date
+        ):
+            return False
+        last_date = dates.iloc[-1]
+    return True
+
+
+def _write_run(path: Path, chunks, block_size: int) -> Path:
+    """Write date-sorted chunks to a run file, as pickled blocks of `block_size` rows."""
+    with open(path, "wb") as file:
+        for chunk in chunks:
+            for start in range(0, len(chunk), block_size):
+                pickle.dump(
+                    chunk.iloc[start : start + block_size],
+                    file,
+                    protocol=pickle.HIGHEST_PROTOCOL,
+                )
+    return path
+
+
+def _read_run(path: Path) -> Iterator[pd.DataFrame]:
+    with open(path, "rb") as file:
+        while True:
+            try:
+                yield pickle.load(file)
+            except EOFError:
+                return
+
+
+def _rebatch(frames, size: int) -> Iterator[pd.DataFrame]:
+    """Concatenate consecutive frames into chunks of about `size` rows."""
+    batch, rows = [], 0
+    for frame in frames:
+        batch.append(frame)
+        rows += len(frame)
+        if rows >= size:
+            yield pd.concat(batch)
+            batch, rows = [], 0
+    if batch:
+        yield pd.concat(batch)
+
+
+def _merge(runs: list[Path]) -> Iterator[pd.DataFrame]:
+    """
+    Merge date-sorted runs, yielding date-sorted chunks.
+
+    Rows dated before the last buffered date of every unfinished run cannot be
+    preceded by rows not read yet, so they are yielded; the runs limiting this
+    bound are read further. Buffers are concatenated in run order and sorted
+    stably, so rows of the same day keep their order across runs.
+    """
+    readers = [_read_run(run) for run in runs]
+    buffers = [next(reader, None) for reader in readers]
+    finished = [buffer is None for buffer in buffers]
+    buffers = [pd.DataFrame() if buffer is None else buffer for buffer in buffers]
+
+    while not all(finished) or any(len(buffer) for buffer in buffers):
+        last_dates = [
+            buffer["date"].iloc[-1]
+            for buffer, done in zip(buffers, finished)
+            if not done and len(buffer)
+        ]
+        bound = min(last_dates) if last_dates else None
+
+        ready = []
+        for number, buffer in enumerate(buffers):
+            if not len(buffer):
+                continue
+            if bound is None:
+                ready.append(buffer)
+                buffers[number] = buffer.iloc[:0]
+            else:
+                split = buffer["date"].searchsorted(bound, side="left")
+                ready.append(buffer.iloc[:split])
+                buffers[number] = buffer.iloc[split:]
+        ready = [frame for frame in ready if len(frame)]
+        if ready:
+            yield pd.concat(ready).sort_values("date", kind="stable")
+
+        # Read further the runs whose buffer holds nothing but the bound
+        for number, reader in enumerate(readers):
+            if finished[number]:
+                continue
+            buffer = buffers[number]
+            if len(buffer) and buffer["date"].iloc[-1] > bound:
+                continue
+            block = next(reader, None)
+            if block is None:
+                finished[number] = True
+            else:
+                buffers[number] = pd.concat([buffer, block]) if len(buffer) else block
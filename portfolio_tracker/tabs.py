@@ -0,0 +1,201 @@
+import threading
+
+import pandas as pd
+
+from portfolio_tracker.benchmark import BenchmarkComparison
+from portfolio_tracker.config import config
+from portfolio_tracker.crypto import ASSET_TYPE as CRYPTO_ASSET_TYPE
+from portfolio_tracker.layout import (
+    create_dividends_layout,
+    create_performance_layout,
+    create_tab_layout,
+    create_tax_layout,
+)
+from portfolio_tracker.manager import PortfolioBook, PortfolioManager
+from portfolio_tracker.tax import tax_year_summary
+from portfolio_tracker.utils import timed
+
+
+class TabCache:
+    """
+    Lazily computed data and layouts of the dashboard tabs.
+
+    Nothing is computed for a tab until it is first opened. Layouts are cached
+    per tab and price snapshot version, so switching back to a tab is a cache
+    hit until prices are refreshed. Realized gains do not depend on prices and
+    are computed once; the performance tab covers daily closes and is rebuilt
+    once a day, extending the benchmark comparison with the new days only, and
+    so is the dividends tab. The tax tab only depends on the ledger and is built
+    once.
+
+    The cache lock is only held to read or store entries, never while data is
+    fetched or layouts are built: each entry is built under a lock of its own,
+    so a slow tab does not hold up the others.
+    """
+
+    def __init__(
+        self, book: PortfolioBook, crypto_book: PortfolioBook | None = None
+    ) -> None:
+        """
+        Parameters:
+        - book: Book of the type1 ledger
+        - crypto_book: Book of the crypto tab, if any (see `crypto.load_crypto_book`)
+        """
+        self.book = book
+        self.crypto_book = crypto_book
+        self._managers = {}
+        self._realized_gains = {}
+        self._layouts = {}
+        self._performance = (None, None)
+        self._benchmark = None
+        self._dividends = (None, None)
+        self._tax = None
+        self._lock = threading.Lock()
+        # Lock of the builds of every entry, by entry name
+        self._build_locks = {}
+
+    def _build_lock(self, entry: str) -> threading.Lock:
+        """Lock held while an entry of the cache is built."""
+        with self._lock:
+            return self._build_locks.setdefault(entry, threading.Lock())
+
+    def manager(self, tab: str) -> PortfolioManager:
+        """Portfolio manager of a tab (tabs are named after asset types)."""
+        with self._lock:
+            if tab in self._managers:
+                return self._managers[tab]
+        with self._build_lock(f"manager:{tab}"):
+            with self._lock:
+                if tab in self._managers:
+                    return self._managers[tab]
+            book = self.crypto_book if tab == CRYPTO_ASSET_TYPE else self.book
+            manager = book.view(tab)
+            with self._lock:
+                self._managers[tab] = manager
+            return manager
+
+    def realized_gains(self, tab: str):
+        """Realized gains table of a tab."""
+        manager = self.manager(tab)
+        with self._lock:
+            if tab in self._realized_gains:
+                return self._realized_gains[tab]
+        with self._build_lock(f"realized_gains:{tab}"):
+            with self._lock:
+                if tab in self._realized_gains:
+                    return self._realized_gains[tab]
+            with timed(f"Tab '{tab}': realized gains"):
+                realized_gains = manager.generate_realized_gains_dataframe()
+            with self._lock:
+                self._realized_gains[tab] = realized_gains
+            return realized_gains
+
+    def layout(self, tab: str):
+        """Layout of a tab, rebuilt only when prices were refreshed."""
+        manager = self.manager(tab)
+        version, current_values, unrealized_gains = manager.fetch_versioned_values()
+        with self._lock:
+            cached_version, layout = self._layouts.get(tab, (None, None))
+        if cached_version is not None and cached_version >= version:
+            return layout
+
+        with self._build_lock(f"layout:{tab}"):
+            # Built meanwhile by another request
+            with self._lock:
+                cached_version, layout = self._layouts.get(tab, (None, None))
+            if cached_version is not None and cached_version >= version:
+                return layout
+
+            with timed(f"Tab '{tab}': layout build"):
+                layout = create_tab_layout(
+                    self.realized_gains(tab),
+                    manager.get_portfolio_overview(),
+                    manager.get_owned_assets(),
+                    current_values,
+                    unrealized_gains,
+                    manager.reporting_currency,
+                )
+            with self._lock:
+                # Keep a layout of a later version built meanwhile
+                cached_version, _ = self._layouts.get(tab, (None, None))
+                if cached_version is None or cached_version < version:
+                    self._layouts[tab] = (version, layout)
+            return layout
+
+    def performance_layout(self):
+        """Layout of the performance tab, covering the whole portfolio."""
+        today = pd.Timestamp.now().normalize()
+        with self._lock:
+            cached_date, layout = self._performance
+        if cached_date == today:
+            return layout
+
+        with self._build_lock("performance"):
+            with self._lock:
+                cached_date, layout = self._performance
+            if cached_date == today:
+                return layout
+
+            with timed("Performance tab: history"):
+                history = self.book.get_performance_history()
+            # The benchmark comparison is only used under the build lock
+            with timed("Performance tab: benchmark comparison"):
+                if self._benchmark is None:
+                    self._benchmark = BenchmarkComparison(history)
+                else:
+                    self._benchmark.update(history)
+            with timed("Performance tab: layout build"):
+                layout = create_performance_layout(history, self._benchmark)
+            with self._lock:
+                if self._performance[0] is None or self._performance[0] < today:
+                    self._performance = (today, layout)
+            return layout
+
+    def dividends_layout(self):
+        """Layout of the dividends tab, covering the whole portfolio."""
+        today = pd.Timestamp.now().normalize()
+        with self._lock:
+            cached_date, layout = self._dividends
+        if cached_date == today:
+            return layout
+
+        with self._build_lock("dividends"):
+            with self._lock:
+                cached_date, layout = self._dividends
+            if cached_date == today:
+                return layout
+
+            with timed("Dividends tab: dividends"):
+                events, summary = self.book.get_dividends()
+            with timed("Dividends tab: layout build"):
+                layout = create_dividends_layout(
+                    events, summary, config.reporting_currency
+                )
+            with self._lock:
+                if self._dividends[0] is None or self._dividends[0] < today:
+                    self._dividends = (today, layout)
+            return layout
+
+    def tax_layout(self):
+        """Layout of the tax tab, covering the whole portfolio with its crypto."""
+        with self._lock:
+            if self._tax is not None:
+                return self._tax
+        with self._build_lock("tax"):
+            with self._lock:
+                if self._tax is not None:
+                    return self._tax
+
+            with timed("Tax tab: capital gains"):
+                books = [self.book]
+                if self.crypto_book is not None:
+                    books.append(self.crypto_book)
+                disposals = [book.get_capital_gains()[0] for book in books]
+                disposals = pd.concat(
+                    [matched for matched in disposals if len(matched)] or disposals[:1]
+                ).sort_values(["security", "date"], kind="stable", ignore_index=True)
+                tax_years = tax_year_summary(disposals)
+            layout = create_tax_layout(disposals, tax_years)
+            with self._lock:
+                self._tax = layout
+            return layout
@@ -0,0 +1,276 @@
+"""
+UK capital gains on shares.
+
+Disposals are matched with acquisitions of the same security by the UK share
+matching rules, in this order:
+
+1. same day: acquisitions on the day of the disposal,
+2. bed and breakfast: acquisitions in the 30 days after the disposal, earliest
+   first, earlier disposals first,
+3. Section 104: the pool of all other acquisitions, at its average cost.
+
+Trades of a security on the same day count as a single acquisition and a single
+disposal. Amounts are converted to GBP at the exchange rate of the trade date;
+acquisition costs and disposal proceeds are the total transaction prices, plus
+the transaction fees of acquisitions and less those of disposals (see `fees`).
+
+Each security's trades are aggregated into date-sorted daily arrays, the
+30-day window of a disposal is found with `searchsorted`, and acquisitions used
+up by earlier disposals are skipped with a pointer to the next day with shares
+left, so matching never scans the whole ledger again per disposal.
+"""
+
+import numpy as np
+import pandas as pd
+
+from portfolio_tracker.data_fetching import fx_rates
+
+TAX_CURRENCY = "GBP"
+BED_AND_BREAKFAST_DAYS = 30
+
+SAME_DAY = "same_day"
+BED_AND_BREAKFAST = "bed_and_breakfast"
+SECTION_104 = "section_104"
+
+DISPOSAL_COLUMNS = [
+    "security",
+    "date",
+    "tax_year",
+    "rule",
+    "acquisition_date",
+    "quantity",
+    "proceeds",
+    "allowable_cost",
+    "gain",
+]
+
+
+def match_disposals(
+    transactions: pd.DataFrame, fees: np.ndarray | None = None
+) -> pd.DataFrame:
+    """
+    Match the disposals of a ledger with acquisitions by the UK share matching
+    rules.
+
+    Parameters:
+    - transactions: Split-adjusted, validated transactions
+    - fees: Transaction fee of every transaction in USD (see `fees.allocate_fees`)
+
+    Returns:
+    - DataFrame with a row per matched part of each disposal, with the columns
+      of `DISPOSAL_COLUMNS`: 'rule' is the matching rule, 'acquisition_date'
+      the day of the matched acquisition (NaT for the Section 104 pool), and
+      amounts are in GBP.
+    """
+    trades = transactions["action"].isin(["buy", "sell"]).to_numpy()
+    transactions = transactions[trades]
+    dates = transactions["date"].to_numpy(dtype="datetime64[D]")
+    rates = fx_rates.rates_to(TAX_CURRENCY, transactions["currency"].to_numpy(), dates)
+    if np.isnan(rates).any():
+        missing = transactions["currency"][np.isnan(rates)].unique()
+        raise ValueError(
+            f"Exchange rate to {TAX_CURRENCY} not available for {', '.join(missing)}"
+        )
+
+    is_buy = (transactions["action"] == "buy").to_numpy()
+    quantity = transactions["quantity"].to_numpy(dtype=float)
+    amount = transactions["total_transaction_price"].to_numpy(dtype=float) * rates
+    if fees is not None:
+        fees = fees[trades] * fx_rates.rates_for("USD", TAX_CURRENCY, dates)
+        amount = amount + np.where(is_buy, fees, -fees)
+    daily = (
+        pd.DataFrame(
+            {
+                "security": transactions["security"].to_numpy(),
+                "day": dates,
+                "bought": np.where(is_buy, quantity, 0.0),
+                "cost": np.where(is_buy, amount, 0.0),
+                "sold": np.where(is_buy, 0.0, quantity),
+                "proceeds": np.where(is_buy, 0.0, amount),
+            }
+        )
+        .groupby(["security", "day"], sort=True)
+        .sum()
+        .reset_index()
+    )
+
+    # Boundaries of every security's date-sorted days
+    securities = daily["security"].to_numpy()
+    starts = np.flatnonzero(np.r_[True, securities[1:] != securities[:-1]])
+    ends = np.r_[starts[1:], len(daily)]
+    days = daily["day"].to_numpy(dtype="datetime64[D]")
+    columns = {
+        column: daily[column].to_numpy(dtype=float)
+        for column in ("bought", "cost", "sold", "proceeds")
+    }
+
+    matches = [
+        _match_security(
+            securities[start],
+            days[start:end],
+            *(values[start:end] for values in columns.values()),
+        )
+        for start, end in zip(starts, ends)
+        if columns["sold"][start:end].any()
+    ]
+    if not matches:
+        return pd.DataFrame(columns=DISPOSAL_COLUMNS).astype(
+            {
+                "date": "datetime64[ns]",
+                "acquisition_date": "datetime64[ns]",
+                **dict.fromkeys(
+                    ["quantity", "proceeds", "allowable_cost", "gain"], float
+                ),
+            }
+        )
+
+    disposals = pd.concat(matches, ignore_index=True)
+    disposals["tax_year"] = tax_year(disposals["date"])
+    disposals["gain"] = disposals["proceeds"] - disposals["allowable_cost"]
+    return disposals[DISPOSAL_COLUMNS]
+
+
+def _match_security(
+    security: str,
+    days: np.ndarray,
+    bought: np.ndarray,
+    cost: np.ndarray,
+    sold: np.ndarray,
+    proceeds: np.ndarray,
+) -> pd.DataFrame:
+    """Matches of the disposals of one security, from its daily trades."""
+    # Proceeds per share of each disposal day, shared by all its matches
+    unit_proceeds = np.divide(
+        proceeds, sold, out=np.zeros_like(proceeds), where=sold > 0
+    )
+
+    # 1. Same day, for all days at once
+    same_day = np.minimum(bought, sold)
+    same_day_basis = np.divide(
+        cost * same_day, bought, out=np.zeros_like(cost), where=bought > 0
+    )
+    same_days = np.flatnonzero(same_day > 0)
+    # Python lists are much faster than arrays to update item by item
+    bought = (bought - same_day).tolist()
+    cost = (cost - same_day_basis).tolist()
+    sold = (sold - same_day).tolist()
+
+    # 2. Bed and breakfast: acquisitions in the 30 days after each disposal
+    window_ends = np.searchsorted(
+        days, days + np.timedelta64(BED_AND_BREAKFAST_DAYS, "D"), side="right"
+    ).tolist()
+    # Next day with shares left to match, from each day (path-compressed)
+    next_day = [day + (shares <= 0) for day, shares in enumerate(bought)]
+    next_day.append(len(bought))
+
+    def find(day: int) -> int:
+        root = day
+        while next_day[root] != root:
+            root = next_day[root]
+        while next_day[day] != root:
+            next_day[day], day = root, next_day[day]
+        return root
+
+    match_days, acquisition_days, quantities, bases = [], [], [], []
+    for day in np.flatnonzero(np.array(sold) > 0).tolist():
+        acquisition = find(day + 1)
+        while sold[day] > 0 and acquisition < window_ends[day]:
+            shares = min(bought[acquisition], sold[day])
+            basis = cost[acquisition] * shares / bought[acquisition]
+            match_days.append(day)
+            acquisition_days.append(acquisition)
+            quantities.append(shares)
+            bases.append(basis)
+            sold[day] -= shares
+            if shares >= bought[acquisition]:
+                bought[acquisition] = cost[acquisition] = 0.0
+                next_day[acquisition] = acquisition + 1
+                acquisition = find(acquisition + 1)
+            else:
+                bought[acquisition] -= shares
+                cost[acquisition] -= basis
+    bed_and_breakfast = len(match_days)
+
+    # 3. Section 104 pool, at average cost
+    pool_quantity = pool_cost = 0.0
+    for day, (shares_bought, basis_bought, shares) in enumerate(
+        zip(bought, cost, sold)
+    ):
+        pool_quantity += shares_bought
+        pool_cost += basis_bought
+        if shares <= 0 or pool_quantity <= 0:
+            continue
+        shares = min(shares, pool_quantity)
+        basis = pool_cost * shares / pool_quantity
+        match_days.append(day)
+        quantities.append(shares)
+        bases.append(basis)
+        if shares >= pool_quantity:
+            # Reset exactly, so rounding errors do not accumulate
+            pool_quantity = pool_cost = 0.0
+        else:
+            pool_quantity -= shares
+            pool_cost -= basis
+
+    section_104 = len(match_days) - bed_and_breakfast
+    match_days = np.concatenate([same_days, np.array(match_days, dtype=int)])
+    quantity = np.concatenate([same_day[same_days], quantities])
+    matches = pd.DataFrame(
+        {
+            "security": security,
+            "rule": np.repeat(
+                [SAME_DAY, BED_AND_BREAKFAST, SECTION_104],
+                [len(same_days), bed_and_breakfast, section_104],
+            ),
+            "date": days[match_days],
+            "acquisition_date": np.concatenate(
+                [
+                    days[same_days],
+                    days[np.array(acquisition_days, dtype=int)],
+                    np.full(section_104, np.datetime64("NaT"), dtype=days.dtype),
+                ]
+            ),
+            "quantity": quantity,
+            "proceeds": quantity * unit_proceeds[match_days],
+            "allowable_cost": np.concatenate([same_day_basis[same_days], bases]),
+        }
+    )
+    return matches.sort_values("date", kind="stable")
+
+
+def tax_year(dates) -> np.ndarray:
+    """UK tax years (6 April to 5 April) of dates, labelled e.g. '2023/24'."""
+    dates = pd.DatetimeIndex(dates)
+    starts = dates.year - (
+        (dates.month < 4) | ((dates.month == 4) & (dates.day < 6))
+    ).astype(int)
+    years, codes = np.unique(starts, return_inverse=True)
+    labels = np.array([f"{year}/{(year + 1) % 100:02d}" for year in years])
+    return labels[codes]
+
+
+def tax_year_summary(disposals: pd.DataFrame) -> pd.DataFrame:
+    """
+    Capital gains per tax year.
+
+    Parameters:
+    - disposals: Matched disposals (see `match_disposals`)
+
+    Returns:
+    - DataFrame indexed by tax year with the columns 'disposals' (number of
+      disposals, a security sold on a day counting once), 'proceeds',
+      'allowable_cost', 'gains', 'losses' and 'net_gain', in GBP. Gains and
+      losses are summed per disposal, so losses are positive amounts.
+    """
+    per_disposal = disposals.groupby(["tax_year", "security", "date"])[
+        ["proceeds", "allowable_cost", "gain"]
+    ].sum()
+    gain = per_disposal["gain"]
+    per_disposal = per_disposal.assign(
+        gains=gain.clip(lower=0), losses=-gain.clip(upper=0), disposals=1
+    )
+    summary = per_disposal.groupby(level="tax_year")[
+        ["disposals", "proceeds", "allowable_cost", "gains", "losses"]
+    ].sum()
+    summary["net_gain"] = summary["gains"] - summary["losses"]
+    return summary
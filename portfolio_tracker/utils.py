@@ -1,4 +1,9 @@
+import logging
 import os
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
 
 
 def get_data_folder_path(data_type: str = "public"):
@@ -18,3 +23,15 @@ def get_data_folder_path(data_type: str = "public"):
         raise ValueError("Data type not supported.")
 
     return os.path.abspath(data_folder)
+
+
+@contextmanager
+def timed(label: str):
+    """
+    Log the wall-clock time spent in a block.
+
+    :param label: description of the timed block
+    """
+    start = time.perf_counter()
+    yield
+    logger.info("%s: %.3fs", label, time.perf_counter() - start)
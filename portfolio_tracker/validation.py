@@ -0,0 +1,350 @@
+"""
+Validation and indexing of the type1 ledger.
+
+`validate_ledger` checks transactions in vectorized passes before they are
+processed, so an invalid ledger is rejected before any lot is matched, with all
+its problems reported at once. `check_transactions` looks for
+
+- missing columns, and rows with missing or invalid values,
+- actions other than 'buy' and 'sell',
+- currencies not listed in `config.currencies`,
+
+so that stock splits are only looked up and applied to valid rows, and
+`check_positions` then looks for sells of more (split-adjusted) shares than held
+at the time, from the cumulative quantity of every security.
+
+Rows repeating an earlier row are reported as a warning only, since the same
+trade can legitimately happen twice on a day. Rows are referred to by their line
+in the ledger file, from their index label.
+
+The pass also normalizes the text columns and builds a `LedgerIndex`, which
+groups the rows once so the portfolio and the exchange rate fetching can look
+them up instead of filtering the ledger again.
+"""
+
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from portfolio_tracker.config import config
+
+TYPE1_COLUMNS = [
+    "date",
+    "security",
+    "type_of_asset",
+    "action",
+    "quantity",
+    "price_per_share",
+    "total_transaction_price",
+    "currency",
+]
+TYPE1_AMOUNT_COLUMNS = ["quantity", "price_per_share", "total_transaction_price"]
+
+# Problems listed, and lines listed per problem, before the rest is summarized
+MAX_PROBLEMS = 20
+MAX_LINES_PER_PROBLEM = 10
+
+
+@dataclass
+class LedgerIndex:
+    """
+    Rows of a ledger grouped by security, currency and asset type.
+
+    Attributes:
+    - security_rows: Positions of the rows of each security, in ledger order
+    - currency_spans: First and last transaction date of each currency
+    - asset_types: Asset type of each security, from its first transaction
+    - type_rows: Positions of the rows of each asset type, in ledger order
+    """
+
+    security_rows: dict[str, np.ndarray] = field(default_factory=dict)
+    currency_spans: dict[str, tuple[pd.Timestamp, pd.Timestamp]] = field(
+        default_factory=dict
+    )
+    asset_types: dict[str, str] = field(default_factory=dict)
+    type_rows: dict[str, np.ndarray] = field(default_factory=dict)
+
+    def extend(self, other: "LedgerIndex", offset: int) -> None:
+        """
+        Add the index of rows appended to the ledger.
+
+        Parameters:
+        - other: Index of the appended rows
+        - offset: Number of rows of the ledger before the appended ones
+        """
+        for rows, other_rows in (
+            (self.security_rows, other.security_rows),
+            (self.type_rows, other.type_rows),
+        ):
+            for key, positions in other_rows.items():
+                positions = positions + offset
+                rows[key] = (
+                    np.concatenate([rows[key], positions]) if key in rows else positions
+                )
+        for currency, (first, last) in other.currency_spans.items():
+            if currency in self.currency_spans:
+                first = min(first, self.currency_spans[currency][0])
+                last = max(last, self.currency_spans[currency][1])
+            self.currency_spans[currency] = (first, last)
+        for security, asset_type in other.asset_types.items():
+            self.asset_types.setdefault(security, asset_type)
+
+    def securities_of_type(self, asset_type: str) -> set[str]:
+        """Securities whose first transaction has the given asset type."""
+        return {
+            security
+            for security, _type in self.asset_types.items()
+            if _type == asset_type
+        }
+
+
+def index_ledger(transactions: pd.DataFrame) -> LedgerIndex:
+    """
+    Build the index of valid transactions.
+
+    Parameters:
+    - transactions: DataFrame with the columns of the type1 ledger
+
+    Returns:
+    - LedgerIndex of the rows, by position.
+    """
+    return _index_ledger(transactions, *pd.factorize(transactions["security"]))
+
+
+def _index_ledger(
+    transactions: pd.DataFrame, security_codes: np.ndarray, securities: pd.Index
+) -> LedgerIndex:
+    """Index of the transactions, from the factorized securities."""
+    security_rows = _group_positions(security_codes, securities)
+    asset_type = transactions["type_of_asset"].to_numpy()
+    spans = transactions.groupby("currency", observed=True, sort=False)["date"].agg(
+        ["min", "max"]
+    )
+    return LedgerIndex(
+        security_rows=security_rows,
+        currency_spans={
+            currency: (first, last)
+            for currency, first, last in zip(spans.index, spans["min"], spans["max"])
+        },
+        asset_types={
+            security: asset_type[rows[0]] for security, rows in security_rows.items()
+        },
+        type_rows=_group_positions(*pd.factorize(transactions["type_of_asset"])),
+    )
+
+
+def validate_ledger(
+    transactions: pd.DataFrame,
+    open_quantity: dict[str, float] | None = None,
+) -> tuple[pd.DataFrame, LedgerIndex]:
+    """
+    Check, normalize and index transactions before processing them (see
+    `check_transactions` and `check_positions`).
+
+    Parameters:
+    - transactions: Split-adjusted transactions, with the columns of the type1 ledger
+    - open_quantity: Quantity already held of each security before these
+      transactions (e.g., when rows are appended to a processed ledger)
+
+    Returns:
+    - The normalized transactions (the input is not modified).
+    - LedgerIndex of the normalized transactions.
+
+    Raises:
+    - ValueError listing every invalid row, if any.
+    """
+    transactions = check_transactions(transactions)
+    return transactions, check_positions(transactions, open_quantity)
+
+
+def check_transactions(transactions: pd.DataFrame) -> pd.DataFrame:
+    """
+    Check the columns and the values of every row of transactions, and
+    normalize their text columns.
+
+    Parameters:
+    - transactions: Transactions with the columns of the type1 ledger
+
+    Returns:
+    - The normalized transactions (the input is not modified).
+
+    Raises:
+    - ValueError listing every invalid row, if any.
+    """
+    missing = [column for column in TYPE1_COLUMNS if column not in transactions]
+    if missing:
+        raise ValueError(f"Missing columns in type1 ledger: {missing}")
+    errors = [
+        f"column '{column}' is not numeric"
+        for column in TYPE1_AMOUNT_COLUMNS
+        if not pd.api.types.is_numeric_dtype(transactions[column])
+    ]
+    if not pd.api.types.is_datetime64_dtype(transactions["date"]):
+        errors.append("column 'date' is not parsed as dates")
+    if errors:
+        raise ValueError("Invalid type1 ledger:\n" + "\n".join(errors))
+
+    normalizations = {
+        "security": str.strip,
+        "type_of_asset": str.strip,
+        "action": lambda text: text.strip().lower(),
+        "currency": lambda text: text.strip().upper(),
+    }
+    normalized = {
+        column: _normalize(transactions[column], normalize)
+        for column, normalize in normalizations.items()
+    }
+    normalized = {
+        column: values for column, values in normalized.items() if values is not None
+    }
+    if normalized:
+        transactions = transactions.assign(**normalized)
+    report, problems = _reporter(transactions)
+
+    null = transactions[TYPE1_COLUMNS].isna().to_numpy()
+    for column, rows in zip(TYPE1_COLUMNS, null.T):
+        report(rows, f"missing {column}")
+    complete = ~null.any(axis=1)
+
+    quantity = transactions["quantity"].to_numpy(dtype=float)
+    report(complete & (quantity <= 0), "quantity is not positive")
+    for column in ("price_per_share", "total_transaction_price"):
+        negative = transactions[column].to_numpy(dtype=float) < 0
+        report(complete & negative, f"negative {column}")
+
+    action = transactions["action"]
+    report(
+        complete & ~action.isin(["buy", "sell"]).to_numpy(),
+        "unknown action '{}'",
+        action.to_numpy(),
+    )
+    currency = transactions["currency"]
+    report(
+        complete & ~currency.isin(config.currencies).to_numpy(),
+        "unknown currency '{}'",
+        currency.to_numpy(),
+    )
+
+    if problems:
+        raise ValueError("Invalid rows in type1 ledger:\n" + _summarize(problems))
+    return transactions
+
+
+def check_positions(
+    transactions: pd.DataFrame,
+    open_quantity: dict[str, float] | None = None,
+) -> LedgerIndex:
+    """
+    Check that transactions never sell more shares than held, and index them.
+
+    Parameters:
+    - transactions: Split-adjusted transactions checked by `check_transactions`
+    - open_quantity: Quantity already held of each security before these
+      transactions (e.g., when rows are appended to a processed ledger)
+
+    Returns:
+    - LedgerIndex of the transactions.
+
+    Raises:
+    - ValueError listing every sell of more shares than held, if any.
+    """
+    report, problems = _reporter(transactions)
+
+    # Running position of every security, as the lot matching computes it
+    quantity = transactions["quantity"].to_numpy(dtype=float)
+    is_sell = (transactions["action"] == "sell").to_numpy()
+    signed_quantity = np.where(is_sell, -quantity, quantity)
+    codes, securities = pd.factorize(transactions["security"])
+    position = pd.Series(signed_quantity).groupby(codes).cumsum().to_numpy()
+    if open_quantity:
+        held = np.array([open_quantity.get(security, 0.0) for security in securities])
+        position = position + held[codes]
+    report(
+        is_sell & (position < 0),
+        "sells more {} than held",
+        transactions["security"].to_numpy(),
+    )
+
+    if problems:
+        raise ValueError("Invalid rows in type1 ledger:\n" + _summarize(problems))
+
+    duplicated = transactions.duplicated(TYPE1_COLUMNS).to_numpy()
+    if duplicated.any():
+        print(
+            "Warning: rows repeating an earlier row of the type1 ledger: "
+            + _format_lines(transactions.index.to_numpy()[duplicated] + 2)
+        )
+
+    return _index_ledger(transactions, codes, securities)
+
+
+def _reporter(transactions: pd.DataFrame):
+    """
+    Problem recorder of transactions.
+
+    Returns:
+    - report(rows, message, values=None): Records a problem on the rows of a
+      boolean mask; `message` is formatted with the `values` of each row.
+    - List of the recorded problems, as DataFrames of lines and messages.
+    """
+    lines = transactions.index.to_numpy() + 2
+    problems = []
+
+    def report(rows: np.ndarray, message: str, values=None) -> None:
+        if rows.any():
+            messages = (
+                message
+                if values is None
+                else [message.format(value) for value in values[rows]]
+            )
+            problems.append(pd.DataFrame({"line": lines[rows], "message": messages}))
+
+    return report, problems
+
+
+def _group_positions(codes: np.ndarray, uniques) -> dict[str, np.ndarray]:
+    """Positions of the rows of every factorized value, in row order."""
+    order = np.argsort(codes, kind="stable")
+    counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+    # Rows with a missing value (code -1) sort first and are left out
+    groups = np.split(order[len(codes) - counts.sum() :], np.cumsum(counts)[:-1])
+    return dict(zip(uniques, groups))
+
+
+def _normalize(values: pd.Series, normalize) -> pd.Series | None:
+    """
+    Apply a text normalization to the distinct values of a column only.
+
+    Returns None if no value changes, so the column need not be copied.
+    """
+    mapping = {
+        value: normalize(str(value)) for value in values.unique() if not pd.isna(value)
+    }
+    if all(value == normalized for value, normalized in mapping.items()):
+        return None
+    normalized = values.map(mapping)
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        normalized = normalized.astype("category")
+    return normalized
+
+
+def _summarize(problems: list[pd.DataFrame]) -> str:
+    """One line per problem, listing the ledger lines it occurs on."""
+    problems = pd.concat(problems).sort_values("line", kind="stable")
+    groups = list(problems.groupby("message", sort=False))
+    summary = [
+        f"{message}: {_format_lines(group['line'].to_numpy())}"
+        for message, group in groups[:MAX_PROBLEMS]
+    ]
+    if len(groups) > MAX_PROBLEMS:
+        summary.append(f"and {len(groups) - MAX_PROBLEMS} more problems")
+    return "\n".join(summary)
+
+
+def _format_lines(lines: np.ndarray) -> str:
+    listed = ", ".join(str(line) for line in lines[:MAX_LINES_PER_PROBLEM])
+    prefix = "line" if len(lines) == 1 else "lines"
+    if len(lines) > MAX_LINES_PER_PROBLEM:
+        return f"{prefix} {listed} and {len(lines) - MAX_LINES_PER_PROBLEM} more"
+    return f"{prefix} {listed}"
@@ -0,0 +1,60 @@
+import os
+from pathlib import Path
+
+# The config reads its data folder from the environment: use the public sample
+# data, and the market data recorded in tests/fixtures rather than the network
+os.environ.setdefault("PRIVATE_PATH", "public")
+os.environ.setdefault("MARKET_DATA_PROVIDER", "fixtures")
+os.environ.setdefault("MARKET_DATA_FIXTURES", str(Path(__file__).parent / "fixtures"))
+
+import pandas as pd
+import pytest
+
+
+def _ledger(
+    rows: list[tuple],
+    currency: str = "USD",
+    price: str = "price_per_share",
+    type_of_asset: str = "stock",
+) -> pd.DataFrame:
+    """
+    Ledger in the format of the type1 ledger, from (date, security, action,
+    quantity, price) rows.
+
+    Parameters:
+    - rows: Transactions, with prices per share or total prices
+    - price: "price_per_share" or "total_transaction_price", the price of rows
+    """
+    transactions = pd.DataFrame(
+        rows, columns=["date", "security", "action", "quantity", price]
+    )
+    transactions["date"] = pd.to_datetime(transactions["date"])
+    transactions["type_of_asset"] = type_of_asset
+    transactions["quantity"] = transactions["quantity"].astype(float)
+    if price == "price_per_share":
+        transactions["total_transaction_price"] = (
+            transactions["quantity"] * transactions["price_per_share"]
+        )
+    else:
+        transactions["price_per_share"] = (
+            transactions["total_transaction_price"] / transactions["quantity"]
+        )
+    transactions["currency"] = currency
+    return transactions[
+        [
+            "date",
+            "security",
+            "type_of_asset",
+            "action",
+            "quantity",
+            "price_per_share",
+            "total_transaction_price",
+            "currency",
+        ]
+    ]
+
+
+@pytest.fixture
+def ledger():
+    """Builder of ledgers from rows (see `_ledger`)."""
+    return _ledger
@@ -0,0 +1,109 @@
+import pandas as pd
+import pytest
+
+from portfolio_tracker.cache import MarketDataCache
+from portfolio_tracker.config import CacheSettings
+
+DAY = pd.Timedelta(days=1)
+
+
+def settings(tmp_path, **overrides) -> CacheSettings:
+    values = {
+        "path": tmp_path / "market_data.sqlite",
+        "quote_ttl": 3600,
+        "splits_ttl": 3600,
+        "dividends_ttl": 3600,
+        "max_age_days": 30,
+        "max_bytes": 100 * 1024**2,
+    }
+    return CacheSettings(**(values | overrides))
+
+
+class RecordingFetch:
+    """Daily series of the day number, recording the ranges requested."""
+
+    def __init__(self) -> None:
+        self.ranges = []
+
+    def __call__(self, start: pd.Timestamp, end: pd.Timestamp) -> pd.Series:
+        self.ranges.append((start, end))
+        dates = pd.date_range(start - 2 * DAY, end + 2 * DAY)
+        return pd.Series(dates.day.astype(float), index=dates)
+
+
+def test_only_missing_ranges_fetched(tmp_path):
+    cache = MarketDataCache(settings(tmp_path))
+    fetch = RecordingFetch()
+
+    first = cache.get_series("close:AAPL", "2023-01-10", "2023-01-20", fetch)
+    second = cache.get_series("close:AAPL", "2023-01-05", "2023-01-25", fetch)
+
+    assert fetch.ranges == [
+        (pd.Timestamp("2023-01-10"), pd.Timestamp("2023-01-20")),
+        (pd.Timestamp("2023-01-05"), pd.Timestamp("2023-01-09")),
+        (pd.Timestamp("2023-01-21"), pd.Timestamp("2023-01-25")),
+    ]
+    # Values outside the requested range are not stored
+    assert list(first.index) == list(pd.date_range("2023-01-10", "2023-01-20"))
+    assert list(second) == list(range(5, 26))
+
+    # Covered ranges were merged
+    cache.get_series("close:AAPL", "2023-01-05", "2023-01-25", fetch)
+    assert len(fetch.ranges) == 3
+
+
+def test_fetch_day_refetched_after_ttl(tmp_path):
+    cache = MarketDataCache(settings(tmp_path))
+    fetch = RecordingFetch()
+    today = pd.Timestamp.now().normalize()
+
+    cache.get_series("close:AAPL", today - 3 * DAY, today, fetch)
+    cache.get_series("close:AAPL", today - 3 * DAY, today, fetch)
+    assert len(fetch.ranges) == 1
+
+    # Once older than the TTL, the close of the fetch day is fetched again
+    cache.get_series("close:AAPL", today - 3 * DAY, today, fetch, ttl=0)
+    assert fetch.ranges[1:] == [(today, today)]
+
+
+def test_quotes_reused_while_fresh(tmp_path):
+    cache = MarketDataCache(settings(tmp_path))
+    requested = []
+
+    def fetch(keys):
+        requested.append(keys)
+        return {key: 100.0 for key in keys if key != "UNKNOWN"}
+
+    assert cache.get_quotes(["AAPL", "UNKNOWN"], fetch) == {"AAPL": 100.0}
+    assert cache.get_quotes(["AAPL", "MSFT"], fetch) == {"AAPL": 100.0, "MSFT": 100.0}
+    assert cache.get_quotes(["AAPL"], fetch, ttl=0) == {"AAPL": 100.0}
+
+    # Failed quotes are not cached
+    assert requested == [["AAPL", "UNKNOWN"], ["MSFT"], ["AAPL"]]
+
+
+def test_cache_persists_across_instances(tmp_path):
+    fetch = RecordingFetch()
+    MarketDataCache(settings(tmp_path)).get_series(
+        "close:AAPL", "2023-01-10", "2023-01-20", fetch
+    )
+
+    series = MarketDataCache(settings(tmp_path)).get_series(
+        "close:AAPL", "2023-01-10", "2023-01-20", fetch
+    )
+    assert len(fetch.ranges) == 1
+    assert series.iloc[0] == pytest.approx(10)
+
+
+def test_unused_keys_evicted(tmp_path):
+    fetch = RecordingFetch()
+    MarketDataCache(settings(tmp_path)).get_series(
+        "close:AAPL", "2023-01-10", "2023-01-20", fetch
+    )
+
+    # Keys not accessed since the cutoff are evicted on start
+    cache = MarketDataCache(settings(tmp_path, max_age_days=0))
+    cache.get_series("close:AAPL", "2023-01-10", "2023-01-11", fetch)
+    assert fetch.ranges[1:] == [
+        (pd.Timestamp("2023-01-10"), pd.Timestamp("2023-01-11"))
+    ]
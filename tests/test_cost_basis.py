@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+
+from portfolio_tracker.cost_basis import (
+    METHODS,
+    LotPool,
+    create_pool,
+    lot_names,
+    match_lots,
+)
+
+# Buys of 10 at 100, 10 at 300 and 10 at 200, then sells of 15 and 10
+QUANTITY = np.array([10.0, 10.0, 10.0, 15.0, 10.0])
+PRICE = np.array([100.0, 300.0, 200.0, 0.0, 0.0])
+IS_BUY = np.array([True, True, True, False, False])
+
+
+@pytest.mark.parametrize(
+    ("method", "costs"),
+    [
+        ("fifo", [10 * 100 + 5 * 300, 5 * 300 + 5 * 200]),
+        ("lifo", [10 * 200 + 5 * 300, 5 * 300 + 5 * 100]),
+        ("hifo", [10 * 300 + 5 * 200, 5 * 200 + 5 * 100]),
+        ("average", [15 * 200, 10 * 200]),
+        # Without lot names, the oldest lots first
+        ("specific", [10 * 100 + 5 * 300, 5 * 300 + 5 * 200]),
+    ],
+)
+def test_sell_order(method, costs):
+    pool = create_pool(method)
+    sell_cost = match_lots(QUANTITY, PRICE, IS_BUY, {method: pool})[method]
+
+    assert list(sell_cost) == pytest.approx([0, 0, 0, *costs])
+    assert pool.quantity == pytest.approx(5)
+    assert pool.cost_basis == pytest.approx(6000 - sum(costs))
+    assert sum(lot.quantity for lot in pool.open_lots()) == pytest.approx(5)
+
+
+def test_methods_matched_in_one_pass():
+    pools = {method: create_pool(method) for method in METHODS}
+    sell_cost = match_lots(QUANTITY, PRICE, IS_BUY, pools)
+
+    assert sell_cost.keys() == set(METHODS)
+    assert sell_cost["hifo"][3] > sell_cost["average"][3] > sell_cost["fifo"][3]
+
+
+def test_specific_lots_by_name():
+    pool = create_pool("specific")
+    pool.add(10, 100.0, name="a")
+    pool.add(10, 300.0, name="b")
+    pool.add(5, 200.0, name="b")
+
+    # The named lots first, oldest first, then the oldest lots
+    assert pool.remove(12, name="b") == pytest.approx(10 * 300 + 2 * 200)
+    assert pool.remove(5, name="b") == pytest.approx(3 * 200 + 2 * 100)
+    assert pool.remove(3, name="unknown") == pytest.approx(3 * 100)
+    assert [(lot.name, lot.quantity) for lot in pool.open_lots()] == [("a", 5)]
+
+
+def test_lot_names(ledger):
+    transactions = ledger(
+        [
+            ("2023-01-02", "AAPL", "buy", 10, 100.0),
+            ("2023-01-03", "AAPL", "buy", 10, 120.0),
+            ("2023-02-01", "AAPL", "sell", 5, 130.0),
+        ]
+    )
+    transactions["lot"] = [None, "long", "long"]
+
+    assert list(lot_names(transactions)) == [2, "long", "long"]
+
+
+def test_overselling_rejected():
+    pool = create_pool("fifo")
+    pool.add(10, 100.0)
+
+    with pytest.raises(ValueError, match="Not enough shares"):
+        pool.remove(11)
+
+
+def test_pools_must_set_their_order():
+    with pytest.raises(TypeError):
+        LotPool()
+    with pytest.raises(ValueError, match="Unknown cost-basis method"):
+        create_pool("newest")
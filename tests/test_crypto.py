@@ -0,0 +1,60 @@
+import pandas as pd
+import pytest
+
+from portfolio_tracker.crypto import load_crypto_book
+from portfolio_tracker.manager import PortfolioBook
+
+# BTC swapped for ETH through a stablecoin, valued without market data
+SWAPS = """date,security_1,security_2,quantity_security_1,quantity_security_2
+15/01/2023,BTC,USDT,0.1,2000
+16/01/2023,USDT,ETH,2000,1.5
+"""
+
+
+@pytest.fixture
+def type2_path(tmp_path):
+    path = tmp_path / "type2.csv"
+    path.write_text(SWAPS)
+    return path
+
+
+def type1_ledger(ledger, eth_sold: float) -> pd.DataFrame:
+    """Stocks, and crypto bought for fiat or sold after a swap."""
+    return pd.concat(
+        [
+            ledger([("2023-01-02", "AAPL", "buy", 10, 100.0)]),
+            ledger(
+                [
+                    ("2023-01-02", "BTC", "buy", 0.2, 15000.0),
+                    ("2023-02-01", "ETH", "sell", eth_sold, 1600.0),
+                ],
+                type_of_asset="crypto",
+            ),
+        ],
+        ignore_index=True,
+    )
+
+
+def test_coin_from_swap_sold_in_type1(ledger, type2_path):
+    book = PortfolioBook(type1_ledger(ledger, eth_sold=1.0))
+
+    # Crypto rows are left to the crypto book
+    assert book.stocks.get_owned_assets() == {"AAPL": pytest.approx(10)}
+    assert list(book.index.type_rows["crypto"]) == [1, 2]
+
+    crypto = load_crypto_book(book, type2_path)
+    assert crypto.stocks.get_owned_assets() == {
+        "BTC": pytest.approx(0.1),
+        "ETH": pytest.approx(0.5),
+    }
+    # 1 of the 1.5 ETH acquired for 2000 USD, sold for 1600 USD
+    assert crypto.stocks.realized_gains_per_asset["ETH"].realized_gains == (
+        pytest.approx(1600 - 2000 / 1.5)
+    )
+
+
+def test_crypto_sells_checked_after_swaps(ledger, type2_path):
+    book = PortfolioBook(type1_ledger(ledger, eth_sold=2.0))
+
+    with pytest.raises(ValueError, match="sells more ETH than held"):
+        load_crypto_book(book, type2_path)
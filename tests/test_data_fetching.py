@@ -0,0 +1,90 @@
+import dataclasses
+import threading
+
+import pytest
+
+from portfolio_tracker import data_fetching
+from portfolio_tracker.config import config
+
+
+@pytest.fixture
+def market_data(monkeypatch):
+    """Sets the market data settings of the fetches, without back-off delays."""
+    monkeypatch.setattr(data_fetching.time, "sleep", lambda seconds: None)
+
+    def configure(**settings):
+        monkeypatch.setattr(
+            data_fetching,
+            "config",
+            dataclasses.replace(
+                config,
+                market_data=dataclasses.replace(config.market_data, **settings),
+            ),
+        )
+
+    return configure
+
+
+def test_items_fetched_concurrently(market_data):
+    market_data(max_workers=4)
+    # Passed only once 4 requests are in flight at the same time
+    barrier = threading.Barrier(4, timeout=5)
+
+    def fetch(item):
+        barrier.wait()
+        return item.lower()
+
+    results, failures = data_fetching._fetch_concurrently(fetch, ["A", "B", "C", "D"])
+
+    assert results == {"A": "a", "B": "b", "C": "c", "D": "d"}
+    assert failures == {}
+
+
+def test_provider_errors_retried(market_data):
+    market_data(retries=2)
+    attempts = {"A": 0, "B": 0, "C": 0}
+
+    def fetch(item):
+        attempts[item] += 1
+        if item == "A" and attempts[item] < 3:
+            raise ConnectionError("connection reset")
+        if item == "B":
+            raise TimeoutError()
+        if item == "C":
+            # No data: asking again would not help
+            raise LookupError("no price data returned")
+        return 1.0
+
+    results, failures = data_fetching._fetch_concurrently(fetch, ["A", "B", "C"])
+
+    assert results == {"A": 1.0}
+    assert failures == {"B": "TimeoutError", "C": "no price data returned"}
+    assert attempts == {"A": 3, "B": 3, "C": 1}
+
+
+def test_timed_out_items_retried(market_data):
+    market_data(timeout=0.05, retries=1)
+    calls = []
+    released = threading.Event()
+
+    def fetch(item):
+        calls.append(item)
+        if len(calls) == 1:
+            # Hangs past the timeout
+            released.wait(1)
+        return item
+
+    results, failures = data_fetching._fetch_concurrently(fetch, ["A"])
+    released.set()
+
+    assert results == {"A": "A"}
+    assert failures == {}
+    assert calls == ["A", "A"]
+
+
+def test_unexpected_errors_raised(market_data):
+    def fetch(item):
+        raise TypeError("unsupported operand")
+
+    with pytest.raises(TypeError):
+        data_fetching._fetch_concurrently(fetch, ["A"])
@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from portfolio_tracker.dividends import (
+    dividend_summary,
+    entitled_dividends,
+    holdings_before,
+)
+from portfolio_tracker.manager import PortfolioBook
+
+ROWS = [
+    ("2023-01-03", "AAPL", "buy", 10, 125.0),
+    ("2023-01-03", "MSFT", "buy", 5, 240.0),
+    ("2023-02-10", "AAPL", "buy", 5, 150.0),  # On the ex-date: not entitled
+    ("2023-03-01", "MSFT", "sell", 5, 250.0),
+    ("2023-05-11", "AAPL", "sell", 3, 170.0),
+]
+
+
+def series(dividends: dict[str, float]) -> pd.Series:
+    return pd.Series(dividends.values(), index=pd.DatetimeIndex(list(dividends)))
+
+
+def test_holdings_at_previous_close(ledger):
+    shares = holdings_before(
+        ledger(ROWS),
+        np.array(["AAPL", "AAPL", "AAPL", "MSFT", "MSFT", "VOO"]),
+        pd.DatetimeIndex(
+            [
+                "2023-01-03",
+                "2023-02-10",
+                "2023-02-11",
+                "2023-03-01",
+                "2023-03-02",
+                "2023-03-02",
+            ]
+        ),
+    )
+
+    assert list(shares) == pytest.approx([0, 10, 15, 5, 0, 0])
+
+
+def test_entitled_dividends(ledger):
+    events = entitled_dividends(
+        ledger(ROWS),
+        {
+            "AAPL": series({"2023-02-10": 0.23, "2023-05-12": 0.24}),
+            # Paid once the position was closed
+            "MSFT": series({"2023-02-15": 0.68, "2023-05-17": 0.68}),
+            "VOO": series({"2023-03-24": 1.49}),
+        },
+    )
+
+    assert list(events["security"]) == ["AAPL", "MSFT", "AAPL"]
+    assert list(events["shares"]) == pytest.approx([10, 5, 12])
+    assert list(events["income"]) == pytest.approx([2.3, 3.4, 2.88])
+
+
+def test_dividends_converted_at_ex_date_rate(ledger):
+    events = entitled_dividends(
+        ledger(ROWS), {"AAPL": series({"2023-01-05": 0.2})}, currency="GBP"
+    )
+
+    # GBPUSD=X closed at 1.19 on 2023-01-05 (tests/fixtures)
+    assert events["dividend"].iloc[0] == pytest.approx(0.2 / 1.19)
+    assert events["income"].iloc[0] == pytest.approx(10 * 0.2 / 1.19)
+
+
+def test_summary_yield_on_cost():
+    events = pd.DataFrame(
+        {
+            "security": ["AAPL", "AAPL", "MSFT"],
+            "ex_date": pd.DatetimeIndex(["2022-02-10", "2023-02-10", "2023-02-15"]),
+            "income": [2.0, 3.0, 4.0],
+        }
+    )
+
+    summary = dividend_summary(events, pd.Series({"AAPL": 1500.0}), date="2023-12-31")
+
+    assert summary.loc["AAPL", "income"] == pytest.approx(5)
+    assert summary.loc["AAPL", "ttm_income"] == pytest.approx(3)
+    assert summary.loc["AAPL", "yield_on_cost"] == pytest.approx(0.2)
+    # No longer owned
+    assert np.isnan(summary.loc["MSFT", "yield_on_cost"])
+
+
+def test_book_dividends_from_fixtures(ledger):
+    book = PortfolioBook(ledger(ROWS))
+
+    events, summary = book.get_dividends("USD")
+
+    # tests/fixtures/dividends/AAPL.csv: 0.23 on 2023-02-10, 0.24 on 2023-05-12
+    assert list(events["income"]) == pytest.approx([2.3, 2.88])
+    assert list(summary.index) == ["AAPL"]
+    assert summary.loc["AAPL", "cost_basis"] == pytest.approx(7 * 125 + 5 * 150)
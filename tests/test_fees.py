@@ -0,0 +1,84 @@
+import pandas as pd
+import pytest
+
+from portfolio_tracker.fees import allocate_fees
+from portfolio_tracker.manager import PortfolioBook
+from portfolio_tracker.tax import match_disposals
+
+ROWS = [
+    ("2023-01-03", "AAPL", "buy", 10, 100.0),
+    ("2023-01-04", "AAPL", "buy", 10, 120.0),
+    ("2023-01-04", "MSFT", "buy", 2, 200.0),
+    ("2023-01-10", "AAPL", "sell", 15, 120.0),
+]
+
+
+def fees(rows: list[tuple]) -> pd.DataFrame:
+    """Fees in the format of `fees.load_fees`, from (date, type, amount) rows."""
+    fees = pd.DataFrame(rows, columns=["date", "commision_type", "amount"])
+    fees["date"] = pd.to_datetime(fees["date"])
+    fees["currency"] = "USD"
+    return fees.sort_values("date", kind="stable")
+
+
+FEES = fees(
+    [
+        ("2023-01-03", "transaction", 10),
+        ("2023-01-06", "transaction", 12),  # On the trades of 2023-01-04
+        ("2023-01-10", "transaction", 6),
+        ("2023-01-09", "platform", 5),
+    ]
+)
+
+
+def test_fees_split_by_value_of_last_trading_day(ledger):
+    allocation = allocate_fees(FEES, ledger(ROWS))
+
+    # 1200 of AAPL and 400 of MSFT on 2023-01-04
+    assert list(allocation.transaction_fees) == pytest.approx([10, 9, 3, 6])
+    assert allocation.daily_fees.to_dict() == {
+        pd.Timestamp("2023-01-03"): pytest.approx(10),
+        pd.Timestamp("2023-01-04"): pytest.approx(12),
+        pd.Timestamp("2023-01-09"): pytest.approx(5),
+        pd.Timestamp("2023-01-10"): pytest.approx(6),
+    }
+
+
+def test_fees_without_trades_charged_on_their_day(ledger, capsys):
+    allocation = allocate_fees(fees([("2023-01-20", "transaction", 7)]), ledger(ROWS))
+
+    assert list(allocation.transaction_fees) == pytest.approx([0, 0, 0, 0])
+    assert allocation.daily_fees.to_dict() == {
+        pd.Timestamp("2023-01-20"): pytest.approx(7)
+    }
+    assert "charged as platform fees: 20/01/2023" in capsys.readouterr().out
+
+
+def test_fees_in_cost_and_proceeds_of_realized_gains(ledger):
+    book = PortfolioBook(ledger(ROWS))
+    book.set_fees(FEES)
+
+    realized = book.view("stock").generate_realized_gains_dataframe()
+
+    # The 10 shares of the first lot and 5 of the second, with their fees
+    cost = 10 * 100 + 10 + 5 * 120 + 9 / 2
+    proceeds = 15 * 120 - 6
+    assert float(realized["Net realized gains"].iloc[0]) == pytest.approx(
+        proceeds - cost
+    )
+    assert float(realized["Total value sold"].iloc[0]) == pytest.approx(proceeds)
+    assert "Fees" not in realized
+
+
+def test_fees_in_allowable_cost(ledger):
+    transactions = ledger(ROWS)
+    transaction_fees = allocate_fees(FEES, transactions).transaction_fees
+
+    gross = match_disposals(transactions)
+    net = match_disposals(transactions, transaction_fees)
+
+    # 15 of the 20 AAPL shares of the pool, and the sell, at the GBPUSD closes
+    # of their days (tests/fixtures)
+    fees_cost = net["allowable_cost"].sum() - gross["allowable_cost"].sum()
+    assert fees_cost == pytest.approx((10 / 1.20 + 9 / 1.21) * 15 / 20)
+    assert gross["proceeds"].sum() - net["proceeds"].sum() == pytest.approx(6 / 1.21)
@@ -0,0 +1,195 @@
+"""
+Parity of the vectorized FIFO lot matching (see `lots.match_fifo`) with the
+row-by-row `_sell_shares` loop it replaced, on the same ledgers.
+"""
+
+from collections import deque
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from portfolio_tracker.manager import Stocks
+
+
+class LoopStocks:
+    """The former `Stocks` FIFO loop, for USD ledgers."""
+
+    def __init__(self) -> None:
+        self.owned_shares = {}
+        self.investment_per_asset = {}
+        self.realized_gains = 0
+        self.realized_gains_per_asset = {}
+
+    def process_transactions(self, transactions: pd.DataFrame) -> None:
+        for _, transaction in transactions.iterrows():
+            security = transaction["security"]
+            quantity = transaction["quantity"]
+            price_per_share = transaction["price_per_share"]
+
+            if security not in self.owned_shares:
+                self.owned_shares[security] = deque()
+                self.investment_per_asset[security] = 0
+
+            if transaction["action"] == "buy":
+                self.owned_shares[security].append((quantity, price_per_share))
+                self.investment_per_asset[security] += transaction[
+                    "total_transaction_price"
+                ]
+            elif transaction["action"] == "sell":
+                self._sell_shares(
+                    security, quantity, price_per_share, transaction["date"]
+                )
+
+            if sum(quantity for quantity, _ in self.owned_shares[security]) <= 0:
+                del self.owned_shares[security]
+                del self.investment_per_asset[security]
+
+    def _sell_shares(
+        self, security: str, quantity: float, selling_price: float, transaction_date
+    ) -> None:
+        if (
+            security not in self.owned_shares
+            or sum(q for q, _ in self.owned_shares[security]) < quantity
+        ):
+            raise ValueError(f"Not enough shares of {security} to sell {quantity}")
+
+        stats = self.realized_gains_per_asset.setdefault(security, [0, 0, 0, 0])
+        remaining_quantity = quantity
+        while remaining_quantity > 0:
+            lot_quantity, lot_price = self.owned_shares[security][0]
+            if lot_quantity > remaining_quantity:
+                realized_gain = remaining_quantity * (selling_price - lot_price)
+                self.owned_shares[security][0] = (
+                    lot_quantity - remaining_quantity,
+                    lot_price,
+                )
+                self.investment_per_asset[security] -= remaining_quantity * lot_price
+                remaining_quantity = 0
+            else:
+                realized_gain = lot_quantity * (selling_price - lot_price)
+                remaining_quantity -= lot_quantity
+                self.investment_per_asset[security] -= lot_quantity * lot_price
+                self.owned_shares[security].popleft()
+            self.realized_gains += realized_gain
+            stats[0] += realized_gain
+
+        stats[1] += quantity * selling_price
+        stats[2] += quantity
+        stats[3] = transaction_date
+
+
+def random_ledger(rows: int, securities: int, seed: int) -> list[tuple]:
+    """
+    Rows of a date-sorted random ledger that never sells more than it holds, in quarters
+    of shares so that positions add up exactly.
+    """
+    rng = np.random.default_rng(seed)
+    held = np.zeros(securities, dtype=int)
+    ledger_rows = []
+    for row, security in enumerate(rng.integers(0, securities, rows)):
+        date = pd.Timestamp("2020-01-01") + pd.Timedelta(days=row // 3)
+        price = round(float(rng.uniform(1, 500)), 2)
+        if held[security] > 0 and rng.random() < 0.45:
+            # Whole position, or part of it
+            quarters = (
+                held[security]
+                if rng.random() < 0.2
+                else int(rng.integers(1, held[security] + 1))
+            )
+            action = "sell"
+            held[security] -= quarters
+        else:
+            quarters = int(rng.integers(1, 400))
+            action = "buy"
+            held[security] += quarters
+        ledger_rows.append((date, f"S{security}", action, quarters / 4, price))
+    return ledger_rows
+
+
+LEDGERS = {
+    "single lot": [
+        ("2023-01-02", "AAPL", "buy", 10, 100.0),
+        ("2023-02-01", "AAPL", "sell", 4, 120.0),
+    ],
+    "sell across lots": [
+        ("2023-01-02", "AAPL", "buy", 10, 100.0),
+        ("2023-01-03", "AAPL", "buy", 5, 110.0),
+        ("2023-01-04", "AAPL", "buy", 5, 90.0),
+        ("2023-02-01", "AAPL", "sell", 12, 120.0),
+        ("2023-02-02", "AAPL", "sell", 6, 80.0),
+    ],
+    "close and reopen": [
+        ("2023-01-02", "MSFT", "buy", 3, 250.0),
+        ("2023-01-05", "MSFT", "sell", 3, 260.0),
+        ("2023-01-06", "MSFT", "buy", 2, 240.0),
+        ("2023-01-09", "MSFT", "buy", 1, 245.0),
+        ("2023-01-10", "MSFT", "sell", 2.5, 255.0),
+    ],
+    "interleaved securities": [
+        ("2023-01-02", "AAPL", "buy", 10, 100.0),
+        ("2023-01-02", "TSLA", "buy", 2, 150.0),
+        ("2023-01-03", "AAPL", "sell", 10, 105.0),
+        ("2023-01-03", "TSLA", "buy", 0.5, 160.0),
+        ("2023-01-04", "VOO", "buy", 1.25, 350.0),
+        ("2023-01-05", "TSLA", "sell", 1.75, 140.0),
+        ("2023-01-06", "VOO", "sell", 0.25, 360.0),
+    ],
+}
+
+
+def assert_parity(stocks: Stocks, expected: LoopStocks) -> None:
+    """Assert that owned shares, investment and realized gains match the loop."""
+    assert stocks.owned_shares.keys() == expected.owned_shares.keys()
+    for security, lots in expected.owned_shares.items():
+        position = stocks.owned_shares[security]
+        lot_quantity, lot_price = (np.array(values) for values in zip(*lots))
+        np.testing.assert_allclose(position.lot_quantity, lot_quantity)
+        np.testing.assert_allclose(position.lot_price, lot_price)
+
+    assert stocks.investment_per_asset == pytest.approx(expected.investment_per_asset)
+
+    assert stocks.realized_gains == pytest.approx(expected.realized_gains)
+    assert (
+        stocks.realized_gains_per_asset.keys()
+        == expected.realized_gains_per_asset.keys()
+    )
+    for security, stats in expected.realized_gains_per_asset.items():
+        realized = stocks.realized_gains_per_asset[security]
+        assert [
+            realized.realized_gains,
+            realized.total_sold_value,
+            realized.total_shares_sold,
+        ] == pytest.approx(stats[:3])
+        assert realized.date_of_last_sell == stats[3]
+
+
+@pytest.mark.parametrize("name", LEDGERS)
+def test_ledgers(ledger, name):
+    transactions = ledger(LEDGERS[name])
+    stocks = Stocks("fifo")
+    stocks.process_transactions(transactions)
+    expected = LoopStocks()
+    expected.process_transactions(transactions)
+    assert_parity(stocks, expected)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_random_ledger(ledger, seed):
+    transactions = ledger(random_ledger(2000, 20, seed))
+    stocks = Stocks("fifo")
+    stocks.process_transactions(transactions)
+    expected = LoopStocks()
+    expected.process_transactions(transactions)
+    assert_parity(stocks, expected)
+
+
+def test_chunked_ledger(ledger):
+    """Processing a ledger in chunks carries the open lots over."""
+    transactions = ledger(random_ledger(2000, 20, seed=3))
+    stocks = Stocks("fifo")
+    for chunk in np.array_split(np.arange(len(transactions)), 7):
+        stocks.process_transactions(transactions.iloc[chunk])
+    expected = LoopStocks()
+    expected.process_transactions(transactions)
+    assert_parity(stocks, expected)
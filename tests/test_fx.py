@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from portfolio_tracker.data_fetching import FxRates
+
+# Closes of tests/fixtures/history/EURUSD=X.csv and GBPUSD=X.csv
+EURUSD = {"2023-01-05": 1.05, "2023-01-06": 1.07}
+GBPUSD = {"2023-01-05": 1.19, "2023-01-06": 1.21}
+
+
+def test_cross_rate_triangulated_via_usd():
+    rates = FxRates().rates_for(
+        "EUR", "GBP", pd.DatetimeIndex(["2023-01-05", "2023-01-06"])
+    )
+
+    assert list(rates) == pytest.approx(
+        [EURUSD[day] / GBPUSD[day] for day in ("2023-01-05", "2023-01-06")]
+    )
+
+
+def test_days_without_quote_carry_last_rate():
+    fx_rates = FxRates()
+
+    # Weekend after the Friday 2023-01-06, and before the first quote
+    assert fx_rates.rate("USD", "EUR", "2023-01-08") == pytest.approx(
+        1 / EURUSD["2023-01-06"]
+    )
+    assert fx_rates.rate("EUR", "USD", "2022-12-31") == pytest.approx(1.07)
+
+
+def test_rates_to_one_currency():
+    rates = FxRates().rates_to(
+        "GBP",
+        ["USD", "GBP", "EUR", "USD"],
+        pd.DatetimeIndex(["2023-01-05", "2023-01-05", "2023-01-06", "2023-01-06"]),
+    )
+
+    assert list(rates) == pytest.approx(
+        [
+            1 / GBPUSD["2023-01-05"],
+            1,
+            EURUSD["2023-01-06"] / GBPUSD["2023-01-06"],
+            1 / GBPUSD["2023-01-06"],
+        ]
+    )
+
+
+def test_unknown_currency_rate_missing(capsys):
+    rates = FxRates().rates_for("CHF", "USD", pd.DatetimeIndex(["2023-01-05"]))
+
+    assert np.isnan(rates).all()
+    assert "Error fetching exchange rates for CHF" in capsys.readouterr().out
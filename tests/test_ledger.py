@@ -0,0 +1,110 @@
+import pytest
+
+from portfolio_tracker import ledger
+from portfolio_tracker.crypto import no_splits
+
+HEADER = (
+    "date,security,type_of_asset,action,quantity,price_per_share,"
+    "total_transaction_price,currency\n"
+)
+ROWS = [
+    "01/02/2023,AAPL,stock,buy,10,100,1000,USD\n",
+    "01/03/2023,MSFT,stock,buy,5,200,1000,USD\n",
+    "02/01/2023,AAPL,stock,sell,4,120,480,USD\n",
+]
+APPENDED = "03/01/2023,AAPL,stock,buy,2,110,220,USD\n"
+
+
+@pytest.fixture
+def replays(monkeypatch):
+    """Ledgers replayed from scratch by `load_portfolio_book`."""
+    replayed = []
+    replay = ledger._replay
+
+    def recording_replay(path, splits, cost_basis):
+        replayed.append(path)
+        return replay(path, splits, cost_basis)
+
+    monkeypatch.setattr(ledger, "_replay", recording_replay)
+    return replayed
+
+
+def load(tmp_path, cost_basis="fifo"):
+    return ledger.load_portfolio_book(
+        tmp_path / "type1.csv",
+        tmp_path / ".cache" / "ledger_state.pkl",
+        no_splits,
+        cost_basis,
+    )
+
+
+def write(tmp_path, rows, mode="w"):
+    with open(tmp_path / "type1.csv", mode) as file:
+        file.write((HEADER if mode == "w" else "") + "".join(rows))
+
+
+def test_appended_rows_resumed(tmp_path, replays):
+    write(tmp_path, ROWS)
+    load(tmp_path)
+    write(tmp_path, [APPENDED], mode="a")
+
+    book = load(tmp_path)
+
+    assert len(replays) == 1
+    assert book.stocks.get_owned_assets() == {
+        "AAPL": pytest.approx(8),
+        "MSFT": pytest.approx(5),
+    }
+    # Appended rows are labelled as a full read of the ledger would
+    assert list(book.transactions.index) == [0, 1, 2, 3]
+
+    load(tmp_path)
+    assert len(replays) == 1
+
+
+def test_edited_row_replayed(tmp_path, replays):
+    write(tmp_path, ROWS)
+    load(tmp_path)
+    write(tmp_path, [ROWS[0].replace(",10,100,1000,", ",12,100,1200,"), *ROWS[1:]])
+
+    book = load(tmp_path)
+
+    assert len(replays) == 2
+    assert book.stocks.get_owned_assets()["AAPL"] == pytest.approx(8)
+
+
+def test_append_before_last_transaction_replayed(tmp_path, replays):
+    write(tmp_path, ROWS)
+    load(tmp_path)
+    write(tmp_path, ["01/15/2023,MSFT,stock,buy,1,200,200,USD\n"], mode="a")
+
+    book = load(tmp_path)
+
+    assert len(replays) == 2
+    assert book.stocks.get_owned_assets()["MSFT"] == pytest.approx(6)
+
+
+def test_extended_last_row_replayed(tmp_path, replays):
+    # The last row has no line break, and its last value is extended
+    (tmp_path / "type1.csv").write_text(
+        "date,security,type_of_asset,action,price_per_share,"
+        "total_transaction_price,currency,quantity\n"
+        "01/02/2023,AAPL,stock,buy,100,1000,USD,1"
+    )
+    load(tmp_path)
+    write(tmp_path, ["0\n"], mode="a")
+
+    book = load(tmp_path)
+
+    assert len(replays) == 2
+    assert book.stocks.get_owned_assets() == {"AAPL": pytest.approx(10)}
+
+
+def test_cost_basis_change_replayed(tmp_path, replays):
+    write(tmp_path, ROWS)
+    load(tmp_path)
+
+    book = load(tmp_path, cost_basis="lifo")
+
+    assert len(replays) == 2
+    assert book.stocks.cost_basis == "lifo"
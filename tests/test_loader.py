@@ -0,0 +1,26 @@
+import pandas as pd
+import pytest
+
+from portfolio_tracker.loader import DataLoader, convert_to_parquet
+
+LEDGER = """date,security,type_of_asset,action,quantity,price_per_share,total_transaction_price,currency
+03/01/2023,AAPL,stock,sell,1,12,12,USD
+01/02/2023,AAPL,stock,buy,2,10,20,USD
+02/01/2023,MSFT,stock,buy,1,"1,000","1,000",USD
+"""
+
+
+def test_parquet_keeps_csv_positions(tmp_path):
+    pytest.importorskip("pyarrow")
+    csv_path = tmp_path / "type1.csv"
+    csv_path.write_text(LEDGER)
+
+    from_csv = DataLoader(csv_path).get_type1_data()
+    from_parquet = DataLoader(convert_to_parquet(csv_path)).get_type1_data()
+
+    assert list(from_parquet.index) == [1, 2, 0]
+    pd.testing.assert_frame_equal(
+        from_parquet.astype(from_csv.dtypes.to_dict()), from_csv
+    )
+    columns = DataLoader(tmp_path / "type1.parquet", columns=["date", "security"])
+    assert list(columns.get_type1_data().index) == [1, 2, 0]
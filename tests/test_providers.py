@@ -0,0 +1,38 @@
+import pandas as pd
+import pytest
+
+from portfolio_tracker.data_fetching import (
+    fetch_close_prices,
+    fetch_crypto_quotes,
+    fetch_stock_quotes,
+)
+from portfolio_tracker.providers import FixtureProvider, get_provider
+
+
+def test_fixture_provider_selected():
+    assert isinstance(get_provider(), FixtureProvider)
+    assert not get_provider().cacheable
+
+
+def test_quotes_from_fixtures():
+    prices, failures = fetch_stock_quotes(["AAPL", "MSFT", "UNKNOWN"])
+
+    assert prices == {"AAPL": 190.0, "MSFT": 400.0}
+    assert list(failures) == ["UNKNOWN"]
+
+
+def test_crypto_quotes_from_fixtures():
+    prices, failures = fetch_crypto_quotes(["BTC", "DOGE"])
+
+    assert prices == {"BTC": 60000.0}
+    assert failures == {"DOGE": "not quoted on binance"}
+
+
+def test_close_prices_from_fixtures():
+    closes = fetch_close_prices(
+        ["AAPL", "UNKNOWN"], pd.Timestamp("2023-01-04"), pd.Timestamp("2023-01-06")
+    )
+
+    assert list(closes["AAPL"]) == pytest.approx([125.02, 129.62, 130.15])
+    # No recorded closes
+    assert closes["UNKNOWN"].isna().all()
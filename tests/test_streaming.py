@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from portfolio_tracker import streaming
+from portfolio_tracker.loader import DataLoader
+
+
+def write_ledger(path, rows: int, seed: int, sort: bool = False) -> None:
+    """Random type1 ledger over a few days, so many rows share a date."""
+    rng = np.random.default_rng(seed)
+    dates = pd.Timestamp("2023-01-02") + pd.to_timedelta(
+        rng.integers(0, 20, rows), unit="D"
+    )
+    if sort:
+        dates = dates.sort_values()
+    quantity = rng.integers(1, 100, rows)
+    price = rng.integers(1, 5000, rows) / 4
+    pd.DataFrame(
+        {
+            "date": dates.strftime("%m/%d/%Y"),
+            "security": rng.choice(["AAPL", "MSFT", "VOO"], rows),
+            "type_of_asset": "stock",
+            "action": "buy",
+            "quantity": quantity,
+            "price_per_share": price,
+            # Thousand-separated, as exported by brokers
+            "total_transaction_price": [f"{value:,.2f}" for value in quantity * price],
+            "currency": "USD",
+        }
+    ).to_csv(path, index=False)
+
+
+@pytest.mark.parametrize(("fan_in", "sort"), [(16, False), (3, False), (16, True)])
+def test_stream_matches_full_read(tmp_path, monkeypatch, fan_in, sort):
+    # A fan-in of 3 merges the 16 runs in several passes
+    monkeypatch.setattr(streaming, "FAN_IN", fan_in)
+    path = tmp_path / "type1.csv"
+    write_ledger(path, rows=400, seed=fan_in, sort=sort)
+
+    chunks = list(streaming.stream_type1(path, chunk_size=25))
+
+    assert len(chunks) > 1
+    streamed = pd.concat(chunks)
+    # Same rows, labels and order of the rows of a day as a full read
+    expected = DataLoader(path).get_type1_data()
+    pd.testing.assert_frame_equal(streamed[expected.columns], expected)
+
+
+def test_invalid_rows_reported_with_lines(tmp_path):
+    path = tmp_path / "type1.csv"
+    path.write_text(
+        "date,security,type_of_asset,action,quantity,price_per_share,"
+        "total_transaction_price,currency\n"
+        "01/03/2023,AAPL,stock,buy,10,100,1000,USD\n"
+        "01/02/2023,AAPL,stock,buy,ten,100,1000,USD\n"
+        "13/45/2023,AAPL,stock,buy,10,100,1000,USD\n"
+    )
+
+    with pytest.raises(ValueError) as error:
+        list(streaming.stream_type1(path, chunk_size=25))
+
+    assert "line 3: invalid quantity" in str(error.value)
+    assert "line 4: invalid date" in str(error.value)
@@ -0,0 +1,163 @@
+from functools import partial
+
+import pandas as pd
+import pytest
+
+from portfolio_tracker.tax import (
+    BED_AND_BREAKFAST,
+    SAME_DAY,
+    SECTION_104,
+    match_disposals,
+    tax_year,
+    tax_year_summary,
+)
+
+
+@pytest.fixture
+def ledger(ledger):
+    """GBP ledger from (date, security, action, quantity, total price) rows."""
+    return partial(ledger, currency="GBP", price="total_transaction_price")
+
+
+def test_tax_year_starts_on_6_april():
+    dates = ["2023-01-01", "2023-04-05", "2023-04-06", "2023-12-31", "2024-04-05"]
+    assert list(tax_year(dates)) == [
+        "2022/23",
+        "2022/23",
+        "2023/24",
+        "2023/24",
+        "2023/24",
+    ]
+
+
+def test_rules_across_tax_year_end(ledger):
+    """
+    A disposal on the last day of a tax year is matched with the same day,
+    then with an acquisition of the next tax year, then with the pool.
+    """
+    disposals = match_disposals(
+        ledger(
+            [
+                ("2022-01-10", "Z", "buy", 100, 1000),  # Pool: 100 at 10
+                ("2023-04-05", "Z", "sell", 50, 1000),  # 20 per share
+                ("2023-04-05", "Z", "buy", 10, 150),
+                ("2023-04-06", "Z", "buy", 20, 500),
+                ("2023-05-10", "Z", "buy", 10, 400),  # 35 days later: pool
+                ("2023-05-20", "Z", "sell", 90, 2700),
+            ]
+        )
+    )
+
+    assert list(disposals["rule"]) == [
+        SAME_DAY,
+        BED_AND_BREAKFAST,
+        SECTION_104,
+        SECTION_104,
+    ]
+    assert list(disposals["tax_year"]) == ["2022/23"] * 3 + ["2023/24"]
+    assert disposals["acquisition_date"].iloc[1] == pd.Timestamp("2023-04-06")
+    assert list(disposals["quantity"]) == pytest.approx([10, 20, 20, 90])
+    # Pool after the first disposal: 80 shares at 800, plus 10 at 400
+    assert list(disposals["allowable_cost"]) == pytest.approx([150, 500, 200, 1200])
+    assert list(disposals["gain"]) == pytest.approx([50, -100, 200, 1500])
+
+    summary = tax_year_summary(disposals)
+    assert summary.loc["2022/23", "disposals"] == 1
+    assert summary.loc["2022/23", "net_gain"] == pytest.approx(150)
+    assert summary.loc["2023/24", "net_gain"] == pytest.approx(1500)
+
+
+def test_bed_and_breakfast_window(ledger):
+    """Acquisitions up to 30 days after a disposal are matched with it."""
+    disposals = match_disposals(
+        ledger(
+            [
+                ("2023-01-02", "W", "buy", 10, 100),
+                ("2023-03-01", "W", "sell", 10, 200),
+                ("2023-03-31", "W", "buy", 4, 60),  # 30 days later
+                ("2023-04-01", "W", "buy", 6, 120),  # 31 days later
+            ]
+        )
+    )
+
+    assert list(disposals["rule"]) == [BED_AND_BREAKFAST, SECTION_104]
+    assert list(disposals["quantity"]) == pytest.approx([4, 6])
+    assert list(disposals["allowable_cost"]) == pytest.approx([60, 60])
+
+
+def test_same_day_and_bed_and_breakfast_before_pool(ledger):
+    """
+    Hand-worked ledger: the disposal is matched with the acquisition of its
+    day, then with that of the next 30 days, then with the pool at its
+    average cost.
+    """
+    transactions = ledger(
+        [
+            ("2019-01-01", "X", "buy", 1000, 4000),
+            ("2020-09-01", "X", "buy", 500, 2500),  # Pool: 1500 at 6500
+            ("2021-03-01", "X", "sell", 700, 4200),
+            ("2021-03-01", "X", "buy", 100, 620),
+            ("2021-03-20", "X", "buy", 200, 1300),
+            ("2021-05-10", "X", "sell", 1100, 6000),
+        ]
+    )
+    summary = tax_year_summary(match_disposals(transactions))
+
+    pool_cost = 400 * 6500 / 1500
+    assert summary.loc["2020/21", "net_gain"] == pytest.approx(
+        4200 - 620 - 1300 - pool_cost
+    )
+    assert summary.loc["2021/22", "net_gain"] == pytest.approx(
+        6000 - (6500 - pool_cost)
+    )
+
+
+def test_earlier_disposal_matched_first(ledger):
+    """
+    Hand-worked ledger: an acquisition within 30 days of two disposals is
+    matched with the earlier one first, the rest of it with the later one.
+    """
+    disposals = match_disposals(
+        ledger(
+            [
+                ("2022-01-01", "Y", "buy", 100, 1000),  # Pool: 100 at 10
+                ("2022-06-01", "Y", "sell", 60, 900),  # 15 per share
+                ("2022-06-10", "Y", "sell", 30, 300),  # 10 per share
+                ("2022-06-20", "Y", "buy", 70, 1400),  # 20 per share
+                ("2022-08-01", "Y", "sell", 80, 1600),
+            ]
+        )
+    )
+
+    assert list(disposals["rule"]) == [
+        BED_AND_BREAKFAST,
+        BED_AND_BREAKFAST,
+        SECTION_104,
+        SECTION_104,
+    ]
+    assert list(disposals["quantity"]) == pytest.approx([60, 10, 20, 80])
+    assert list(disposals["gain"]) == pytest.approx([-300, -100, 0, 800])
+
+
+def test_securities_matched_separately(ledger):
+    disposals = match_disposals(
+        ledger(
+            [
+                ("2023-01-02", "A", "buy", 10, 100),
+                ("2023-01-02", "B", "buy", 10, 300),
+                ("2023-02-01", "A", "sell", 10, 150),
+                ("2023-02-02", "B", "buy", 10, 500),
+            ]
+        )
+    )
+
+    assert list(disposals["security"]) == ["A"]
+    assert disposals["rule"].iloc[0] == SECTION_104
+    assert disposals["gain"].iloc[0] == pytest.approx(50)
+
+
+def test_no_disposals(ledger):
+    disposals = match_disposals(ledger([("2023-01-02", "A", "buy", 10, 100)]))
+
+    assert disposals.empty
+    assert tax_year_summary(disposals).empty
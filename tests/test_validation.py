@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from portfolio_tracker.data_fetching import SplitRegistry
+from portfolio_tracker.manager import PortfolioBook
+
+
+class FixedSplits(SplitRegistry):
+    """Split registry of known splits, recording the symbols looked up."""
+
+    def __init__(self, splits: dict[str, pd.Series]) -> None:
+        super().__init__()
+        self.splits = splits
+        self.looked_up = []
+
+    def get(self, symbols) -> dict[str, pd.Series]:
+        self.looked_up.extend(symbols)
+        return {
+            symbol: self.splits[symbol] for symbol in symbols if symbol in self.splits
+        }
+
+
+SPLITS = {"AAPL": pd.Series([2.0], index=pd.DatetimeIndex(["2023-02-01"]))}
+
+
+def test_sells_checked_after_splits(ledger):
+    splits = FixedSplits(SPLITS)
+    book = PortfolioBook(
+        ledger(
+            [
+                ("2023-01-02", "AAPL", "buy", 10, 100.0),
+                ("2023-03-01", "AAPL", "sell", 15, 60.0),
+            ]
+        ),
+        splits,
+    )
+
+    assert book.stocks.get_owned_assets() == {"AAPL": pytest.approx(5)}
+    with pytest.raises(ValueError, match="sells more AAPL than held"):
+        book.extend(ledger([("2023-03-02", "AAPL", "sell", 6, 60.0)]))
+
+
+def test_missing_column_rejected_before_split_lookup(ledger):
+    splits = FixedSplits(SPLITS)
+    transactions = ledger([("2023-01-02", "AAPL", "buy", 10, 100.0)])
+
+    with pytest.raises(ValueError, match=r"Missing columns .*'security'"):
+        PortfolioBook(transactions.drop(columns="security"), splits)
+    assert splits.looked_up == []
+
+
+def test_missing_values_rejected_before_split_lookup(ledger):
+    splits = FixedSplits(SPLITS)
+    transactions = ledger(
+        [
+            ("2023-01-02", "AAPL", "buy", 10, 100.0),
+            ("2023-01-03", np.nan, "buy", 1, 100.0),
+            ("2023-01-04", "AAPL", "buy", 1, 100.0),
+        ]
+    )
+    transactions.loc[2, "date"] = pd.NaT
+
+    with pytest.raises(ValueError) as error:
+        PortfolioBook(transactions, splits)
+    assert "missing security: line 3" in str(error.value)
+    assert "missing date: line 4" in str(error.value)
+    assert splits.looked_up == []
+
+
+def test_securities_normalized_before_split_lookup(ledger):
+    splits = FixedSplits(SPLITS)
+    book = PortfolioBook(ledger([("2023-01-02", " AAPL ", "buy", 10, 100.0)]), splits)
+
+    assert splits.looked_up == ["AAPL"]
+    assert book.stocks.get_owned_assets() == {"AAPL": pytest.approx(20)}